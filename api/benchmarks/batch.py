@@ -0,0 +1,136 @@
+# Throughput of importing foods one request at a time versus the batch routes.
+#
+#   single - POST /api/foods/ (multipart) then DELETE /api/foods/{id}, one
+#            request and one commit per food
+#   batch  - POST /api/foods/batch then DELETE /api/foods/batch, --batch-size
+#            foods per request and commit
+#
+# Every food has three categories out of --categories, so both modes also
+# resolve categories. Each mode runs against its own user.
+#
+#   python -m benchmarks.batch --foods 2000 --batch-size 500
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def make_foods(count, categories):
+    return [
+        dict(
+            name=f"food-{i}",
+            description=f"description {i}",
+            categories=[f"category-{(i + j) % categories}" for j in range(3)],
+        )
+        for i in range(count)
+    ]
+
+
+async def login(client, username):
+    credentials = dict(username=username, email=username, password="bench")
+    await client.post("/api/auth/register", json=credentials)
+    response = await client.post("/api/auth/login", json=credentials)
+    client.cookies.set("token", response.cookies["token"])
+
+
+async def run_single(client, foods, batch_size):
+    ids = []
+    for food in foods:
+        response = await client.post(
+            "/api/foods/", data=dict(food, categories=",".join(food["categories"]))
+        )
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    created = time.perf_counter()
+    for id in ids:
+        response = await client.delete(f"/api/foods/{id}")
+        assert response.status_code == 200, response.text
+    return created
+
+
+async def run_batch(client, foods, batch_size):
+    ids = []
+    for start in range(0, len(foods), batch_size):
+        response = await client.post(
+            "/api/foods/batch", json=foods[start : start + batch_size]
+        )
+        assert response.status_code == 200, response.text
+        ids += [result["food"]["id"] for result in response.json()]
+    created = time.perf_counter()
+    for start in range(0, len(ids), batch_size):
+        response = await client.request(
+            "DELETE", "/api/foods/batch", json=ids[start : start + batch_size]
+        )
+        assert response.status_code == 200, response.text
+    return created
+
+
+async def measure(count, categories, batch_size):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    foods = make_foods(count, categories)
+    results = []
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for mode, run in (("single", run_single), ("batch", run_batch)):
+            await login(client, mode)
+            started = time.perf_counter()
+            created = await run(client, foods, batch_size)
+            finished = time.perf_counter()
+            results.append(
+                dict(
+                    mode=mode,
+                    foods=count,
+                    batch_size=batch_size if mode == "batch" else 1,
+                    create_per_second=round(count / (created - started)),
+                    delete_per_second=round(count / (finished - created)),
+                )
+            )
+
+    await dispose_engines()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--foods", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        results = asyncio.run(measure(args.foods, args.categories, args.batch_size))
+
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
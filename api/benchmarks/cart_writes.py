@@ -0,0 +1,137 @@
+# Concurrent writes to the same cart.
+#
+# Seeds --foods foods and one cart, then sends --rounds bursts of --clients
+# simultaneous PUT /api/carts/{id}, each replacing the lines with its own
+# random list of foods, most of them shared with the other clients. Every
+# request must answer 200, the cart must end up holding one of the lists sent
+# in the last round, and the statistics rollups must still match the cart
+# lines (see `python manage.py check-statistics`), or this script exits with 1.
+#
+#   python -m benchmarks.cart_writes --clients 6 --rounds 20
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+async def measure(foods, clients, rounds, seed):
+    import httpx
+    from database.connect import dispose_engines, new_session
+    from src.main import app
+    from src.routes.statistics import rollups
+
+    rng = random.Random(seed)
+    failures = []
+    try:
+        # A failing request answers 500 instead of raising here
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            credentials = dict(username="bench", email="bench@bench", password="bench")
+            await client.post("/api/auth/register", json=credentials)
+            response = await client.post("/api/auth/login", json=credentials)
+            client.cookies.set("token", response.cookies["token"])
+            user_id = (await client.get("/api/auth/whoami")).json()["id"]
+
+            names = [f"food-{i}" for i in range(foods)]
+            for name in names:
+                await client.post("/api/foods/", data={"name": name})
+            response = await client.post("/api/carts/", json={"name": "cart"})
+            cart_id = response.json()["id"]
+
+            statuses = Counter()
+            for _ in range(rounds):
+                sent = [
+                    rng.choices(names, k=rng.randint(1, foods)) for _ in range(clients)
+                ]
+                responses = await asyncio.gather(
+                    *[
+                        client.put(f"/api/carts/{cart_id}", json={"foods": lines})
+                        for lines in sent
+                    ]
+                )
+                statuses.update(response.status_code for response in responses)
+
+            response = await client.get(f"/api/carts/{cart_id}")
+            held = Counter(
+                {
+                    line["food_name"]: line["food_qty"]
+                    for line in response.json()["foods"]
+                }
+            )
+            if held not in [Counter(lines) for lines in sent]:
+                failures.append("the cart holds none of the lists last sent")
+
+        db = new_session()
+        try:
+            differences = await rollups.check(db, user_id)
+        finally:
+            await db.close()
+    finally:
+        await dispose_engines()
+
+    print(
+        json.dumps(
+            dict(
+                clients=clients,
+                rounds=rounds,
+                statuses=dict(statuses),
+                differences=differences,
+            )
+        )
+    )
+    if set(statuses) != {200}:
+        failures.append(f"statuses {dict(statuses)}")
+    if differences:
+        failures.append(f"rollups differ from the cart lines: {differences}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--foods", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        failures = asyncio.run(
+            measure(args.foods, args.clients, args.rounds, args.seed)
+        )
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
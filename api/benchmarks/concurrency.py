@@ -0,0 +1,184 @@
+# Concurrent throughput of GET /api/foods/ for each database session mode.
+#
+#   blocking - synchronous Session called directly from the async handlers,
+#              i.e. how the routes behaved before the async database layer
+#   threaded - DB_ASYNC=False, synchronous driver calls run on the threadpool
+#   async    - DB_ASYNC=True, AsyncSession on the async driver
+#
+# Every mode runs in its own process against a freshly seeded SQLite file.
+# A local SQLite file answers in microseconds, so --db-latency-ms adds a sleep
+# to every statement to stand in for the round trip to a database server.
+#
+#   python -m benchmarks.concurrency --requests 2000 --concurrency 50
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("blocking", "threaded", "async")
+
+
+def setup_environment(workdir, mode, concurrency):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        DB_ASYNC="False" if mode != "async" else "True",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+        # The blocking mode cannot wait for a connection without stalling
+        # the event loop, so give every client its own
+        DB_POOL_SIZE=str(concurrency),
+    )
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def use_blocking_sessions(app):
+    from database.connect import SessionLocal, ThreadedSession, get_db
+
+    class BlockingSession(ThreadedSession):
+        async def _run(self, fn, *args, **kwargs):
+            return fn(*args, **kwargs)
+
+    async def get_blocking_db():
+        db = BlockingSession(SessionLocal(expire_on_commit=False))
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    app.dependency_overrides[get_db] = get_blocking_db
+
+
+async def add_statement_latency(latency):
+    from database import connect
+    from sqlalchemy import event
+
+    # SQLite calls the trace callback from whichever thread runs the statement
+    # (the request thread, the threadpool or the aiosqlite worker), so the
+    # delay lands where a network round trip would.
+    def sleep(statement):
+        time.sleep(latency)
+
+    def on_connect(dbapi_connection, connection_record):
+        if hasattr(dbapi_connection, "await_"):
+            dbapi_connection.await_(
+                dbapi_connection._connection.set_trace_callback(sleep)
+            )
+        else:
+            dbapi_connection.set_trace_callback(sleep)
+
+    # Reconnect so every pooled connection gets the callback
+    event.listen(connect.engine, "connect", on_connect)
+    if connect.DB_ASYNC:
+        event.listen(connect.async_engine.sync_engine, "connect", on_connect)
+    await connect.dispose_engines()
+
+
+async def run_mode(mode, foods, requests, concurrency, latency):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    if mode == "blocking":
+        use_blocking_sessions(app)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        credentials = dict(username="bench", email="bench@bench", password="bench")
+        await client.post("/api/auth/register", json=credentials)
+        response = await client.post("/api/auth/login", json=credentials)
+        client.cookies.set("token", response.cookies["token"])
+
+        for i in range(foods):
+            await client.post(
+                "/api/foods/", data={"name": f"food-{i}", "categories": "a,b"}
+            )
+        await add_statement_latency(latency)
+
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(None)
+        latencies = []
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.get(
+                    "/api/foods/", params={"cursor": "", "limit": 20}
+                )
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    await dispose_engines()
+
+    latencies.sort()
+    return dict(
+        mode=mode,
+        requests=requests,
+        concurrency=concurrency,
+        db_latency_ms=latency * 1000,
+        seconds=round(elapsed, 3),
+        requests_per_second=round(requests / elapsed, 1),
+        p50_ms=round(latencies[len(latencies) // 2] * 1000, 2),
+        p99_ms=round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=MODES)
+    parser.add_argument("--foods", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.mode:
+        with tempfile.TemporaryDirectory() as workdir:
+            setup_environment(workdir, args.mode, args.concurrency)
+            result = asyncio.run(
+                run_mode(
+                    args.mode,
+                    args.foods,
+                    args.requests,
+                    args.concurrency,
+                    args.db_latency_ms / 1000,
+                )
+            )
+        print(json.dumps(result))
+        return
+
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.concurrency", "--mode", mode]
+            + ["--foods", str(args.foods), "--requests", str(args.requests)]
+            + ["--concurrency", str(args.concurrency)]
+            + ["--db-latency-ms", str(args.db_latency_ms)],
+            cwd=API_DIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        print(output.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
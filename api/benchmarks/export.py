@@ -0,0 +1,169 @@
+# Time to first byte and memory of GET /api/export on a long cart history.
+#
+# Seeds one user with --carts carts of --items lines each (cart_items is the
+# largest table), then streams the NDJSON and CSV exports of cart_items.
+# Python memory is traced while the response is read: it has to stay flat as
+# --carts grows, and the first bytes must arrive long before the last.
+#
+#   python -m benchmarks.export --carts 10000 --items 100
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def seed(user_id, carts, items):
+    from database import engine
+
+    foods = [(str(uuid.uuid4()), user_id, f"food-{i}") for i in range(items)]
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO foods (id, user_id, name) VALUES (?, ?, ?)", foods
+        )
+        for i in range(carts):
+            cart_id = str(uuid.uuid4())
+            connection.exec_driver_sql(
+                "INSERT INTO carts (id, user_id, name, status) VALUES (?, ?, ?, ?)",
+                (cart_id, user_id, f"cart-{i}", "Completed"),
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO carts_foods (cart_id, user_id, food_id, food_qty) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (cart_id, user_id, food[0], 1 + j % 3)
+                    for j, food in enumerate(foods)
+                ],
+            )
+
+
+async def export(app, query, token):
+    # Calls the app directly: the httpx test transport buffers the whole body
+    # before returning, which would hide the streaming
+    timings = dict(chunks=0, size=0)
+    scope = dict(
+        type="http",
+        http_version="1.1",
+        method="GET",
+        scheme="http",
+        server=("bench", 80),
+        client=("127.0.0.1", 1234),
+        path="/api/export/",
+        raw_path=b"/api/export/",
+        root_path="",
+        query_string=query.encode(),
+        headers=[(b"host", b"bench"), (b"cookie", f"token={token}".encode())],
+    )
+
+    requests = [dict(type="http.request", body=b"", more_body=False)]
+    finished = asyncio.Event()
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the whole body is sent
+        await finished.wait()
+        return dict(type="http.disconnect")
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif not message.get("more_body"):
+            finished.set()
+        if message.get("body"):
+            if not timings["chunks"]:
+                timings["first_byte_ms"] = round(
+                    (time.perf_counter() - started) * 1000, 1
+                )
+            timings["chunks"] += 1
+            timings["size"] += len(message["body"])
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    timings["total_seconds"] = round(time.perf_counter() - started, 2)
+    timings["peak_python_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    tracemalloc.stop()
+    timings["megabytes"] = round(timings.pop("size") / 2**20, 1)
+    return timings
+
+
+async def measure(carts, items):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    results = []
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        credentials = dict(username="bench", email="bench@bench", password="bench")
+        await client.post("/api/auth/register", json=credentials)
+        response = await client.post("/api/auth/login", json=credentials)
+        token = response.cookies["token"]
+        client.cookies.set("token", token)
+        user_id = (await client.get("/api/auth/whoami")).json()["id"]
+
+        started = time.perf_counter()
+        seed(user_id, carts, items)
+        print(
+            json.dumps(
+                dict(
+                    rows=carts * items,
+                    seed_seconds=round(time.perf_counter() - started, 1),
+                )
+            )
+        )
+
+        # Open the database connections before timing
+        await export(app, "tables=categories", token)
+        for format in ("ndjson", "csv"):
+            query = f"format={format}&tables=cart_items"
+            results.append(
+                dict(
+                    format=format, rows=carts * items, **await export(app, query, token)
+                )
+            )
+
+    await dispose_engines()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carts", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        for result in asyncio.run(measure(args.carts, args.items)):
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
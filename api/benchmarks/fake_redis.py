@@ -0,0 +1,119 @@
+# In-process stand-in for a Redis server, speaking enough RESP for
+# RedisBackend (src/utils/cache.py): PING, AUTH, SELECT, GET, SET [PX], DEL,
+# SADD, SMEMBERS, PEXPIRE and FLUSHDB.
+#
+#   python -m benchmarks.fake_redis --port 6390
+#   RESPONSE_CACHE_URL=redis://127.0.0.1:6390/0 python run.py
+import argparse
+import asyncio
+import time
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.commands = 0
+
+    def _alive(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def call(self, name, *args):
+        self.commands += 1
+        if name in ("PING", "AUTH", "SELECT"):
+            return "+OK" if name != "PING" else "+PONG"
+        if name == "FLUSHDB":
+            self.data.clear()
+            self.expires.clear()
+            return "+OK"
+        if name == "GET":
+            return self.data[args[0]] if self._alive(args[0]) else None
+        if name == "SET":
+            key, value = args[0], args[1]
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if len(args) == 4 and args[2].upper() == b"PX":
+                self.expires[key] = time.monotonic() + int(args[3]) / 1000
+            return "+OK"
+        if name == "DEL":
+            deleted = 0
+            for key in args:
+                deleted += self._alive(key)
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+            return deleted
+        if name == "SADD":
+            if not self._alive(args[0]):
+                self.data[args[0]] = set()
+            before = len(self.data[args[0]])
+            self.data[args[0]].update(args[1:])
+            return len(self.data[args[0]]) - before
+        if name == "SMEMBERS":
+            return list(self.data[args[0]]) if self._alive(args[0]) else []
+        if name == "PEXPIRE":
+            if not self._alive(args[0]):
+                return 0
+            self.expires[args[0]] = time.monotonic() + int(args[1]) / 1000
+            return 1
+        return Exception(f"ERR unknown command '{name}'")
+
+
+def encode(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return b"-%s\r\n" % str(reply).encode()
+    if isinstance(reply, str):
+        return reply.encode() + b"\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+
+
+async def serve(host="127.0.0.1", port=6390, fake=None):
+    # Returns the asyncio server and the FakeRedis it serves
+    fake = fake or FakeRedis()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(encode(fake.call(args[0].decode().upper(), *args[1:])))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    return server, fake
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    async def run():
+        server, _ = await serve(args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Time to import a 100k row NDJSON file through POST /api/import/.
+#
+# The file looks like an export of another account: --foods foods with two
+# of 20 categories each, --carts carts and enough cart lines to reach --rows.
+# The import runs as a background task, which the test transport awaits
+# before returning the response, so the POST measures the whole import.
+#
+#   python -m benchmarks.imports --rows 100000
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import orjson
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def make_file(path, rows, foods, carts):
+    lines = [dict(table="categories", name=f"category-{i}") for i in range(20)]
+    lines += [
+        dict(
+            table="foods",
+            name=f"food-{i}",
+            description=f"description {i}",
+            categories=[f"category-{i % 20}", f"category-{(i + 7) % 20}"],
+        )
+        for i in range(foods)
+    ]
+    lines += [
+        dict(table="carts", name=f"cart-{i}", status="Completed") for i in range(carts)
+    ]
+    items = rows - len(lines)
+    lines += [
+        dict(
+            table="cart_items",
+            cart_name=f"cart-{i % carts}",
+            food_name=f"food-{(i * 7) % foods}",
+            quantity=1 + i % 3,
+        )
+        for i in range(items)
+    ]
+    with open(path, "wb") as file:
+        for line in lines:
+            file.write(orjson.dumps(line) + b"\n")
+    return len(lines)
+
+
+async def measure(rows, foods, carts):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    path = os.path.abspath("import.ndjson")
+    count = make_file(path, rows, foods, carts)
+
+    async with httpx.AsyncClient(
+        app=app, base_url="http://bench", timeout=None
+    ) as client:
+        credentials = dict(username="bench", email="bench@bench", password="bench")
+        await client.post("/api/auth/register", json=credentials)
+        response = await client.post("/api/auth/login", json=credentials)
+        client.cookies.set("token", response.cookies["token"])
+
+        started = time.perf_counter()
+        with open(path, "rb") as file:
+            response = await client.post(
+                "/api/import/", files={"file": ("import.ndjson", file)}
+            )
+        assert response.status_code == 202, response.text
+        seconds = time.perf_counter() - started
+        job = (await client.get(f"/api/import/{response.json()['id']}")).json()
+
+    await dispose_engines()
+    return dict(
+        rows=count,
+        status=job["status"],
+        imported=job["imported"],
+        failed=job["failed"],
+        seconds=round(seconds, 1),
+        rows_per_second=round(count / seconds),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--foods", type=int, default=30000)
+    parser.add_argument("--carts", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        print(json.dumps(asyncio.run(measure(args.rows, args.foods, args.carts))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,516 @@
+# Latency and throughput of the main endpoints under concurrent clients.
+#
+# Seeds a fresh SQLite database straight through SQL with --users users, each
+# owning --foods foods (in two of --categories categories each) and --carts
+# carts of --lines lines, named and identified the same way on every run.
+# Every user then logs in, and each endpoint is requested --requests times by
+# --concurrency clients acting as randomly picked users, over two transports:
+#
+#   asgi    - the app called in this process through httpx's ASGI transport,
+#             no network and no server
+#   uvicorn - the app served by uvicorn (--workers processes) in a child
+#             process, requested over HTTP on 127.0.0.1
+#
+# Prints one JSON line per transport and endpoint with p50/p95/p99 latency and
+# requests per second. --output writes the whole run (settings, commit and
+# results) as JSON; --compare reads such a file and exits with 1 when an
+# endpoint's p95 grew or its throughput fell by more than --tolerance.
+#
+#   python -m benchmarks.load --users 20 --requests 500 --concurrency 20 \
+#       --output before.json
+#   python -m benchmarks.load --users 20 --requests 500 --concurrency 20 \
+#       --compare before.json
+#
+# Settings of the app are passed with --env, e.g. --env DB_ASYNC=False.
+#
+# Requires httpx and uvicorn.
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSPORTS = ("asgi", "uvicorn")
+PASSWORD = "benchmark"
+
+
+def setup_environment(workdir, rounds, overrides):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS=str(rounds),
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.environ.update(overrides)
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def make_id(*parts):
+    # The same ids on every run, so runs request the same rows
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "/".join(map(str, parts))))
+
+
+def seed(users, foods, categories, carts, lines):
+    # Returns, per user, what the scenarios pick from
+    import bcrypt
+    from database import engine
+    from src.utils import password_hasher
+
+    rng = random.Random(0)
+    hashed = bcrypt.hashpw(
+        PASSWORD.encode(), bcrypt.gensalt(password_hasher.rounds)
+    ).decode()
+    dataset = []
+    with engine.begin() as connection:
+        for u in range(users):
+            user_id = make_id("user", u)
+            food_ids = [make_id("food", u, i) for i in range(foods)]
+            category_ids = [make_id("category", u, i) for i in range(categories)]
+            cart_ids = [make_id("cart", u, i) for i in range(carts)]
+
+            connection.exec_driver_sql(
+                "INSERT INTO users (id, username, email, password) "
+                "VALUES (?, ?, ?, ?)",
+                (user_id, f"user-{u}", f"user-{u}@bench", hashed),
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO foods (id, user_id, name, description) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (id, user_id, f"food-{i}", "Something to eat")
+                    for i, id in enumerate(food_ids)
+                ],
+            )
+            if category_ids:
+                connection.exec_driver_sql(
+                    "INSERT INTO categories (id, user_id, name) VALUES (?, ?, ?)",
+                    [
+                        (id, user_id, f"category-{i}")
+                        for i, id in enumerate(category_ids)
+                    ],
+                )
+                connection.exec_driver_sql(
+                    "INSERT OR IGNORE INTO category_foods (category_id, food_id) "
+                    "VALUES (?, ?)",
+                    [
+                        (category_ids[(i + offset) % categories], id)
+                        for i, id in enumerate(food_ids)
+                        for offset in (0, 1)
+                    ],
+                )
+            for i, cart_id in enumerate(cart_ids):
+                # Spread over three years, cart names are unique across users
+                created_at = f"{2020 + i * 3 // carts}-{1 + i % 12:02d}-01 10:00:00"
+                connection.exec_driver_sql(
+                    "INSERT INTO carts (id, user_id, name, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (cart_id, user_id, f"cart-{u}-{i}", "Completed", created_at),
+                )
+                connection.exec_driver_sql(
+                    "INSERT INTO carts_foods (cart_id, user_id, food_id, food_qty) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (cart_id, user_id, food_id, 1 + rng.randrange(5))
+                        for food_id in rng.sample(food_ids, min(lines, foods))
+                    ],
+                )
+            dataset.append(
+                dict(
+                    id=user_id,
+                    username=f"user-{u}",
+                    foods=food_ids,
+                    names=[f"food-{i}" for i in range(foods)],
+                    carts=cart_ids,
+                )
+            )
+    return dataset
+
+
+async def rebuild_statistics(dataset):
+    from database.connect import dispose_engines, new_session
+    from src.routes.statistics import rollups
+
+    db = new_session()
+    try:
+        for user in dataset:
+            await rollups.rebuild(db, user["id"])
+        await db.commit()
+    finally:
+        await db.close()
+    await dispose_engines()
+
+
+# Scenarios, each one request made as `user`
+
+
+async def login(client, user, rng):
+    return await client.post(
+        "/api/auth/login", json=dict(username=user["username"], password=PASSWORD)
+    )
+
+
+async def whoami(client, user, rng):
+    return await client.get("/api/auth/whoami", headers=user["headers"])
+
+
+async def foods_list(client, user, rng):
+    return await client.get(
+        "/api/foods/", params={"cursor": "", "limit": 20}, headers=user["headers"]
+    )
+
+
+async def food_detail(client, user, rng):
+    return await client.get(
+        f"/api/foods/{rng.choice(user['foods'])}", headers=user["headers"]
+    )
+
+
+async def foods_search(client, user, rng):
+    return await client.get(
+        "/api/foods/search",
+        params={"q": f"food-{rng.randrange(100)}", "limit": 10},
+        headers=user["headers"],
+    )
+
+
+async def categories_list(client, user, rng):
+    return await client.get(
+        "/api/categories/", params={"cursor": "", "limit": 20}, headers=user["headers"]
+    )
+
+
+async def carts_list(client, user, rng):
+    return await client.get(
+        "/api/carts/", params={"cursor": "", "limit": 20}, headers=user["headers"]
+    )
+
+
+async def cart_detail(client, user, rng):
+    return await client.get(
+        f"/api/carts/{rng.choice(user['carts'])}", headers=user["headers"]
+    )
+
+
+async def cart_update(client, user, rng):
+    cart_id = rng.choice(user["carts"])
+    foods = rng.sample(user["names"], min(user["lines"], len(user["names"])))
+    return await client.put(
+        f"/api/carts/{cart_id}",
+        json=dict(status="Completed", foods=foods),
+        headers=user["headers"],
+    )
+
+
+async def statistics(client, user, rng):
+    return await client.get(
+        "/api/statistics/", params={"limit": 10}, headers=user["headers"]
+    )
+
+
+SCENARIOS = dict(
+    login=login,
+    whoami=whoami,
+    foods_list=foods_list,
+    food_detail=food_detail,
+    foods_search=foods_search,
+    categories_list=categories_list,
+    carts_list=carts_list,
+    cart_detail=cart_detail,
+    cart_update=cart_update,
+    statistics=statistics,
+)
+
+
+def percentile(latencies, fraction):
+    # Nearest rank of sorted latencies, in milliseconds
+    index = max(math.ceil(len(latencies) * fraction) - 1, 0)
+    return round(latencies[index] * 1000, 2)
+
+
+async def run_scenario(client, dataset, name, requests, concurrency, warmup):
+    scenario = SCENARIOS[name]
+    rng = random.Random(name)
+    for _ in range(warmup):
+        await scenario(client, rng.choice(dataset), rng)
+
+    latencies = []
+    statuses = {}
+    remaining = requests
+
+    async def worker(rng):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            user = rng.choice(dataset)
+            started = time.perf_counter()
+            try:
+                status = str((await scenario(client, user, rng)).status_code)
+            except Exception as e:
+                # Counted by exception name, e.g. the database being locked
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[worker(random.Random(f"{name}-{i}")) for i in range(concurrency)]
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return dict(
+        endpoint=name,
+        requests=requests,
+        concurrency=concurrency,
+        errors=sum(
+            count
+            for status, count in statuses.items()
+            if not status.isdigit() or int(status) >= 400
+        ),
+        statuses=dict(sorted(statuses.items())),
+        seconds=round(elapsed, 3),
+        requests_per_second=round(requests / elapsed, 1),
+        p50_ms=percentile(latencies, 0.50),
+        p95_ms=percentile(latencies, 0.95),
+        p99_ms=percentile(latencies, 0.99),
+        max_ms=round(latencies[-1] * 1000, 2),
+    )
+
+
+async def drive(client, transport, dataset, args):
+    for user in dataset:
+        response = await client.post(
+            "/api/auth/login", json=dict(username=user["username"], password=PASSWORD)
+        )
+        assert response.status_code == 200, response.text
+        user["headers"] = {"Cookie": f"token={response.cookies['token']}"}
+        user["lines"] = args.lines
+
+    results = []
+    for name in args.endpoints:
+        result = await run_scenario(
+            client, dataset, name, args.requests, args.concurrency, args.warmup
+        )
+        result = dict(transport=transport, **result)
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    return results
+
+
+async def run_asgi(dataset, args):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    try:
+        async with httpx.AsyncClient(
+            app=app, base_url="http://bench", timeout=None
+        ) as client:
+            return await drive(client, "asgi", dataset, args)
+    finally:
+        await dispose_engines()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for(client, server, seconds=30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with {server.returncode}")
+        try:
+            await client.get("/api/auth/whoami")
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not start")
+
+
+async def run_uvicorn(dataset, args):
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--app-dir", API_DIR]
+        + ["--host", "127.0.0.1", "--port", str(port)]
+        + ["--workers", str(args.workers), "--no-access-log"]
+        + ["--log-level", "warning"],
+        # Migrated by the seeding, several workers must not race to do it
+        env=dict(os.environ, DB_MIGRATE_ON_STARTUP="False"),
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            timeout=None,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            await wait_for(client, server)
+            return await drive(client, "uvicorn", dataset, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=API_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results, tolerance):
+    # Returns the regressions of `results` against the `baseline` run
+    previous = {
+        (result["transport"], result["endpoint"]): result
+        for result in baseline["results"]
+    }
+    failures = []
+    for result in results:
+        key = (result["transport"], result["endpoint"])
+        if key not in previous:
+            continue
+        before = previous[key]
+        change = dict(
+            transport=result["transport"],
+            endpoint=result["endpoint"],
+            **{
+                name: [before[name], result[name]]
+                for name in ("p50_ms", "p95_ms", "p99_ms", "requests_per_second")
+            },
+        )
+        print(json.dumps(change))
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            failures.append(
+                f"{key[0]} {key[1]}: p95 {before['p95_ms']} -> {result['p95_ms']} ms"
+            )
+        if result["requests_per_second"] < before["requests_per_second"] * (
+            1 - tolerance
+        ):
+            failures.append(
+                f"{key[0]} {key[1]}: {before['requests_per_second']} -> "
+                f"{result['requests_per_second']} requests per second"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--foods", type=int, default=200, help="Per user")
+    parser.add_argument("--categories", type=int, default=20, help="Per user")
+    parser.add_argument("--carts", type=int, default=50, help="Per user")
+    parser.add_argument("--lines", type=int, default=10, help="Per cart")
+    parser.add_argument("--requests", type=int, default=500, help="Per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests")
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        "--transport", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS)
+    )
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--output", help="Write the run as JSON to this file")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Share a p95 may grow or a throughput fall before --compare fails",
+    )
+    args = parser.parse_args()
+    overrides = dict(pair.split("=", 1) for pair in args.env)
+
+    # Read before changing directory, the paths may be relative
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    output = os.path.abspath(args.output) if args.output else None
+
+    run = dict(
+        started_at=datetime.datetime.now().isoformat(timespec="seconds"),
+        commit=commit(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        settings=dict(
+            {
+                name: getattr(args, name)
+                for name in (
+                    "users",
+                    "foods",
+                    "categories",
+                    "carts",
+                    "lines",
+                    "requests",
+                    "concurrency",
+                    "warmup",
+                    "workers",
+                    "bcrypt_rounds",
+                )
+            },
+            env=overrides,
+        ),
+        results=[],
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir, args.bcrypt_rounds, overrides)
+        # Importing the app creates the schema
+        import src.main  # noqa: F401
+
+        started = time.perf_counter()
+        dataset = seed(args.users, args.foods, args.categories, args.carts, args.lines)
+        asyncio.run(rebuild_statistics(dataset))
+        run["seed_seconds"] = round(time.perf_counter() - started, 1)
+
+        for transport in args.transport:
+            runner = run_asgi if transport == "asgi" else run_uvicorn
+            run["results"] += asyncio.run(runner(dataset, args))
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(run, file, indent=2)
+
+    failures = []
+    if baseline is not None:
+        if baseline["settings"] != run["settings"]:
+            print("The runs were made with different settings", file=sys.stderr)
+        failures = compare(baseline, run["results"], args.tolerance)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
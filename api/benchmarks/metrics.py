@@ -0,0 +1,142 @@
+# Cost of the request instrumentation. A minimal ASGI app answering a
+# request is called bare and wrapped in MetricsMiddleware, then in
+# MetricsMiddleware and QueryTimingMiddleware as src/main.py stacks them; the
+# difference per request is the overhead, which must stay under --limit
+# microseconds or this script exits with 1. Also times rendering GET /metrics
+# with --routes routes observed.
+#
+#   python -m benchmarks.metrics --requests 200000
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment():
+    # Importing src loads the whole app
+    for key, value in dict(
+        DB_CONNECTION="sqlite://",
+        DB_ASYNC="False",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+    ).items():
+        os.environ.setdefault(key, value)
+    sys.path.insert(0, API_DIR)
+
+
+class Route:
+    # Stands for the route the router leaves in the scope
+    def __init__(self, path):
+        self.path = path
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route("/api/foods/{id}")
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def per_request(app, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/api/foods/1"}
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def best_of(app, requests, repeat):
+    return min(asyncio.run(per_request(app, requests)) for _ in range(repeat))
+
+
+def render(routes, repeat):
+    from database.connect import pool_metrics
+    from src.middlewares.auth import user_cache
+    from src.utils import password_hasher
+    from src.utils.metrics import (
+        RequestMetrics,
+        cache_families,
+        hasher_families,
+        pool_families,
+        request_families,
+    )
+    from src.utils.response_cache import response_cache
+
+    metrics = RequestMetrics()
+    for i in range(routes):
+        for status in (200, 400, 404):
+            metrics.observe("GET", f"/api/route-{i}", status, i / routes)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        lines = (
+            request_families(metrics)
+            + pool_families(pool_metrics)
+            + hasher_families(password_hasher)
+            + cache_families([user_cache, response_cache])
+        )
+        body = "\n".join(lines) + "\n"
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--routes", type=int, default=50)
+    parser.add_argument(
+        "--limit", type=float, default=20, help="Microseconds allowed per request"
+    )
+    args = parser.parse_args()
+
+    setup_environment()
+    from src.middlewares import MetricsMiddleware, QueryTimingMiddleware
+
+    bare = best_of(endpoint, args.requests, args.repeat)
+    failures = []
+    for name, app in (
+        ("metrics", MetricsMiddleware(endpoint)),
+        ("metrics+queries", MetricsMiddleware(QueryTimingMiddleware(endpoint))),
+    ):
+        overhead = (best_of(app, args.requests, args.repeat) - bare) * 1e6
+        print(
+            json.dumps(
+                dict(
+                    middleware=name,
+                    requests=args.requests,
+                    bare_us=round(bare * 1e6, 2),
+                    overhead_us=round(overhead, 2),
+                )
+            )
+        )
+        if overhead > args.limit:
+            failures.append(f"{name}: {overhead:.1f} us per request")
+
+    seconds, size = render(args.routes, args.repeat)
+    print(json.dumps(dict(render=args.routes, ms=round(seconds * 1000, 2), bytes=size)))
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# Keyset pagination of the list routes, with and without the cursor row.
+#
+# Seeds --rows foods, categories and carts, most created within the same
+# second, and walks every list with ?cursor= pages of --limit rows: once as
+# is, then deleting the last row of each page before asking for the next,
+# so the cursor points to a row which no longer exists. Every walk must
+# return each remaining row exactly once, in (created_at, id) order, or this
+# script exits with 1.
+#
+# Then adds --deep foods straight through SQL and times the query of the
+# first ?cursor= page against one --depth of the way in, for each list. A
+# deep page must cost what the first one does, it exits with 1 when it takes
+# more than --deep-factor times as long.
+#
+#   python -m benchmarks.pagination --rows 50 --limit 7 --deep 200000
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTES = ("/api/foods/", "/api/categories/", "/api/carts/")
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+        # Every page must come from the database
+        RESPONSE_CACHE_URL="",
+        # Seeding the deep lists is slow on purpose
+        DB_SLOW_QUERY_MS="0",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+async def seed(client, rows):
+    for i in range(rows):
+        await client.post("/api/categories/", json={"name": f"category-{i}"})
+        await client.post("/api/foods/", data={"name": f"food-{i}"})
+        await client.post("/api/carts/", json={"name": f"cart-{i}"})
+
+
+async def walk(client, route, limit, delete):
+    # The ids of every page, deleting the last row of each when `delete`
+    returned, deleted = [], []
+    cursor = ""
+    while True:
+        response = await client.get(route, params={"cursor": cursor, "limit": limit})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        returned += [row["id"] for row in page["data"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return returned, deleted
+        if delete:
+            id = page["data"][-1]["id"]
+            response = await client.delete(f"{route}{id}")
+            assert response.status_code == 200, response.text
+            deleted.append(id)
+
+
+async def seed_deep(user_id, rows):
+    # `rows` foods, categories and carts, ten per second so that cursors also
+    # have to break ties on the id
+    from database.connect import new_session
+    from database.models import Cart, Category, Food
+    from sqlalchemy import insert
+
+    start = datetime(2020, 1, 1)
+    db = new_session()
+    try:
+        for model in (Food, Category, Cart):
+            for offset in range(0, rows, 10000):
+                await db.execute(
+                    insert(model.__table__),
+                    [
+                        dict(
+                            id=str(uuid.uuid4()),
+                            user_id=user_id,
+                            name=f"deep-{i}",
+                            created_at=start + timedelta(seconds=i // 10),
+                            updated_at=start,
+                        )
+                        for i in range(offset, min(offset + 10000, rows))
+                    ],
+                )
+        await db.commit()
+    finally:
+        await db.close()
+
+
+async def time_page(db, select, model, user_id, cursor, limit, repeat):
+    from src.utils import paginate
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await paginate(db, select(user_id, frozenset()), model, cursor, limit)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def deep_pages(user_id, rows, limit, depth, factor, repeat):
+    from database.connect import new_session
+    from database.models import Cart, Category, Food
+    from sqlalchemy import select as sql_select
+    from src.routes.carts.queries import select_carts
+    from src.routes.categories.queries import select_categories
+    from src.routes.foods.queries import select_foods
+    from src.utils.pagination import encode_cursor
+
+    await seed_deep(user_id, rows)
+    failures = []
+    db = new_session()
+    try:
+        for route, model, select in (
+            ("/api/foods/", Food, select_foods),
+            ("/api/categories/", Category, select_categories),
+            ("/api/carts/", Cart, select_carts),
+        ):
+            # The cursor of the row `depth` of the way through the list
+            row = (
+                await db.execute(
+                    sql_select(model.created_at, model.id)
+                    .where(model.user_id == user_id)
+                    .order_by(model.created_at, model.id)
+                    .offset(int(rows * depth))
+                    .limit(1)
+                )
+            ).first()
+            first = await time_page(db, select, model, user_id, "", limit, repeat)
+            deep = await time_page(
+                db, select, model, user_id, encode_cursor(row), limit, repeat
+            )
+            print(
+                json.dumps(
+                    dict(
+                        route=route,
+                        rows=rows,
+                        depth=depth,
+                        first_ms=round(first * 1000, 3),
+                        deep_ms=round(deep * 1000, 3),
+                    )
+                )
+            )
+            if deep > first * factor:
+                failures.append(
+                    f"{route}: a deep page takes {deep / first:.1f} times the first"
+                )
+    finally:
+        await db.close()
+    return failures
+
+
+async def measure(rows, limit, deep, depth, factor, repeat):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    failures = []
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            credentials = dict(username="bench", email="bench@bench", password="bench")
+            await client.post("/api/auth/register", json=credentials)
+            response = await client.post("/api/auth/login", json=credentials)
+            client.cookies.set("token", response.cookies["token"])
+            await seed(client, rows)
+
+            for route in ROUTES:
+                expected, _ = await walk(client, route, limit, delete=False)
+                returned, deleted = await walk(client, route, limit, delete=True)
+                remaining = [id for id in expected if id not in deleted]
+                print(
+                    json.dumps(
+                        dict(
+                            route=route,
+                            rows=len(expected),
+                            deleted=len(deleted),
+                            returned=len(returned),
+                        )
+                    )
+                )
+                if len(expected) != rows:
+                    failures.append(f"{route}: {len(expected)} of {rows} rows")
+                if returned != expected:
+                    failures.append(f"{route}: rows lost after deleting the cursor row")
+                after, _ = await walk(client, route, limit, delete=False)
+                if after != remaining:
+                    failures.append(f"{route}: pages differ after the deletions")
+
+            if deep:
+                user_id = (await client.get("/api/auth/whoami")).json()["id"]
+                failures += await deep_pages(
+                    user_id, deep, limit, depth, factor, repeat
+                )
+    finally:
+        await dispose_engines()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=7)
+    parser.add_argument("--deep", type=int, default=200000, help="0 to skip")
+    parser.add_argument("--depth", type=float, default=0.9)
+    parser.add_argument("--deep-factor", type=float, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        failures = asyncio.run(
+            measure(
+                args.rows,
+                args.limit,
+                args.deep,
+                args.depth,
+                args.deep_factor,
+                args.repeat,
+            )
+        )
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
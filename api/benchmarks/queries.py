@@ -0,0 +1,173 @@
+# SQL statements issued per request by the list and detail routes, as the
+# number of rows grows. Relations are batch loaded (database/loading.py), so
+# the count must stay the same from a few rows to many; a count that grows
+# with the rows is an N+1 regression and makes this script exit with 1.
+#
+# Every route is also requested with ?expand= (no relations), which must not
+# cost more statements than the default. Each count is also pinned in ROUTES,
+# a route issuing more statements than pinned fails too: lower the pin when a
+# change saves statements. The counts are read from each
+# response's Server-Timing header. --budget sets DB_QUERY_BUDGET while they are
+# requested, so a route issuing more statements fails with the one over
+# budget.
+#
+#   python -m benchmarks.queries --rows 5 50 --budget 4
+#
+# Requires httpx.
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Route, params, most statements with the relations and with ?expand=
+ROUTES = (
+    ("/api/foods/", {}, 3, 2),
+    ("/api/foods/", {"cursor": "", "limit": 1000}, 3, 2),
+    ("/api/foods/food-0", {}, 3, 2),
+    ("/api/categories/", {}, 3, 2),
+    ("/api/categories/category-0", {}, 3, 2),
+    ("/api/carts/", {}, 4, 2),
+    ("/api/carts/cart-0", {}, 4, 2),
+)
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+        # Count the statements behind every response, not cache hits
+        RESPONSE_CACHE_URL="",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def count_statements(response):
+    # db;dur=1.2;desc="3 queries"
+    timing = re.search(r'db;[^,]*desc="(\d+) quer', response.headers["server-timing"])
+    return int(timing.group(1))
+
+
+async def seed(client, start, stop):
+    # Every food is in three categories and every cart holds three foods
+    for i in range(start, stop):
+        categories = ",".join(f"category-{(i + j) % stop}" for j in range(3))
+        await client.post(
+            "/api/foods/", data={"name": f"food-{i}", "categories": categories}
+        )
+    for i in range(start, stop):
+        foods = [f"food-{(i + j) % stop}" for j in range(3)]
+        await client.post("/api/carts/", json={"name": f"cart-{i}", "foods": foods})
+
+
+async def measure(rows, budget):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    # The module, `database.engine` is also the name of the Engine
+    engine = importlib.import_module("database.engine")
+
+    results = []
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            credentials = dict(username="bench", email="bench@bench", password="bench")
+            await client.post("/api/auth/register", json=credentials)
+            response = await client.post("/api/auth/login", json=credentials)
+            client.cookies.set("token", response.cookies["token"])
+
+            seeded = 0
+            for count in rows:
+                engine.DB_QUERY_BUDGET = 0
+                await seed(client, seeded, count)
+                seeded = count
+                engine.DB_QUERY_BUDGET = budget
+                for path, params, *pinned in ROUTES:
+                    for expand, maximum in zip((None, ""), pinned):
+                        if expand is not None:
+                            params = dict(params, expand=expand)
+                        result = dict(
+                            route=path, params=params, rows=count, maximum=maximum
+                        )
+                        try:
+                            response = await client.get(path, params=params)
+                        except engine.QueryBudgetExceeded as e:
+                            results.append(dict(result, error=str(e)))
+                            continue
+                        assert response.status_code == 200, response.text
+                        results.append(
+                            dict(result, statements=count_statements(response))
+                        )
+    finally:
+        await dispose_engines()
+    return results
+
+
+def regressions(results):
+    # Group by route, every row count must issue as many statements as the
+    # smallest, and ?expand= no more than the default
+    failures = [result["error"] for result in results if "error" in result]
+    results = [result for result in results if "error" not in result]
+    for result in results:
+        if result["statements"] > result["maximum"]:
+            failures.append(
+                f"{result['route']} {json.dumps(result['params'])}: "
+                f"{result['statements']} statements, pinned at {result['maximum']}"
+            )
+    by_route = {}
+    for result in results:
+        key = (result["route"], json.dumps(result["params"], sort_keys=True))
+        by_route.setdefault(key, []).append(result)
+    for (route, params), measured in by_route.items():
+        if len({result["statements"] for result in measured}) > 1:
+            failures.append(f"{route} {params}: statements grow with the rows")
+    for result in results:
+        if "expand" not in result["params"]:
+            continue
+        default = dict(result["params"])
+        default.pop("expand")
+        key = (result["route"], json.dumps(default, sort_keys=True))
+        if key not in by_route:
+            continue
+        baseline = by_route[key][0]["statements"]
+        if result["statements"] > baseline:
+            failures.append(f"{result['route']}: ?expand= costs more than default")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[5, 50])
+    parser.add_argument(
+        "--budget", type=int, default=0, help="Statements allowed per request"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        results = asyncio.run(measure(sorted(args.rows), args.budget))
+
+    for result in results:
+        print(json.dumps(result))
+    failures = regressions(results)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
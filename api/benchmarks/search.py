@@ -0,0 +1,169 @@
+# Latency of GET /api/foods/search on a large catalogue.
+#
+# Seeds one user with --foods foods (names built from a word list, three
+# categories each) straight through SQL, so the search triggers index them
+# like foods created through the API, then times typeahead style queries:
+# short prefixes, whole words, several words and a match inside a word.
+#
+# The first foods are named as some queries, before thousands of newer foods
+# matching those queries too: each must still come first, or this script
+# exits with 1.
+#
+#   python -m benchmarks.search --foods 100000
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADJECTIVES = (
+    "fresh green red sweet spicy smoked roasted frozen dried organic wild "
+    "baby crispy creamy salted sour golden dark whole sliced"
+).split()
+NOUNS = (
+    "tomato potato apple banana cheese bread butter yogurt tea coffee rice "
+    "pasta chicken salmon tuna lentil bean carrot onion garlic pepper mango "
+    "orange lemon almond walnut honey oat cereal soup sauce"
+).split()
+CATEGORIES = (
+    "vegetables fruit dairy bakery drinks pantry meat fish snacks frozen "
+    "breakfast spices"
+).split()
+QUERIES = ("to", "tom", "tomato", "smoked sal", "organic green tea", "mato", "dairy")
+# Query: the name which must come first
+RANKED = {
+    "tomato": "Tomato",
+    "tomato sauce": "Tomato sauce",
+    "tomato sa": "Tomato sauce",
+}
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+        # Time the search, not cache hits
+        RESPONSE_CACHE_URL="",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def seed(user_id, foods):
+    from database import engine
+
+    random.seed(0)
+    categories = [(str(uuid.uuid4()), user_id, name) for name in CATEGORIES]
+    # Oldest first, the search reads the newest matches
+    rows = [(str(uuid.uuid4()), user_id, name, "") for name in set(RANKED.values())]
+    links = []
+    for i in range(foods):
+        food_id = str(uuid.uuid4())
+        name = f"{random.choice(ADJECTIVES)} {random.choice(NOUNS)} {i}"
+        description = " ".join(random.choices(ADJECTIVES + NOUNS, k=6))
+        rows.append((food_id, user_id, name, description))
+        for category in random.sample(categories, 3):
+            links.append((category[0], food_id))
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO categories (id, user_id, name) VALUES (?, ?, ?)",
+            categories,
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO foods (id, user_id, name, description) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO category_foods (category_id, food_id) VALUES (?, ?)", links
+        )
+
+
+async def measure(foods, repeat):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    results = []
+    failures = []
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        credentials = dict(username="bench", email="bench@bench", password="bench")
+        await client.post("/api/auth/register", json=credentials)
+        response = await client.post("/api/auth/login", json=credentials)
+        client.cookies.set("token", response.cookies["token"])
+        user_id = (await client.get("/api/auth/whoami")).json()["id"]
+
+        started = time.perf_counter()
+        seed(user_id, foods)
+        print(
+            json.dumps(
+                dict(foods=foods, seed_seconds=round(time.perf_counter() - started, 1))
+            )
+        )
+
+        for q in QUERIES:
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = await client.get(
+                    "/api/foods/search", params={"q": q, "limit": 10}
+                )
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+            latencies.sort()
+            results.append(
+                dict(
+                    q=q,
+                    results=len(response.json()),
+                    first=response.json()[0]["name"] if response.json() else None,
+                    p50_ms=round(latencies[len(latencies) // 2] * 1000, 2),
+                    p95_ms=round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+                )
+            )
+
+        for q, name in RANKED.items():
+            response = await client.get(
+                "/api/foods/search", params={"q": q, "limit": 5}
+            )
+            found = [food["name"] for food in response.json()]
+            if found[:1] != [name]:
+                failures.append(f"{q!r}: {name!r} not first in {found}")
+
+    await dispose_engines()
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--foods", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        results, failures = asyncio.run(measure(args.foods, args.repeat))
+    for result in results:
+        print(json.dumps(result))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# Time to turn loaded foods into a JSON body, per serialization path.
+#
+#   to_dict    - Food.to_dict, then FastAPI's jsonable_encoder + JSONResponse,
+#                how the list routes rendered before src/utils/serializers.py
+#   serializer - serialize_food field plan, then orjson, as the routes do now
+#
+# The foods are built in memory with their categories attached, like rows
+# loaded by select_foods, so only serialization is measured.
+#
+# First checks that the field plans give the documents of the models'
+# to_dict, keys in the same order, for a food, a category and a cart, with
+# their relations and without (expand_plan with an empty ?expand=). Exits
+# with 1 when one differs.
+#
+#   python -m benchmarks.serialization --foods 10000
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment():
+    # Importing src loads the whole app
+    for key, value in dict(
+        DB_CONNECTION="sqlite://",
+        DB_ASYNC="False",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+    ).items():
+        os.environ.setdefault(key, value)
+    sys.path.insert(0, API_DIR)
+
+
+def make_foods(count, categories_per_food):
+    from database.models import Category, Food
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    now = datetime.datetime(2021, 6, 1, 12, 30, 15)
+    categories = [
+        Category(id=f"category-{i}", name=f"category-{i}", created_at=now)
+        for i in range(50)
+    ]
+    foods = []
+    for i in range(count):
+        food = Food(
+            id=f"food-{i}",
+            user_id="user",
+            name=f"food-{i}",
+            description="Something to eat",
+            image=f"static/{i:064x}.png",
+            image_variants={"thumb": f"static/{i:064x}.thumb.webp"},
+            created_at=now,
+            updated_at=now,
+        )
+        # As loaded, without filling the categories' side of the relationship
+        set_committed_value(
+            food,
+            "categories",
+            [categories[(i + j) % len(categories)] for j in range(categories_per_food)],
+        )
+        foods.append(food)
+    return foods
+
+
+def make_documents():
+    # A food, a category and a cart with their relations, as loaded
+    from database.models import Cart, Category, Food
+    from database.relationships import CartFood
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    now = datetime.datetime(2021, 6, 1, 12, 30, 15, 123456)
+    category = Category(
+        id="category", user_id="user", name="Fruit", created_at=now, updated_at=now
+    )
+    food = Food(
+        id="food",
+        user_id="user",
+        name="Apple",
+        description=None,
+        image="static/apple.png",
+        image_variants={"thumb": "static/apple.thumb.webp"},
+        created_at=now,
+        updated_at=now,
+    )
+    plain = Food(
+        id="plain", user_id="user", name="Rice", created_at=now, updated_at=now
+    )
+    # Without filling the other side: to_dict walks the related objects and
+    # would go round in circles
+    set_committed_value(food, "categories", [category])
+    set_committed_value(plain, "categories", [])
+    listed = Category(
+        id="listed", user_id="user", name="Pantry", created_at=now, updated_at=now
+    )
+    set_committed_value(listed, "foods", [plain])
+
+    cart = Cart(
+        id="cart",
+        user_id="user",
+        name="Groceries",
+        status="Started",
+        created_at=now,
+        updated_at=now,
+    )
+    items = [
+        CartFood(cart_id="cart", food_id="food", food_qty=3),
+        CartFood(cart_id="cart", food_id="gone", food_qty=1),
+    ]
+    set_committed_value(items[0], "foods", food)
+    set_committed_value(items[1], "foods", None)
+    set_committed_value(cart, "foods", items)
+    return [
+        (food, "categories"),
+        (plain, "categories"),
+        (category, "foods"),
+        (cart, "foods"),
+    ]
+
+
+def check_plans():
+    # Differences between the field plans and to_dict, empty when none
+    from fastapi.encoders import jsonable_encoder
+    from src.utils.serializers import (
+        expand_plan,
+        serialize_cart,
+        serialize_category,
+        serialize_food,
+    )
+
+    plans = dict(Food=serialize_food, Category=serialize_category, Cart=serialize_cart)
+    failures = []
+    for obj, relation in make_documents():
+        name = type(obj).__name__
+        expected = jsonable_encoder(obj.to_dict())
+        for expand in (frozenset([relation]), frozenset()):
+            wanted = {
+                key: value
+                for key, value in expected.items()
+                if key != relation or relation in expand
+            }
+            document = json.loads(
+                render_document(expand_plan(plans[name], expand)(obj))
+            )
+            if document != wanted or list(document) != list(wanted):
+                failures.append(
+                    f"{name} {obj.id} expand={sorted(expand)}: {document} != {wanted}"
+                )
+    return failures
+
+
+def render_document(document):
+    import orjson
+
+    return orjson.dumps(document)
+
+
+def render_to_dict(foods):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    return JSONResponse(jsonable_encoder([food.to_dict() for food in foods])).body
+
+
+def render_serializer(foods):
+    import orjson
+    from src.utils.serializers import serialize_food
+
+    return orjson.dumps([serialize_food(food) for food in foods])
+
+
+def best_of(fn, foods, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(foods)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--foods", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_environment()
+    failures = check_plans()
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+    foods = make_foods(args.foods, args.categories)
+
+    # Both paths must produce the same document
+    assert json.loads(render_to_dict(foods)) == json.loads(render_serializer(foods))
+
+    for name, fn in (("to_dict", render_to_dict), ("serializer", render_serializer)):
+        seconds = best_of(fn, foods, args.repeat)
+        print(
+            json.dumps(
+                dict(
+                    path=name,
+                    foods=args.foods,
+                    ms=round(seconds * 1000, 1),
+                    foods_per_second=round(args.foods / seconds),
+                )
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
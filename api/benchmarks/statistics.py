@@ -0,0 +1,224 @@
+# Latency of GET /api/statistics on a long cart history.
+#
+# Seeds one user with --foods foods in two of 20 categories each and --carts
+# carts of --items lines (1M cart lines by default) straight through SQL and
+# builds the statistics rollups. Then times each statistic summed from the
+# cart lines against read from the rollups, the endpoint with the response
+# cache off, and cart updates, which maintain the rollups, before checking
+# the rollups still match the cart lines.
+#
+#   python -m benchmarks.statistics --carts 10000 --items 100
+#
+# Requires httpx.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_environment(workdir):
+    os.environ.update(
+        DB_CONNECTION=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        APP_NAME="Shoppingify",
+        DEBUG_MODE="False",
+        HOST="127.0.0.1",
+        PORT="8000",
+        secret="benchmark-secret-key-benchmark-secret-key",
+        algorithm="HS256",
+        DOMAIN="http://127.0.0.1:8000/",
+        BCRYPT_ROUNDS="4",
+        # Time the statistics, not cache hits
+        RESPONSE_CACHE_URL="",
+    )
+    os.environ.setdefault("DB_ASYNC", "True")
+    os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, API_DIR)
+
+
+def seed(user_id, foods, carts, items):
+    from database import engine
+
+    random.seed(0)
+    food_ids = [str(uuid.uuid4()) for _ in range(foods)]
+    category_ids = [str(uuid.uuid4()) for _ in range(20)]
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO foods (id, user_id, name) VALUES (?, ?, ?)",
+            [(id, user_id, f"food-{i}") for i, id in enumerate(food_ids)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO categories (id, user_id, name) VALUES (?, ?, ?)",
+            [(id, user_id, f"category-{i}") for i, id in enumerate(category_ids)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO category_foods (category_id, food_id) VALUES (?, ?)",
+            [
+                (category_ids[(i + offset) % 20], id)
+                for i, id in enumerate(food_ids)
+                for offset in (0, 7)
+            ],
+        )
+        for i in range(carts):
+            cart_id = str(uuid.uuid4())
+            connection.exec_driver_sql(
+                "INSERT INTO carts (id, user_id, name, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    cart_id,
+                    user_id,
+                    f"cart-{i}",
+                    "Completed",
+                    f"{2020 + i * 5 // carts}-{1 + i % 12:02d}-01 10:00:00",
+                ),
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO carts_foods (cart_id, user_id, food_id, food_qty) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (cart_id, user_id, food_id, 1 + random.randrange(5))
+                    for food_id in random.sample(food_ids, items)
+                ],
+            )
+
+
+def time_statements(user_id, repeat):
+    from database import engine
+    from src.routes.statistics.queries import (
+        quantities_by_category,
+        quantities_by_food,
+        quantities_by_month,
+        select_monthly,
+        select_top_categories,
+        select_top_foods,
+    )
+
+    statements = dict(
+        summed_foods=quantities_by_food(user_id),
+        summed_categories=quantities_by_category(user_id),
+        summed_monthly=quantities_by_month(user_id),
+        rollup_top_foods=select_top_foods(user_id, 10),
+        rollup_top_categories=select_top_categories(user_id, 10),
+        rollup_monthly=select_monthly(user_id),
+    )
+    results = {}
+    with engine.connect() as connection:
+        for name, statement in statements.items():
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                connection.execute(statement).all()
+                latencies.append(time.perf_counter() - started)
+            results[f"{name}_ms"] = round(sorted(latencies)[repeat // 2] * 1000, 1)
+    return results
+
+
+async def rebuild(user_id):
+    from database.connect import new_session
+    from src.routes.statistics import rollups
+
+    db = new_session()
+    try:
+        await rollups.rebuild(db, user_id)
+        await db.commit()
+    finally:
+        await db.close()
+
+
+async def check(user_id):
+    from database.connect import new_session
+    from src.routes.statistics import rollups
+
+    db = new_session()
+    try:
+        return await rollups.check(db, user_id)
+    finally:
+        await db.close()
+
+
+async def measure(foods, carts, items, repeat):
+    import httpx
+    from database.connect import dispose_engines
+    from src.main import app
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        credentials = dict(username="bench", email="bench@bench", password="bench")
+        await client.post("/api/auth/register", json=credentials)
+        response = await client.post("/api/auth/login", json=credentials)
+        client.cookies.set("token", response.cookies["token"])
+        user_id = (await client.get("/api/auth/whoami")).json()["id"]
+
+        started = time.perf_counter()
+        seed(user_id, foods, carts, items)
+        seeded = time.perf_counter()
+        await rebuild(user_id)
+        print(
+            json.dumps(
+                dict(
+                    cart_lines=carts * items,
+                    seed_seconds=round(seeded - started, 1),
+                    rebuild_seconds=round(time.perf_counter() - seeded, 1),
+                )
+            )
+        )
+
+        result = time_statements(user_id, repeat)
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = await client.get("/api/statistics/")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+        latencies.sort()
+        result.update(
+            endpoint_p50_ms=round(latencies[repeat // 2] * 1000, 1),
+            endpoint_p95_ms=round(latencies[int(repeat * 0.95)] * 1000, 1),
+        )
+
+        # Replace the lines of carts, the rollups change by the difference
+        names = [f"food-{i}" for i in range(foods)]
+        carts = (
+            await client.get("/api/carts/", params={"page": 1, "limit": repeat})
+        ).json()
+        latencies = []
+        for cart in carts:
+            started = time.perf_counter()
+            response = await client.put(
+                f"/api/carts/{cart['id']}",
+                json=dict(name=cart["name"], foods=random.choices(names, k=items)),
+            )
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+        latencies.sort()
+        result.update(
+            cart_update_p50_ms=round(latencies[len(latencies) // 2] * 1000, 1),
+            rollups_match=not await check(user_id),
+        )
+
+    await dispose_engines()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--foods", type=int, default=2000)
+    parser.add_argument("--carts", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_environment(workdir)
+        result = asyncio.run(measure(args.foods, args.carts, args.items, args.repeat))
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,153 @@
 from decouple import config
-from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from .engine import PoolMetrics, make_engine
 
 SQLALCHEMY_DATABASE_URL = config("DB_CONNECTION")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Serve requests through AsyncSession on an async driver (default), or through
+# the synchronous driver with every call pushed onto the threadpool.
+DB_ASYNC = config("DB_ASYNC", default=True, cast=bool)
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+
+def to_async_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+pool_metrics = {"sync": PoolMetrics(engine)}
+
+if DB_ASYNC:
+    async_engine = make_engine(
+        config("DB_ASYNC_CONNECTION", default=None)
+        or to_async_url(SQLALCHEMY_DATABASE_URL),
+        is_async=True,
+    )
+    pool_metrics["async"] = PoolMetrics(async_engine)
+    AsyncSessionLocal = sessionmaker(
+        async_engine,
+        class_=AsyncSession,
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+    )
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
+class ThreadedSession:
+    # Awaitable facade over a synchronous Session, mirroring the AsyncSession
+    # methods the routes use. Each call, including fetching the rows, runs on
+    # the threadpool so the event loop is never blocked by the driver.
+
+    def __init__(self, sync_session):
+        self.sync_session = sync_session
+
+    async def _run(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        def execute():
+            result = self.sync_session.execute(statement, *args, **kwargs)
+            # DML results carry no rows to buffer
+            if getattr(result, "returns_rows", True):
+                result = result.freeze()()
+            return result
+
+        return await self._run(execute)
+
+    async def stream(self, statement, *args, **kwargs):
+        # Rows stay on the cursor and are fetched a partition at a time
+        statement = statement.execution_options(stream_results=True)
+        result = await self._run(self.sync_session.execute, statement, *args, **kwargs)
+        return ThreadedResult(result)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await self._run(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        result = await self.execute(statement, *args, **kwargs)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    async def merge(self, instance, **kwargs):
+        return await self._run(self.sync_session.merge, instance, **kwargs)
+
+    async def refresh(self, instance, attribute_names=None):
+        return await self._run(self.sync_session.refresh, instance, attribute_names)
+
+    async def delete(self, instance):
+        return await self._run(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None):
+        return await self._run(self.sync_session.flush, objects)
+
+    async def commit(self):
+        return await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        return await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        return await self._run(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._run(fn, self.sync_session, *args, **kwargs)
+
+
+class ThreadedResult:
+    # Awaitable facade over an unbuffered Result, mirroring the AsyncResult
+    # returned by AsyncSession.stream
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        partitions = self.result.partitions(size)
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                return
+            yield partition
+
+    async def close(self):
+        await run_in_threadpool(self.result.close)
+
+
+async def dispose_engines():
+    # Close pooled connections, aiosqlite keeps a worker thread per connection
+    if DB_ASYNC:
+        await async_engine.dispose()
+    engine.dispose()
+
+
+def new_session():
+    # A session outside of a request, e.g. for background tasks and commands
+    if DB_ASYNC:
+        return AsyncSessionLocal()
+    return ThreadedSession(SessionLocal(expire_on_commit=False))
+
+
+async def get_db():
+    db = new_session()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
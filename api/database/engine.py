@@ -0,0 +1,205 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from decouple import config
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Pooling, applies to every database except in-memory SQLite
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=5, cast=int)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", default=10, cast=int)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", default=1800, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", default=30, cast=int)
+DB_POOL_PRE_PING = config("DB_POOL_PRE_PING", default=True, cast=bool)
+
+# SQLite connection pragmas
+SQLITE_JOURNAL_MODE = config("SQLITE_JOURNAL_MODE", default="WAL")
+SQLITE_SYNCHRONOUS = config("SQLITE_SYNCHRONOUS", default="NORMAL")
+SQLITE_BUSY_TIMEOUT = config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int)
+SQLITE_CACHE_SIZE = config("SQLITE_CACHE_SIZE", default=-64000, cast=int)
+SQLITE_MMAP_SIZE = config("SQLITE_MMAP_SIZE", default=268435456, cast=int)
+
+# Statements slower than this are logged with the route that issued them,
+# 0 disables the log
+DB_SLOW_QUERY_MS = config("DB_SLOW_QUERY_MS", default=200, cast=float)
+# Statements a request may issue before QueryBudgetExceeded is raised, 0 for
+# no limit. Set it when running tests so a route whose count regresses fails.
+DB_QUERY_BUDGET = config("DB_QUERY_BUDGET", default=0, cast=int)
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    # Counts pool events for one engine
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+
+        pool_events = engine.sync_engine if hasattr(engine, "sync_engine") else engine
+        event.listen(pool_events, "connect", self.on_connect)
+        event.listen(pool_events, "checkout", self.on_checkout)
+        event.listen(pool_events, "checkin", self.on_checkin)
+        event.listen(pool_events, "invalidate", self.on_invalidate)
+
+    def on_connect(self, *args):
+        self.connects += 1
+
+    def on_checkout(self, *args):
+        self.checkouts += 1
+
+    def on_checkin(self, *args):
+        self.checkins += 1
+
+    def on_invalidate(self, *args):
+        self.invalidations += 1
+
+    def stats(self):
+        pool = self.engine.pool
+        data = dict(
+            connects=self.connects,
+            checkouts=self.checkouts,
+            checkins=self.checkins,
+            invalidations=self.invalidations,
+        )
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+            )
+        return data
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestQueries:
+    # Statements issued while handling one request, see track_queries
+
+    def __init__(self, scope=None, budget=None):
+        self.scope = scope or {}
+        self.budget = DB_QUERY_BUDGET if budget is None else budget
+        self.count = 0
+        self.duration = 0.0
+
+    @property
+    def route(self):
+        # The route's path template once routed, "/api/foods/{id}"
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or self.scope.get("path", "")
+        return f"{self.scope.get('method', '')} {path}".strip()
+
+    def server_timing(self):
+        queries = "query" if self.count == 1 else "queries"
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} {queries}"'
+
+
+current_queries = ContextVar("current_queries", default=None)
+
+
+@contextmanager
+def track_queries(scope=None, budget=None):
+    # Counts the statements of every engine issued in this context, threads
+    # started with run_in_threadpool and greenlets included
+    queries = RequestQueries(scope, budget)
+    token = current_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        current_queries.reset(token)
+
+
+def instrument_queries(engine):
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        queries = current_queries.get()
+        if queries is not None:
+            queries.count += 1
+            if queries.budget and queries.count > queries.budget:
+                raise QueryBudgetExceeded(
+                    f"{queries.route} issued more than {queries.budget} "
+                    f"statements, the last one: {statement}"
+                )
+        context.query_started = time.perf_counter()
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_started
+        queries = current_queries.get()
+        if queries is not None:
+            queries.duration += elapsed
+        if DB_SLOW_QUERY_MS and elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query, %.1f ms in %s: %s",
+                elapsed * 1000,
+                queries.route if queries else "no request",
+                statement,
+            )
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    event.listen(engine, "after_cursor_execute", after_execute)
+
+
+def sqlite_pragmas(url):
+    pragmas = [
+        f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}",
+        f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}",
+        f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}",
+        # Off by default in SQLite, the ON DELETE CASCADE rules rely on it
+        "PRAGMA foreign_keys = ON",
+    ]
+    # WAL and mmap only make sense for a database file
+    if url.database and url.database != ":memory:":
+        pragmas += [
+            f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}",
+            f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}",
+        ]
+    return pragmas
+
+
+def apply_pragmas(engine, pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    event.listen(engine, "connect", on_connect)
+
+
+def make_engine(url, is_async=False):
+    url = make_url(url)
+    options = {}
+    is_sqlite = url.get_backend_name() == "sqlite"
+
+    if is_sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+
+    if not (is_sqlite and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=AsyncAdaptedQueuePool if is_async else QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+
+    if is_async:
+        engine = create_async_engine(url, **options)
+        sync_engine = engine.sync_engine
+    else:
+        engine = sync_engine = create_engine(url, **options)
+
+    if is_sqlite:
+        apply_pragmas(sync_engine, sqlite_pragmas(url))
+    instrument_queries(sync_engine)
+
+    return engine
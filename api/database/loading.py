@@ -0,0 +1,42 @@
+from sqlalchemy.orm import raiseload, selectinload
+
+from .models import Cart, Category, Food
+from .relationships import CartFood
+
+# The relations the API serializes, by attribute name (also the key they are
+# serialized under), and how to load them. Every list and detail route loads
+# through here. selectinload batches each relation into one
+# SELECT ... WHERE id IN (...) per statement, so a page of rows costs the
+# same number of queries however many rows or related rows it holds.
+RELATIONS = {
+    Food: {"categories": selectinload(Food.categories)},
+    Category: {"foods": selectinload(Category.foods)},
+    Cart: {"foods": selectinload(Cart.foods).selectinload(CartFood.foods)},
+}
+
+
+def parse_expand(model, expand: str = None):
+    # `?expand=` query parameter: missing expands every relation, empty
+    # expands none, otherwise a comma separated list of relation keys
+    if expand is None:
+        return frozenset(RELATIONS[model])
+    names = frozenset(name.strip() for name in expand.split(",") if name.strip())
+    unknown = names - RELATIONS[model].keys()
+    if unknown:
+        raise ValueError(
+            f"Cannot expand '{', '.join(sorted(unknown))}', "
+            f"expected any of '{', '.join(RELATIONS[model])}'."
+        )
+    return names
+
+
+def loader_options(model, expand: frozenset = None):
+    options = []
+    for name, loader in RELATIONS[model].items():
+        if expand is None or name in expand:
+            options.append(loader)
+        else:
+            # Skipped relations are never queried, reading one by mistake
+            # raises instead of lazy loading a query per row
+            options.append(raiseload(getattr(model, name)))
+    return options
@@ -0,0 +1,37 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from decouple import config
+from sqlalchemy import inspect
+
+from .connect import engine
+
+# Upgrade the database when the app starts. Turn off when running several
+# workers, and run `python manage.py migrate` before starting them instead.
+DB_MIGRATE_ON_STARTUP = config("DB_MIGRATE_ON_STARTUP", default=True, cast=bool)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# The schema Base.metadata.create_all built before there were migrations
+BASELINE = "0001"
+
+
+def alembic_config():
+    # Without alembic.ini, which would reconfigure the app's logging
+    alembic = Config()
+    alembic.set_main_option("script_location", MIGRATIONS_DIR)
+    return alembic
+
+
+def upgrade_database(revision: str = "head"):
+    alembic = alembic_config()
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+        has_tables = inspect(connection).has_table("users")
+
+    if current is None and has_tables:
+        # Created by create_all, 0002 catches up whatever it already built
+        command.stamp(alembic, BASELINE)
+    command.upgrade(alembic, revision)
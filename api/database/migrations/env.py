@@ -0,0 +1,47 @@
+from logging.config import fileConfig
+
+from alembic import context
+from database import Base, engine
+
+# Register every table on Base.metadata for autogenerate
+import database.models  # noqa: F401
+import database.relationships  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # The search index is created in SQL by 0004, not from the models
+    return not (type_ == "table" and name.startswith("foods_search"))
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        is_sqlite = connection.dialect.name == "sqlite"
+        if is_sqlite:
+            # SQLite alters tables by copying them, with foreign keys on
+            # dropping the original would cascade to the rows referencing it
+            connection.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=target_metadata,
+                include_name=include_name,
+                # SQLite can only change constraints through batch mode
+                render_as_batch=True,
+            )
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if is_sqlite:
+                connection.exec_driver_sql("PRAGMA foreign_keys = ON")
+
+
+if context.is_offline_mode():
+    # 0002 and 0003 inspect the database to decide what to change
+    raise SystemExit("Offline (--sql) migrations are not supported.")
+run_migrations_online()
@@ -0,0 +1,92 @@
+"""Baseline, the schema create_all built before migrations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def timestamps():
+    return (
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column("email", sa.String),
+        sa.Column("username", sa.String),
+        sa.Column("password", sa.String),
+        *timestamps(),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "foods",
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column("image", sa.String),
+        sa.Column("name", sa.String),
+        sa.Column("description", sa.String),
+        *timestamps(),
+        sa.Column("user_id", sa.Text, sa.ForeignKey("users.id")),
+        sa.UniqueConstraint("user_id", "name"),
+    )
+    op.create_index("ix_foods_name", "foods", ["name"])
+
+    op.create_table(
+        "categories",
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column("name", sa.String),
+        sa.Column("description", sa.String),
+        *timestamps(),
+        sa.Column("user_id", sa.Text, sa.ForeignKey("users.id")),
+        sa.UniqueConstraint("user_id", "name"),
+    )
+    op.create_index("ix_categories_name", "categories", ["name"])
+
+    op.create_table(
+        "carts",
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column("name", sa.String),
+        sa.Column("status", sa.String),
+        *timestamps(),
+        sa.Column("user_id", sa.Text, sa.ForeignKey("users.id")),
+        sa.UniqueConstraint("user_id", "name"),
+    )
+    op.create_index("ix_carts_name", "carts", ["name"], unique=True)
+
+    op.create_table(
+        "category_foods",
+        sa.Column("category_id", sa.Text, sa.ForeignKey("categories.id")),
+        sa.Column("food_id", sa.Text, sa.ForeignKey("foods.id")),
+    )
+
+    op.create_table(
+        "carts_foods",
+        sa.Column("cart_id", sa.Text, sa.ForeignKey("carts.id")),
+        sa.Column("user_id", sa.Text, sa.ForeignKey("users.id")),
+        sa.Column("food_id", sa.Text, sa.ForeignKey("foods.id")),
+        sa.Column("food_qty", sa.Integer),
+        sa.PrimaryKeyConstraint("cart_id", "food_id"),
+    )
+
+
+def downgrade():
+    for table in ("carts_foods", "category_foods", "carts", "categories", "foods"):
+        op.drop_table(table)
+    op.drop_table("users")
@@ -0,0 +1,52 @@
+"""Keyset indexes, image variants and collection versions
+
+Added to the models while create_all still built the schema, so a database
+stamped with the baseline may already have any of them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Keyset pagination, see src/utils/pagination.py
+KEYSET_INDEXES = {
+    table: f"ix_{table}_user_id_created_at_id"
+    for table in ("foods", "categories", "carts")
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    columns = {column["name"] for column in inspector.get_columns("foods")}
+    if "image_variants" not in columns:
+        op.add_column("foods", sa.Column("image_variants", sa.JSON(none_as_null=True)))
+
+    for table, name in KEYSET_INDEXES.items():
+        if name not in {index["name"] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, ["user_id", "created_at", "id"])
+
+    if not inspector.has_table("collection_versions"):
+        op.create_table(
+            "collection_versions",
+            sa.Column("user_id", sa.Text, sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("collection", sa.String(32), primary_key=True),
+            sa.Column("version", sa.Integer, nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table("collection_versions")
+    for table, name in KEYSET_INDEXES.items():
+        op.drop_index(name, table_name=table)
+    with op.batch_alter_table("foods") as batch:
+        batch.drop_column("image_variants")
@@ -0,0 +1,192 @@
+"""Association table keys and ON DELETE CASCADE
+
+category_foods gets a (category_id, food_id) primary key, both association
+tables an index on food_id, and every foreign key to users, foods, carts and
+categories deletes the rows referencing a deleted row.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# The tables as this revision leaves them, SQLite copies them into these
+metadata = sa.MetaData()
+
+
+def timestamps():
+    return (
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+
+
+def references(column, target, **kwargs):
+    return sa.Column(
+        column, sa.Text, sa.ForeignKey(target, ondelete="CASCADE"), **kwargs
+    )
+
+
+TABLES = {
+    "foods": sa.Table(
+        "foods",
+        metadata,
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column("image", sa.String),
+        sa.Column("image_variants", sa.JSON(none_as_null=True)),
+        sa.Column("name", sa.String),
+        sa.Column("description", sa.String),
+        *timestamps(),
+        references("user_id", "users.id"),
+        sa.UniqueConstraint("user_id", "name"),
+        sa.Index("ix_foods_name", "name"),
+        sa.Index("ix_foods_user_id_created_at_id", "user_id", "created_at", "id"),
+    ),
+    "categories": sa.Table(
+        "categories",
+        metadata,
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column("name", sa.String),
+        sa.Column("description", sa.String),
+        *timestamps(),
+        references("user_id", "users.id"),
+        sa.UniqueConstraint("user_id", "name"),
+        sa.Index("ix_categories_name", "name"),
+        sa.Index("ix_categories_user_id_created_at_id", "user_id", "created_at", "id"),
+    ),
+    "carts": sa.Table(
+        "carts",
+        metadata,
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column("name", sa.String),
+        sa.Column("status", sa.String),
+        *timestamps(),
+        references("user_id", "users.id"),
+        sa.UniqueConstraint("user_id", "name"),
+        sa.Index("ix_carts_name", "name", unique=True),
+        sa.Index("ix_carts_user_id_created_at_id", "user_id", "created_at", "id"),
+    ),
+    "collection_versions": sa.Table(
+        "collection_versions",
+        metadata,
+        references("user_id", "users.id", primary_key=True),
+        sa.Column("collection", sa.String(32), primary_key=True),
+        sa.Column("version", sa.Integer, nullable=False),
+    ),
+    "carts_foods": sa.Table(
+        "carts_foods",
+        metadata,
+        references("cart_id", "carts.id"),
+        references("user_id", "users.id"),
+        references("food_id", "foods.id"),
+        sa.Column("food_qty", sa.Integer),
+        sa.PrimaryKeyConstraint("cart_id", "food_id"),
+        sa.Index("ix_carts_foods_food_id", "food_id"),
+    ),
+}
+
+# Rows left behind by deletes that did not cascade, in the order deleting
+# them uncovers more: (table, column, referenced table)
+ORPHANS = (
+    ("foods", "user_id", "users"),
+    ("categories", "user_id", "users"),
+    ("carts", "user_id", "users"),
+    ("collection_versions", "user_id", "users"),
+    ("carts_foods", "user_id", "users"),
+    ("carts_foods", "cart_id", "carts"),
+    ("carts_foods", "food_id", "foods"),
+)
+
+
+def delete_orphans():
+    for table, column, target in ORPHANS:
+        op.execute(
+            f"DELETE FROM {table} WHERE {column} IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM {target} WHERE {target}.id = {table}.{column})"
+        )
+
+
+def rebuild_category_foods():
+    # Had no primary key, so it may hold duplicates: copy the distinct rows
+    # that still point at a category and a food into a new table
+    op.create_table(
+        "category_foods_new",
+        sa.Column(
+            "category_id",
+            sa.Text,
+            sa.ForeignKey(
+                "categories.id",
+                ondelete="CASCADE",
+                name="category_foods_category_id_fkey",
+            ),
+        ),
+        sa.Column(
+            "food_id",
+            sa.Text,
+            sa.ForeignKey(
+                "foods.id", ondelete="CASCADE", name="category_foods_food_id_fkey"
+            ),
+        ),
+        sa.PrimaryKeyConstraint("category_id", "food_id", name="category_foods_pkey"),
+    )
+    op.execute(
+        "INSERT INTO category_foods_new (category_id, food_id) "
+        "SELECT DISTINCT category_id, food_id FROM category_foods "
+        "WHERE EXISTS (SELECT 1 FROM categories "
+        "WHERE categories.id = category_foods.category_id) "
+        "AND EXISTS (SELECT 1 FROM foods WHERE foods.id = category_foods.food_id)"
+    )
+    op.drop_table("category_foods")
+    op.rename_table("category_foods_new", "category_foods")
+    op.create_index("ix_category_foods_food_id", "category_foods", ["food_id"])
+
+
+def cascade_foreign_keys(name):
+    bind = op.get_bind()
+    table = TABLES[name]
+
+    if bind.dialect.name == "sqlite":
+        # SQLite cannot alter constraints, batch mode copies the rows into
+        # the table as defined above, indexes included
+        with op.batch_alter_table(name, copy_from=table, recreate="always"):
+            pass
+        return
+
+    for foreign_key in sa.inspect(bind).get_foreign_keys(name):
+        op.drop_constraint(foreign_key["name"], name, type_="foreignkey")
+    for foreign_key in table.foreign_key_constraints:
+        (column,) = foreign_key.column_keys
+        target, target_column = foreign_key.elements[0].target_fullname.split(".")
+        op.create_foreign_key(
+            f"{name}_{column}_fkey",
+            name,
+            target,
+            [column],
+            [target_column],
+            ondelete="CASCADE",
+        )
+
+
+def upgrade():
+    delete_orphans()
+    rebuild_category_foods()
+    for name in TABLES:
+        cascade_foreign_keys(name)
+    if op.get_bind().dialect.name != "sqlite":
+        op.create_index("ix_carts_foods_food_id", "carts_foods", ["food_id"])
+
+
+def downgrade():
+    # The older code works with the keys and cascades, only drop the indexes
+    op.drop_index("ix_category_foods_food_id", table_name="category_foods")
+    op.drop_index("ix_carts_foods_food_id", table_name="carts_foods")
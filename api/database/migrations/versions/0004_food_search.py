@@ -0,0 +1,140 @@
+"""Food search index
+
+SQLite only: FTS5 tables over food names, descriptions and category names,
+kept in sync by triggers. Other databases search with LIKE, see
+src/routes/foods/search.py.
+
+  foods_search_docs     integer id per food, the rowid of both FTS tables
+                        (foods' own rowids may change on VACUUM)
+  foods_search          words, with prefix indexes for typeahead. `owner`
+                        holds the user id as one token, so a search only
+                        walks that user's foods
+  foods_search_trigram  name trigrams, for matches inside words
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:00:00
+
+"""
+
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Space separated category names of the food with the given id
+CATEGORIES = (
+    "(SELECT coalesce(group_concat(categories.name, ' '), '') "
+    "FROM category_foods JOIN categories "
+    "ON categories.id = category_foods.category_id "
+    "WHERE category_foods.food_id = {food_id})"
+)
+
+DOC = "(SELECT id FROM foods_search_docs WHERE food_id = {food_id})"
+
+OWNER = "replace({user_id}, '-', '')"
+
+
+def refresh_categories(food_id):
+    return (
+        f"UPDATE foods_search SET categories = {CATEGORIES.format(food_id=food_id)} "
+        f"WHERE rowid = {DOC.format(food_id=food_id)};"
+    )
+
+
+TRIGGERS = {
+    "foods_search_insert": f"""
+        AFTER INSERT ON foods BEGIN
+            INSERT INTO foods_search_docs (food_id) VALUES (new.id);
+            INSERT INTO foods_search (rowid, owner, name, description, categories)
+            VALUES (
+                last_insert_rowid(),
+                {OWNER.format(user_id="new.user_id")},
+                new.name,
+                new.description,
+                {CATEGORIES.format(food_id="new.id")}
+            );
+            INSERT INTO foods_search_trigram (rowid, owner, name)
+            VALUES ({DOC.format(food_id="new.id")}, new.user_id, new.name);
+        END""",
+    "foods_search_update": f"""
+        AFTER UPDATE OF name, description ON foods BEGIN
+            UPDATE foods_search SET name = new.name, description = new.description
+            WHERE rowid = {DOC.format(food_id="new.id")};
+            UPDATE foods_search_trigram SET name = new.name
+            WHERE rowid = {DOC.format(food_id="new.id")};
+        END""",
+    "foods_search_delete": f"""
+        AFTER DELETE ON foods BEGIN
+            DELETE FROM foods_search WHERE rowid = {DOC.format(food_id="old.id")};
+            DELETE FROM foods_search_trigram
+            WHERE rowid = {DOC.format(food_id="old.id")};
+            DELETE FROM foods_search_docs WHERE food_id = old.id;
+        END""",
+    "foods_search_link": f"""
+        AFTER INSERT ON category_foods BEGIN
+            {refresh_categories("new.food_id")}
+        END""",
+    "foods_search_unlink": f"""
+        AFTER DELETE ON category_foods BEGIN
+            {refresh_categories("old.food_id")}
+        END""",
+    "foods_search_rename": f"""
+        AFTER UPDATE OF name ON categories BEGIN
+            UPDATE foods_search
+            SET categories = {CATEGORIES.format(food_id="foods_search_docs.food_id")}
+            FROM foods_search_docs
+            WHERE foods_search.rowid = foods_search_docs.id
+            AND foods_search_docs.food_id IN (
+                SELECT food_id FROM category_foods WHERE category_id = new.id
+            );
+        END""",
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    op.execute(
+        "CREATE TABLE foods_search_docs ("
+        "id INTEGER PRIMARY KEY, food_id TEXT NOT NULL UNIQUE)"
+    )
+    op.execute(
+        "CREATE VIRTUAL TABLE foods_search USING fts5("
+        "owner, name, description, categories, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    op.execute(
+        "CREATE VIRTUAL TABLE foods_search_trigram USING fts5("
+        "owner UNINDEXED, name, tokenize = 'trigram')"
+    )
+    for name, body in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {name} {body}")
+
+    # Index the foods that already exist
+    op.execute("INSERT INTO foods_search_docs (food_id) SELECT id FROM foods")
+    op.execute(
+        "INSERT INTO foods_search (rowid, owner, name, description, categories) "
+        f"SELECT foods_search_docs.id, {OWNER.format(user_id='foods.user_id')}, "
+        "foods.name, foods.description, "
+        f"{CATEGORIES.format(food_id='foods.id')} "
+        "FROM foods_search_docs JOIN foods ON foods.id = foods_search_docs.food_id"
+    )
+    op.execute(
+        "INSERT INTO foods_search_trigram (rowid, owner, name) "
+        "SELECT foods_search_docs.id, foods.user_id, foods.name "
+        "FROM foods_search_docs JOIN foods ON foods.id = foods_search_docs.food_id"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name}")
+    for table in ("foods_search_trigram", "foods_search", "foods_search_docs"):
+        op.execute(f"DROP TABLE {table}")
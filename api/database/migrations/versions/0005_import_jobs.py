@@ -0,0 +1,49 @@
+"""Import jobs
+
+Progress and errors of the uploads imported by src/routes/imports.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "import_jobs",
+        sa.Column("id", sa.Text(length=36), primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.Text,
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("filename", sa.String),
+        sa.Column("format", sa.String(16)),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("rows", sa.Integer, nullable=False),
+        sa.Column("imported", sa.Integer, nullable=False),
+        sa.Column("failed", sa.Integer, nullable=False),
+        sa.Column("errors", sa.JSON, nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index(
+        "ix_import_jobs_user_id_created_at", "import_jobs", ["user_id", "created_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_import_jobs_user_id_created_at", table_name="import_jobs")
+    op.drop_table("import_jobs")
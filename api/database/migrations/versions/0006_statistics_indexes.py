@@ -0,0 +1,32 @@
+"""Statistics indexes
+
+Covering indexes on carts_foods for the per user totals by food and by cart
+of src/routes/statistics.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:00:00
+
+"""
+
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_carts_foods_user_id_food_id": ["user_id", "food_id", "food_qty"],
+    "ix_carts_foods_user_id_cart_id": ["user_id", "cart_id", "food_qty"],
+}
+
+
+def upgrade():
+    for name, columns in INDEXES.items():
+        op.create_index(name, "carts_foods", columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name="carts_foods")
@@ -0,0 +1,165 @@
+"""Statistics rollups
+
+Quantities of the cart lines summed per food, per category and per month,
+maintained by src/routes/statistics/rollups.py. Filled from the existing
+cart lines.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+carts = sa.table(
+    "carts", sa.column("id"), sa.column("user_id"), sa.column("created_at")
+)
+carts_foods = sa.table(
+    "carts_foods",
+    sa.column("cart_id"),
+    sa.column("user_id"),
+    sa.column("food_id"),
+    sa.column("food_qty"),
+)
+category_foods = sa.table(
+    "category_foods", sa.column("category_id"), sa.column("food_id")
+)
+
+
+def user_column():
+    return sa.Column(
+        "user_id",
+        sa.Text,
+        sa.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+
+def month(column):
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sa.func.strftime("%Y-%m", column)
+    if dialect == "postgresql":
+        return sa.func.to_char(column, "YYYY-MM")
+    if dialect == "mysql":
+        return sa.func.date_format(column, "%Y-%m")
+    return sa.func.substr(sa.cast(column, sa.String), 1, 7)
+
+
+def upgrade():
+    food_statistics = op.create_table(
+        "food_statistics",
+        sa.Column(
+            "food_id",
+            sa.Text,
+            sa.ForeignKey("foods.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        user_column(),
+        sa.Column("quantity", sa.Integer, nullable=False),
+    )
+    op.create_index(
+        "ix_food_statistics_user_id_quantity",
+        "food_statistics",
+        ["user_id", "quantity"],
+    )
+
+    category_statistics = op.create_table(
+        "category_statistics",
+        sa.Column(
+            "category_id",
+            sa.Text,
+            sa.ForeignKey("categories.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        user_column(),
+        sa.Column("quantity", sa.Integer, nullable=False),
+    )
+    op.create_index(
+        "ix_category_statistics_user_id_quantity",
+        "category_statistics",
+        ["user_id", "quantity"],
+    )
+
+    month_statistics = op.create_table(
+        "month_statistics",
+        sa.Column(
+            "user_id",
+            sa.Text,
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("month", sa.String(7), primary_key=True),
+        sa.Column("quantity", sa.Integer, nullable=False),
+        sa.Column("carts", sa.Integer, nullable=False),
+    )
+
+    foods = (
+        sa.select(
+            carts_foods.c.food_id,
+            carts_foods.c.user_id,
+            sa.func.sum(carts_foods.c.food_qty),
+        )
+        .where(carts_foods.c.user_id.isnot(None))
+        .group_by(carts_foods.c.food_id, carts_foods.c.user_id)
+    )
+    op.execute(
+        food_statistics.insert().from_select(["food_id", "user_id", "quantity"], foods)
+    )
+
+    op.execute(
+        category_statistics.insert().from_select(
+            ["category_id", "user_id", "quantity"],
+            sa.select(
+                category_foods.c.category_id,
+                food_statistics.c.user_id,
+                sa.func.sum(food_statistics.c.quantity),
+            )
+            .join(
+                food_statistics,
+                food_statistics.c.food_id == category_foods.c.food_id,
+            )
+            .group_by(category_foods.c.category_id, food_statistics.c.user_id),
+        )
+    )
+
+    lines = (
+        sa.select(
+            carts_foods.c.cart_id,
+            sa.func.sum(carts_foods.c.food_qty).label("quantity"),
+        )
+        .group_by(carts_foods.c.cart_id)
+        .subquery()
+    )
+    by_month = month(carts.c.created_at)
+    op.execute(
+        month_statistics.insert().from_select(
+            ["user_id", "month", "quantity", "carts"],
+            sa.select(
+                carts.c.user_id,
+                by_month,
+                sa.func.sum(lines.c.quantity),
+                sa.func.count(),
+            )
+            .join(lines, lines.c.cart_id == carts.c.id)
+            .where(carts.c.user_id.isnot(None))
+            .group_by(carts.c.user_id, by_month),
+        )
+    )
+
+
+def downgrade():
+    op.drop_table("month_statistics")
+    op.drop_index(
+        "ix_category_statistics_user_id_quantity", table_name="category_statistics"
+    )
+    op.drop_table("category_statistics")
+    op.drop_index("ix_food_statistics_user_id_quantity", table_name="food_statistics")
+    op.drop_table("food_statistics")
@@ -1,7 +1,15 @@
 import uuid
 
 from database import Base
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -13,6 +21,8 @@ class Cart(Base):
     __table_args__ = (
         # this can be PrimaryKeyConstraint if you want it to be a primary key
         UniqueConstraint("user_id", "name"),
+        # Keyset pagination, see src/utils/pagination.py
+        Index("ix_carts_user_id_created_at_id", "user_id", "created_at", "id"),
     )
 
     id = Column(
@@ -26,10 +36,10 @@ class Cart(Base):
     )
 
     # Relationships
-    user_id = Column(Text, ForeignKey("users.id"))
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"))
     user = relationship("User", back_populates="carts")
 
-    foods = relationship("CartFood", back_populates="carts")
+    foods = relationship("CartFood", back_populates="carts", passive_deletes=True)
     # foods = relationship("Food", secondary=CartFood, back_populates="carts")
 
     def to_dict(self):
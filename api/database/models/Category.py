@@ -3,7 +3,15 @@ import uuid
 from database import Base
 from database.relationships import CategoryFood
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -15,6 +23,8 @@ class Category(Base):
     __table_args__ = (
         # this can be db.PrimaryKeyConstraint if you want it to be a primary key
         UniqueConstraint("user_id", "name"),
+        # Keyset pagination, see src/utils/pagination.py
+        Index("ix_categories_user_id_created_at_id", "user_id", "created_at", "id"),
     )
 
     id = Column(
@@ -28,7 +38,7 @@ class Category(Base):
     )
 
     # Relationships
-    user_id = Column(Text, ForeignKey("users.id"))
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"))
     user = relationship("User", back_populates="categories")
     foods = relationship("Food", secondary=CategoryFood, back_populates="categories")
 
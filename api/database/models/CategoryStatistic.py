@@ -0,0 +1,19 @@
+from database import Base
+from sqlalchemy import Column, ForeignKey, Index, Integer, Text
+
+
+class CategoryStatistic(Base):
+
+    # Quantity of the foods of a category put in the user's carts, see
+    # src/routes/statistics/rollups.py
+    __tablename__ = "category_statistics"
+
+    __table_args__ = (
+        Index("ix_category_statistics_user_id_quantity", "user_id", "quantity"),
+    )
+
+    category_id = Column(
+        Text, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,14 @@
+from database import Base
+from sqlalchemy import Column, ForeignKey, Integer, String, Text
+
+
+class CollectionVersion(Base):
+
+    # Bumped on every write to one of a user's collections, lets the list
+    # endpoints answer If-None-Match without loading rows, see
+    # src/utils/versions.py
+    __tablename__ = "collection_versions"
+
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    collection = Column(String(32), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -4,7 +4,16 @@ from database import Base
 from database.relationships import CategoryFood
 from decouple import config
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    JSON,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -18,12 +27,17 @@ class Food(Base):
     __table_args__ = (
         # this can be db.PrimaryKeyConstraint if you want it to be a primary key
         UniqueConstraint("user_id", "name"),
+        # Keyset pagination, see src/utils/pagination.py
+        Index("ix_foods_user_id_created_at_id", "user_id", "created_at", "id"),
     )
 
     id = Column(
         "id", Text(length=36), default=lambda: str(uuid.uuid4()), primary_key=True
     )
     image = Column(String)
+    # {"thumb": path, "medium": path}, filled in after upload, see
+    # src/routes/foods/images.py
+    image_variants = Column(JSON(none_as_null=True))
     name = Column(String, index=True)
     description = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -32,10 +46,10 @@ class Food(Base):
     )
 
     # Relationships
-    user_id = Column(Text, ForeignKey("users.id"))
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"))
     user = relationship("User", back_populates="foods")
 
-    carts = relationship("CartFood", back_populates="foods")
+    carts = relationship("CartFood", back_populates="foods", passive_deletes=True)
 
     # User owns and maintains their own Categories
     categories = relationship(
@@ -49,6 +63,10 @@ class Food(Base):
             id=self.id,
             user_id=self.user_id,
             image=f"{DOMAIN}{self.image}" if self.image else None,
+            image_variants={
+                variant: f"{DOMAIN}{location}"
+                for variant, location in (self.image_variants or {}).items()
+            },
             name=self.name,
             description=self.description,
             created_at=self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
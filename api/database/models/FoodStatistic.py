@@ -0,0 +1,18 @@
+from database import Base
+from sqlalchemy import Column, ForeignKey, Index, Integer, Text
+
+
+class FoodStatistic(Base):
+
+    # Quantity of a food put in the user's carts, kept up to date with the
+    # cart lines, see src/routes/statistics/rollups.py
+    __tablename__ = "food_statistics"
+
+    __table_args__ = (
+        Index("ix_food_statistics_user_id_quantity", "user_id", "quantity"),
+    )
+
+    # A food has one user, the key is the food's
+    food_id = Column(Text, ForeignKey("foods.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,35 @@
+import uuid
+
+from database import Base
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+
+class ImportJob(Base):
+
+    # An upload being imported off the request path, polled by the client for
+    # progress, see src/routes/imports
+    __tablename__ = "import_jobs"
+
+    __table_args__ = (
+        Index("ix_import_jobs_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id = Column(
+        "id", Text(length=36), default=lambda: str(uuid.uuid4()), primary_key=True
+    )
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    filename = Column(String)
+    format = Column(String(16))
+    # queued, running, completed or failed
+    status = Column(String(16), nullable=False, default="queued")
+    # Rows read so far, and how they went
+    rows = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    # [{"row": 12, "error": "..."}], the first IMPORT_MAX_ERRORS
+    errors = Column(JSON, nullable=False, default=list)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), default=func.now(), onupdate=func.now()
+    )
@@ -0,0 +1,14 @@
+from database import Base
+from sqlalchemy import Column, ForeignKey, Integer, String, Text
+
+
+class MonthStatistic(Base):
+
+    # Quantity put in the carts created in a month ("2026-10") and how many of
+    # those carts hold anything, see src/routes/statistics/rollups.py
+    __tablename__ = "month_statistics"
+
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(String(7), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    carts = Column(Integer, nullable=False, default=0)
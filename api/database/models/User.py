@@ -26,6 +26,7 @@ class User(Base):
         back_populates="user",
         lazy="dynamic",
         cascade="all, delete, delete-orphan",
+        passive_deletes=True,
     )
 
     carts = relationship(
@@ -33,6 +34,7 @@ class User(Base):
         back_populates="user",
         lazy="dynamic",
         cascade="all, delete, delete-orphan",
+        passive_deletes=True,
     )
 
     categories = relationship(
@@ -40,6 +42,7 @@ class User(Base):
         back_populates="user",
         lazy="dynamic",
         cascade="all, delete, delete-orphan",
+        passive_deletes=True,
     )
 
     def to_dict(self):
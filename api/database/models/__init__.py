@@ -1,4 +1,9 @@
 from .Cart import Cart
 from .Category import Category
+from .CategoryStatistic import CategoryStatistic
+from .CollectionVersion import CollectionVersion
 from .Food import Food
+from .FoodStatistic import FoodStatistic
+from .ImportJob import ImportJob
+from .MonthStatistic import MonthStatistic
 from .User import User
@@ -1,5 +1,5 @@
-from database import Base, SessionLocal
-from sqlalchemy import Column, ForeignKey, Integer, PrimaryKeyConstraint, Text
+from database import Base
+from sqlalchemy import Column, ForeignKey, Index, Integer, PrimaryKeyConstraint, Text
 from sqlalchemy.orm import relationship
 
 
@@ -9,24 +9,28 @@ class CartFood(Base):
     __table_args__ = (
         # this can be db.PrimaryKeyConstraint if you want it to be a primary key
         PrimaryKeyConstraint("cart_id", "food_id"),
+        # The primary key serves lookups by cart, the index lookups by food
+        Index("ix_carts_foods_food_id", "food_id"),
+        # Statistics, totals by food and by cart read from these alone, see
+        # src/routes/statistics
+        Index("ix_carts_foods_user_id_food_id", "user_id", "food_id", "food_qty"),
+        Index("ix_carts_foods_user_id_cart_id", "user_id", "cart_id", "food_qty"),
     )
 
-    cart_id = Column(Text, ForeignKey("carts.id"))
-    user_id = Column(Text, ForeignKey("users.id"))
-    food_id = Column(Text, ForeignKey("foods.id"))
+    # Deleting the cart, food or user deletes the line
+    cart_id = Column(Text, ForeignKey("carts.id", ondelete="CASCADE"))
+    user_id = Column(Text, ForeignKey("users.id", ondelete="CASCADE"))
+    food_id = Column(Text, ForeignKey("foods.id", ondelete="CASCADE"))
 
     food_qty = Column(Integer)
     foods = relationship("Food", back_populates="carts")
     carts = relationship("Cart", back_populates="foods")
 
     def get_food_name(self):
-        # This import causes issues on the top-level, but it is not a circular dependency.
-        from database.models import Food
-
-        db = SessionLocal()
-        food = db.query(Food).filter(Food.id == self.food_id).first()
-        if food:
-            return food.name
+        # Read the name through the relationship, so carts loaded with
+        # `select_carts` serialize without issuing any extra queries.
+        if self.foods:
+            return self.foods.name
         return None
 
     def to_dict(self):
@@ -1,9 +1,18 @@
 from database import Base
-from sqlalchemy import Column, ForeignKey, Integer, Table, Text
+from sqlalchemy import Column, ForeignKey, Index, Table, Text
 
 CategoryFood = Table(
     "category_foods",
     Base.metadata,
-    Column("category_id", Text, ForeignKey("categories.id")),
-    Column("food_id", Text, ForeignKey("foods.id")),
+    # The primary key serves lookups by category, the index lookups by food
+    Column(
+        "category_id",
+        Text,
+        ForeignKey("categories.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "food_id", Text, ForeignKey("foods.id", ondelete="CASCADE"), primary_key=True
+    ),
+    Index("ix_category_foods_food_id", "food_id"),
 )
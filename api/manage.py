@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+from database.connect import dispose_engines, new_session
+from database.migrate import upgrade_database
+from database.models import Food, User
+from sqlalchemy import select
+from src.routes.foods.images import process_image, remove_if_unused
+from src.routes.statistics import rollups
+from src.utils import bump_version, image_processor
+from src.utils.images import IMAGE_WORKERS
+from src.utils.uploads import UPLOAD_DIR
+
+# Uploads and their variants, static/<sha256>.png and static/<sha256>.thumb.webp
+UPLOAD_NAME = re.compile(r"[0-9a-f]{64}(\.\w+)*")
+
+
+async def backfill_images(args):
+    # Create the variants of every food image that has none yet
+    db = new_session()
+    try:
+        statement = select(Food.image).where(Food.image.isnot(None)).distinct()
+        if not args.all:
+            statement = statement.where(Food.image_variants.is_(None))
+        images = (await db.scalars(statement)).all()
+    finally:
+        await db.close()
+
+    # Paths are relative to the working directory, like in the app
+    failed = []
+    # Keep every worker of the image pool busy
+    for start in range(0, len(images), IMAGE_WORKERS):
+        batch = images[start : start + IMAGE_WORKERS]
+        results = await asyncio.gather(*[process_image(image) for image in batch])
+        failed += [image for image, variants in zip(batch, results) if not variants]
+        print(f"{start + len(batch)}/{len(images)}")
+
+    for image in failed:
+        print(f"Skipped {image}, missing or not an image")
+
+
+async def remove_unused_images(args):
+    # Delete the uploads no food points at, e.g. those whose removal was put
+    # off by UPLOAD_GRACE_PERIOD when the app stopped
+    db = new_session()
+    try:
+        used = set()
+        rows = await db.execute(
+            select(Food.image, Food.image_variants).where(Food.image.isnot(None))
+        )
+        for image, variants in rows:
+            used.add(image)
+            used.update(image_processor.locations(image))
+            used.update((variants or {}).values())
+
+        removed = recent = 0
+        # Uploads first, their variants go with them
+        for name in sorted(os.listdir(UPLOAD_DIR), key=lambda name: name.count(".")):
+            location = f"{UPLOAD_DIR}/{name}"
+            if not UPLOAD_NAME.fullmatch(name) or location in used:
+                continue
+            if not os.path.exists(location):
+                # A variant gone with its upload
+                continue
+            # Checked again one by one, a food may have started using it
+            if await remove_if_unused(db, location):
+                recent += 1
+            elif not os.path.exists(location):
+                removed += 1
+    finally:
+        await db.close()
+
+    print(f"Removed {removed} unused images")
+    if recent:
+        print(f"Kept {recent} written in the last UPLOAD_GRACE_PERIOD seconds")
+
+
+async def migrate(args):
+    upgrade_database(args.revision)
+
+
+async def statistics_users(db, args):
+    statement = select(User.id).order_by(User.id)
+    if args.user:
+        statement = statement.where(User.id.in_(args.user))
+    return (await db.scalars(statement)).all()
+
+
+async def rebuild_statistics(args):
+    # Recompute the statistics rollups from the cart lines, one transaction
+    # per user
+    db = new_session()
+    try:
+        users = await statistics_users(db, args)
+        for index, user_id in enumerate(users, 1):
+            await rollups.rebuild(db, user_id)
+            await bump_version(db, "statistics", user_id)
+            await db.commit()
+            print(f"{index}/{len(users)}")
+    finally:
+        await db.close()
+
+
+async def check_statistics(args):
+    # Compare the statistics rollups with the cart lines, exits with 1 when
+    # they differ
+    db = new_session()
+    try:
+        drifted = []
+        for user_id in await statistics_users(db, args):
+            differences = await rollups.check(db, user_id)
+            # Read each user's rollups and lines in the same snapshot
+            await db.rollback()
+            for table, rows in differences.items():
+                print(f"{user_id}: {rows} rows of {table} differ")
+            if differences:
+                drifted.append(user_id)
+    finally:
+        await db.close()
+
+    if drifted and args.fix:
+        args.user = drifted
+        await rebuild_statistics(args)
+    elif drifted:
+        print("Run `python manage.py rebuild-statistics` to fix them")
+        return 1
+
+
+COMMANDS = {
+    "backfill-images": backfill_images,
+    "migrate": migrate,
+    "remove-unused-images": remove_unused_images,
+    "rebuild-statistics": rebuild_statistics,
+    "check-statistics": check_statistics,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser(
+        "backfill-images", help="Create thumbnails of existing food images"
+    )
+    backfill.add_argument(
+        "--all",
+        action="store_true",
+        help="Include images that have variants, e.g. after changing IMAGE_FORMAT",
+    )
+
+    commands.add_parser(
+        "remove-unused-images", help="Delete the food images no food uses anymore"
+    )
+
+    upgrade = commands.add_parser(
+        "migrate", help="Create the database or upgrade it to the latest schema"
+    )
+    upgrade.add_argument("revision", nargs="?", default="head")
+
+    rebuild = commands.add_parser(
+        "rebuild-statistics", help="Recompute the statistics from the cart lines"
+    )
+    check = commands.add_parser(
+        "check-statistics", help="Compare the statistics with the cart lines"
+    )
+    check.add_argument(
+        "--fix", action="store_true", help="Rebuild the statistics of those that differ"
+    )
+    for command in (rebuild, check):
+        command.add_argument(
+            "--user", action="append", help="Only this user's, may be repeated"
+        )
+
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            return await COMMANDS[args.command](args)
+        finally:
+            await dispose_engines()
+
+    sys.exit(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
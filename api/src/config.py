@@ -4,7 +4,7 @@ from decouple import config
 from pydantic import BaseSettings
 
 # Routes
-from src.routes import auth_router, carts_router, foods_router, users_router, categories_router
+from src.routes import auth_router, carts_router, foods_router, users_router, categories_router, export_router, imports_router, statistics_router, metrics_router
 
 
 def initialize_routes(app):
@@ -13,6 +13,10 @@ def initialize_routes(app):
     app.include_router(foods_router, prefix="/api/foods")
     app.include_router(carts_router, prefix="/api/carts")
     app.include_router(categories_router, prefix="/api/categories")
+    app.include_router(export_router, prefix="/api/export")
+    app.include_router(imports_router, prefix="/api/import")
+    app.include_router(statistics_router, prefix="/api/statistics")
+    app.include_router(metrics_router, prefix="/metrics")
 
 
 
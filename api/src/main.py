@@ -1,17 +1,23 @@
 import uvicorn
-from database import Base, engine
+from database.connect import dispose_engines
+from database.migrate import DB_MIGRATE_ON_STARTUP, upgrade_database
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+
+from src.middlewares import MetricsMiddleware, QueryTimingMiddleware
+from src.utils import CachedStaticFiles
 
 from .config import initialize_routes
 
-# Create db
-Base.metadata.create_all(bind=engine)
+# Create or upgrade db, see database/migrations
+if DB_MIGRATE_ON_STARTUP:
+    upgrade_database()
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app = FastAPI(default_response_class=ORJSONResponse)
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 initialize_routes(app)
+app.add_event_handler("shutdown", dispose_engines)
 
 # Middleware
 origins = ["http://localhost:3000", "http://192.168.0.121:3000"]
@@ -22,3 +28,5 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
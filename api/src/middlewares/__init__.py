@@ -1 +1,3 @@
-from .auth import JWTBearer
+from .auth import JWTBearer, invalidate_user
+from .metrics import MetricsMiddleware
+from .queries import QueryTimingMiddleware
@@ -1,12 +1,67 @@
+from datetime import datetime
 from typing import Optional
 
+import orjson
 from database.connect import get_db
 from database.models import User
+from decouple import config
 from fastapi import Cookie, Depends, HTTPException, Response
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from src.utils import decodeJWT
+from src.utils.cache import Cache, make_backend
+
+# "memory://" (per worker) or "redis://host:port/db" (shared), empty to disable
+USER_CACHE_URL = config("USER_CACHE_URL", default="memory://")
+USER_CACHE_SIZE = config("USER_CACHE_SIZE", default=1024, cast=int)
+USER_CACHE_TTL = config("USER_CACHE_TTL", default=60, cast=float)
+
+# Authenticated users by id, so protected requests skip the users lookup
+user_cache = Cache(
+    make_backend(USER_CACHE_URL, max_size=USER_CACHE_SIZE),
+    namespace="user",
+    ttl=USER_CACHE_TTL,
+)
+
+# The columns cached, never the password hash: routes needing it query it
+CACHED_COLUMNS = ("id", "username", "email", "created_at", "updated_at")
+DATETIME_COLUMNS = ("created_at", "updated_at")
+
+
+def dump_user(user: User):
+    return orjson.dumps({key: getattr(user, key) for key in CACHED_COLUMNS})
+
+
+def load_user(value):
+    data = orjson.loads(value)
+    for key in DATETIME_COLUMNS:
+        if data[key] is not None:
+            data[key] = datetime.fromisoformat(data[key])
+    return data
+
+
+async def invalidate_user(user_id: str):
+    # Call after committing changes to (or deleting) a user
+    if USER_CACHE_URL:
+        await user_cache.invalidate(user_id)
+
+
+async def get_user(db: AsyncSession, user_id: str):
+    value = await user_cache.get(user_id) if USER_CACHE_URL else None
+    if value is not None:
+        # Attach the cached row to the session without querying it, so
+        # routes can keep using the user in relationships and updates.
+        user = User(**load_user(value))
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    user = (await db.scalars(select(User).where(User.id == user_id))).first()
+    if user is not None and USER_CACHE_URL:
+        await user_cache.set(user_id, dump_user(user))
+    return user
 
 
 class JWTBearer(HTTPBearer):
@@ -16,7 +71,7 @@ class JWTBearer(HTTPBearer):
     async def __call__(
         self,
         token: Optional[str] = Cookie(None),
-        db: session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
     ):
         if self.auto_error:
             if not token:
@@ -24,7 +79,7 @@ class JWTBearer(HTTPBearer):
             decoded_token = decodeJWT(token)
 
             if decoded_token:
-                user = db.query(User).filter(User.id == decoded_token["id"]).first()
+                user = await get_user(db, decoded_token["id"])
                 if user is None:
                     raise HTTPException(status_code=403, detail="Not Authorized.")
                 return user
@@ -36,9 +91,9 @@ class JWTBearer(HTTPBearer):
             decoded_token = decodeJWT(token)
 
             if decoded_token:
-                user = db.query(User).filter(User.id == decoded_token["id"]).first()
+                user = await get_user(db, decoded_token["id"])
                 if user is None:
                     return None
                 return user
             else:
-                return None
\ No newline at end of file
+                return None
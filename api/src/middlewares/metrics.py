@@ -0,0 +1,64 @@
+import time
+
+from src.utils.metrics import request_metrics
+
+
+def route_label(scope):
+    # The route's path template, "/api/foods/{id}", or the mount's prefix, so
+    # the labels stay few whatever paths are requested
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope and scope.get("root_path"):
+        return scope["root_path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    # Times every request and counts it by route and status into
+    # request_metrics, published by GET /metrics. A request ends when the
+    # last body chunk is sent: background tasks (imports, image variants)
+    # run after that and are not part of its latency.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+        done = False
+
+        def finish(error):
+            nonlocal done
+            done = True
+            request_metrics.in_flight -= 1
+            request_metrics.observe(
+                scope["method"],
+                route_label(scope),
+                status,
+                time.perf_counter() - started,
+                error,
+            )
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if (
+                message["type"] == "http.response.body"
+                and not message.get("more_body", False)
+                and not done
+            ):
+                finish(False)
+
+        request_metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # No complete response: an error, or the client went away
+            if not done:
+                finish(True)
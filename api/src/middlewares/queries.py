@@ -0,0 +1,27 @@
+from database.engine import track_queries
+from starlette.datastructures import MutableHeaders
+
+
+class QueryTimingMiddleware:
+    # Counts the SQL statements of each request and their time, sent in the
+    # Server-Timing header: db;dur=12.5;desc="4 queries". Statements issued
+    # after the headers, by streamed bodies or background tasks, are neither
+    # reported nor held to DB_QUERY_BUDGET, but still logged when slow.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        with track_queries(scope) as queries:
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", queries.server_timing())
+                    queries.budget = 0
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
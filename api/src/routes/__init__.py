@@ -3,3 +3,7 @@ from .carts import carts_router
 from .foods import foods_router
 from .users import users_router
 from .categories import categories_router
+from .export import export_router
+from .imports import imports_router
+from .statistics import statistics_router
+from .metrics import metrics_router
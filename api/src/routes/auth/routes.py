@@ -1,15 +1,15 @@
 from typing import Optional
 
-import bcrypt
 from database.connect import get_db
 from database.models import User
 from fastapi import APIRouter, Body, Depends, Response
 from fastapi.encoders import jsonable_encoder
 from fastapi.params import Cookie
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from src.middlewares import JWTBearer
-from src.utils import signJWT
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.middlewares import JWTBearer, invalidate_user
+from src.utils import password_hasher, serialize_user, signJWT
 
 from .schemas import AuthUserSchema
 
@@ -17,12 +17,18 @@ router = APIRouter()
 
 
 @router.post("/register")
-def register(user: AuthUserSchema = Body(...), db: Session = Depends(get_db)):
+async def register(
+    user: AuthUserSchema = Body(...), db: AsyncSession = Depends(get_db)
+):
 
     errors = {}
     # Check if user already exists
-    email_exists = db.query(User).filter(User.email == user.email).first()
-    username_exists = db.query(User).filter(User.username == user.username).first()
+    email_exists = (
+        await db.scalars(select(User).where(User.email == user.email))
+    ).first()
+    username_exists = (
+        await db.scalars(select(User).where(User.username == user.username))
+    ).first()
 
     # Error Handling
     if email_exists:
@@ -38,19 +44,15 @@ def register(user: AuthUserSchema = Body(...), db: Session = Depends(get_db)):
         )
 
     # Hashed Password
-    password = user.password.encode("utf-8")
-    hashed_password = bcrypt.hashpw(password, bcrypt.gensalt())
-
-    # entered_password = entered_password.encode("utf-8")
-    # When checking the password > if bcrypt.hashpw(entered_password, hashed_password) == hashed_password:
+    hashed_password = await password_hasher.hash(user.password)
 
     # Create User
     new_user = User(username=user.username, email=user.email, password=hashed_password)
 
     # Save User to database
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     # Omit Password
     user_data = jsonable_encoder(new_user)
@@ -65,7 +67,7 @@ async def whoami(
 ) -> dict:
 
     if current_user:
-        user = current_user.to_dict()
+        user = serialize_user(current_user)
         return user
     else:
         response.delete_cookie(key="token")
@@ -77,7 +79,7 @@ async def whoami(
 async def login(
     response: Response,
     user: AuthUserSchema = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token: Optional[str] = Cookie(None),
 ) -> dict:
 
@@ -94,28 +96,34 @@ async def login(
     # Check if user exists in database
 
     if user.email:
-        db_user = db.query(User).filter(User.email == user.email).first()
+        db_user = (
+            await db.scalars(select(User).where(User.email == user.email))
+        ).first()
     elif user.username:
-        db_user = db.query(User).filter(User.username == user.username).first()
+        db_user = (
+            await db.scalars(select(User).where(User.username == user.username))
+        ).first()
 
     if not db_user:
         return not_authenticated
 
     # Compare Passwords
-    # entered_password = entered_password.encode("utf-8")
-    # When checking the password > if bcrypt.hashpw(entered_password, hashed_password) == hashed_password:
-    password = user.password.encode("utf-8")
-    hashed_password = db_user.password
+    authorized = await password_hasher.verify(user.password, db_user.password)
+
+    if not authorized:
+        return not_authenticated
 
-    authorized = bcrypt.hashpw(password, hashed_password) == hashed_password
+    # Upgrade the stored hash when the configured cost factor changed
+    if password_hasher.needs_rehash(db_user.password):
+        db_user.password = await password_hasher.hash(user.password)
+        await db.commit()
+        await db.refresh(db_user)
+        await invalidate_user(db_user.id)
 
     user_data = jsonable_encoder(db_user)
 
     # Sign User Id as a JWT Token
-    if authorized:
-        jwt_token = signJWT(user_data)
-    else:
-        return not_authenticated
+    jwt_token = signJWT(user_data)
 
     # Set the JWT token as a cookie
     response.set_cookie(key="token", value=jwt_token, httponly=True)
@@ -137,19 +145,21 @@ async def logout(response: Response) -> dict:
 @router.post("/password")
 async def update_password(
     user: AuthUserSchema = Body(...),
-    current_user: any = Depends(JWTBearer()), 
-    db: Session = Depends(get_db)
+    current_user: any = Depends(JWTBearer()),
+    db: AsyncSession = Depends(get_db),
 ) -> dict:
     if user.newPassword:
-        current_password = user.password.encode("utf-8")
-        hashed_password = current_user.password
-        authorized = bcrypt.hashpw(current_password, hashed_password) == hashed_password
+        # The cached user comes without its password hash
+        hashed = (
+            await db.scalars(select(User.password).where(User.id == current_user.id))
+        ).first()
+        authorized = await password_hasher.verify(user.password, hashed)
 
         if authorized:
-            new_password = user.newPassword.encode("utf-8")
-            hashed_password = bcrypt.hashpw(new_password, bcrypt.gensalt())
+            hashed_password = await password_hasher.hash(user.newPassword)
             current_user.password = hashed_password
-            db.commit()
+            await db.commit()
+            await invalidate_user(current_user.id)
             return "Success, password updated."
         else:
             return JSONResponse(
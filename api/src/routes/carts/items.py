@@ -0,0 +1,80 @@
+from collections import Counter
+
+from database.models import Food
+from database.relationships import CartFood
+from sqlalchemy import bindparam, delete, insert, select, update
+from src.routes.statistics.rollups import lock_carts, record_lines
+
+carts_foods = CartFood.__table__
+
+
+async def resolve_foods(db, user_id: str, names):
+    # Food ids by name, for every name the user owns, in one IN query
+    if not names:
+        return {}
+    rows = await db.execute(
+        select(Food.name, Food.id).where(Food.user_id == user_id, Food.name.in_(names))
+    )
+    return {name: id for name, id in rows}
+
+
+async def sync_cart_items(db, cart_id: str, user_id: str, names):
+    # Make the cart hold exactly `names`, each food's quantity being the number
+    # of times its name appears. Unknown names are ignored. Writes only the
+    # difference with the current rows: one bulk insert, one executemany
+    # update and one delete at most, and the statistics rollups by as much.
+    counts = Counter(names)
+    food_ids = await resolve_foods(db, user_id, list(counts))
+    wanted = {food_ids[name]: qty for name, qty in counts.items() if name in food_ids}
+
+    # The differences only hold against lines no other request is changing
+    await lock_carts(db, cart_ids=[cart_id])
+    rows = await db.execute(
+        select(carts_foods.c.food_id, carts_foods.c.food_qty)
+        .where(carts_foods.c.cart_id == cart_id)
+        .with_for_update()
+    )
+    current = {food_id: qty for food_id, qty in rows}
+
+    inserts = [
+        dict(cart_id=cart_id, user_id=user_id, food_id=food_id, food_qty=qty)
+        for food_id, qty in wanted.items()
+        if food_id not in current
+    ]
+    updates = [
+        dict(b_cart_id=cart_id, b_food_id=food_id, b_food_qty=qty)
+        for food_id, qty in wanted.items()
+        if food_id in current and current[food_id] != qty
+    ]
+    deletes = [food_id for food_id in current if food_id not in wanted]
+
+    if inserts:
+        await db.execute(insert(carts_foods), inserts)
+    if updates:
+        await db.execute(
+            update(carts_foods)
+            .where(
+                carts_foods.c.cart_id == bindparam("b_cart_id"),
+                carts_foods.c.food_id == bindparam("b_food_id"),
+            )
+            .values(food_qty=bindparam("b_food_qty")),
+            updates,
+        )
+    if deletes:
+        await db.execute(
+            delete(carts_foods).where(
+                carts_foods.c.cart_id == cart_id, carts_foods.c.food_id.in_(deletes)
+            )
+        )
+
+    await record_lines(
+        db,
+        user_id,
+        {
+            (cart_id, food_id): wanted.get(food_id, 0) - current.get(food_id, 0)
+            for food_id in wanted.keys() | current.keys()
+        },
+        {cart_id: bool(wanted) - bool(current)},
+    )
+
+    return bool(inserts or updates or deletes)
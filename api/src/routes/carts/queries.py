@@ -0,0 +1,13 @@
+from database.loading import loader_options
+from database.models import Cart
+from sqlalchemy import select
+
+
+def select_carts(user_id: str, expand: frozenset = None):
+    # `expand` names the relations to load, see database/loading.py
+    return (
+        select(Cart)
+        .options(*loader_options(Cart, expand))
+        .where(Cart.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )
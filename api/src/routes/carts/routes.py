@@ -1,14 +1,30 @@
 import uuid
 
 from database.connect import get_db
-from database.models import Cart, Food, User
-from database.relationships import CartFood
-from fastapi import APIRouter, Body, Depends
+from database.loading import parse_expand
+from database.models import Cart, User
+from fastapi import APIRouter, Body, Depends, Request, Response
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import delete as sql_delete
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.middlewares import JWTBearer
-
+from src.routes.statistics.rollups import forget_carts
+from src.utils import (
+    MAX_PAGE_LIMIT,
+    bump_version,
+    cache_response,
+    check_etag,
+    clamp_limit,
+    expand_plan,
+    get_cached_response,
+    paginate,
+    serialize_cart,
+)
+
+from .items import sync_cart_items
+from .queries import select_carts
 from .schemas import CartSchema
 
 router = APIRouter()
@@ -16,33 +32,95 @@ router = APIRouter()
 
 @router.get("/")
 async def get_all(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     page: int = None,
     limit: int = 10,
+    cursor: str = None,
+    expand: str = None,
     current_user: User = Depends(JWTBearer()),
 ):
+    try:
+        expand = parse_expand(Cart, expand)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+    serialize = expand_plan(serialize_cart, expand)
+
+    not_modified = await check_etag(db, request, response, current_user.id, "carts")
+    if not_modified:
+        return not_modified
+
+    cached = await get_cached_response(response, current_user.id, "carts")
+    if cached:
+        return cached
+
+    limit = clamp_limit(limit)
+
+    if cursor is not None:
+        # Keyset pagination, pass an empty cursor to get the first page
+        try:
+            carts, next_cursor = await paginate(
+                db, select_carts(current_user.id, expand), Cart, cursor, limit
+            )
+        except ValueError as e:
+            return JSONResponse(
+                content={"error": str(e)},
+                status_code=400,
+            )
+        return await cache_response(
+            response,
+            current_user.id,
+            "carts",
+            {
+                "data": [serialize(cart) for cart in carts],
+                "next_cursor": next_cursor,
+            },
+        )
+
     if type(page) is int:
         # Page starts at 1
         skip = (page - 1) * limit
-        carts = (
-            db.query(Cart)
-            .filter(Cart.user_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        statement = select_carts(current_user.id, expand).offset(skip).limit(limit)
     else:
-        carts = db.query(Cart).filter(Cart.user_id == current_user.id).all()
+        # Without page or cursor, the first MAX_PAGE_LIMIT rows
+        statement = (
+            select_carts(current_user.id, expand)
+            .order_by(Cart.created_at, Cart.id)
+            .limit(MAX_PAGE_LIMIT)
+        )
+    carts = (await db.scalars(statement)).all()
     data = []
     for cart in carts:
-        data.append(cart.to_dict())
-    return data
+        data.append(serialize(cart))
+    return await cache_response(response, current_user.id, "carts", data)
 
 
 @router.get("/{id}")
 async def get_one(
-    id: str, db: Session = Depends(get_db), current_user: any = Depends(JWTBearer())
+    id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    expand: str = None,
+    current_user: any = Depends(JWTBearer()),
 ):
+    try:
+        expand = parse_expand(Cart, expand)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+    serialize = expand_plan(serialize_cart, expand)
+
+    not_modified = await check_etag(db, request, response, current_user.id, "carts")
+    if not_modified:
+        return not_modified
+
     cart = None
 
     try:
@@ -52,20 +130,13 @@ async def get_one(
         id_is_uuid = False
 
     if id_is_uuid:
-        cart = (
-            db.query(Cart)
-            .filter(Cart.id == id, Cart.user_id == current_user.id)
-            .first()
-        )
+        statement = select_carts(current_user.id, expand).where(Cart.id == id)
     else:
-        cart = (
-            db.query(Cart)
-            .filter(Cart.name == id, Cart.user_id == current_user.id)
-            .first()
-        )
+        statement = select_carts(current_user.id, expand).where(Cart.name == id)
+    cart = (await db.scalars(statement)).first()
 
     if cart:
-        return Cart.to_dict()
+        return serialize(cart)
 
     return JSONResponse(
         content={"error": "Cart does not exist."},
@@ -77,70 +148,25 @@ async def get_one(
 async def update(
     id: str,
     cart: CartSchema = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: any = Depends(JWTBearer()),
 ):
-    db_cart = (
-        db.query(Cart).filter(Cart.id == id, Cart.user_id == current_user.id).first()
-    )
-
-    # cart_data = db_cart.to_dict()
-    cart_data = (
-        db.query(Cart).filter(Cart.id == id, Cart.user_id == current_user.id).first()
-    )
+    statement = select_carts(current_user.id).where(Cart.id == id)
+    db_cart = (await db.scalars(statement)).first()
 
     if db_cart:
         for var, value in vars(cart).items():
-            index = 1
-            if str(var) == "foods":
-                new_foods = []
-                for name in cart.foods:
-                    food = (
-                        db.query(Food)
-                        .filter(Food.name == name, Food.user_id == current_user.id)
-                        .first()
-                    )
-                    if food:
-
-                        association = (
-                            db.query(CartFood)
-                            .filter(
-                                CartFood.cart_id == db_cart.id,
-                                CartFood.food_id == food.id,
-                            )
-                            .first()
-                        )
-
-                        if not association:
-                            # Create association
-                            association = CartFood(
-                                food_qty=1,
-                                cart_id=db_cart.id,
-                                user_id=current_user.id,
-                                food_id=food.id,
-                            )
-                            db.add(association)
-
-                        if association not in new_foods:
-                            new_foods.append(association)
-                        elif association in new_foods:
-                            index += 1
-                            association_index = new_foods.index(association)
-                            association_obj = new_foods[association_index]
-                            # association_obj.food_qty += 1
-                            association_obj.food_qty = index
-
-                db_cart.foods = new_foods
-            else:
+            if str(var) != "foods":
                 setattr(db_cart, var, value) if value or str(value) == "False" else None
-        if (
-            db_cart.name != cart_data.name
-            or db_cart.status != cart_data.status
-            or db_cart.foods != cart_data.foods
-        ):
-            db.commit()
-            db.refresh(db_cart)
-        return db_cart.to_dict()
+
+        # Only replace the items when the client sent a list
+        if "foods" in cart.__fields_set__:
+            await sync_cart_items(db, db_cart.id, current_user.id, cart.foods or [])
+
+        await bump_version(db, "carts", current_user.id)
+        await db.commit()
+        db_cart = (await db.scalars(statement)).first()
+        return serialize_cart(db_cart)
 
     return JSONResponse(
         content={"error": "Cart does not exist."},
@@ -151,45 +177,28 @@ async def update(
 @router.post("/")
 async def create(
     cart: CartSchema = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: any = Depends(JWTBearer()),
 ):
     cart_exists = (
-        db.query(Cart)
-        .filter(Cart.name == cart.name, Cart.user_id == current_user.id)
-        .first()
-    )
+        await db.scalars(
+            select(Cart).where(Cart.name == cart.name, Cart.user_id == current_user.id)
+        )
+    ).first()
 
     if not cart_exists:
         new_cart = Cart(name=cart.name, status=cart.status, user=current_user)
+        db.add(new_cart)
+        await db.flush()
 
         if cart.foods:
-            for name in cart.foods:
-                food = (
-                    db.query(Food)
-                    .filter(Food.name == name, Food.user_id == current_user.id)
-                    .first()
-                )
-                if food:
-                    association = CartFood(
-                        food_qty=1,
-                        cart_id=new_cart.id,
-                        user_id=current_user.id,
-                        food_id=food.id,
-                    )
-
-                    if association not in new_cart.foods:
-                        db.add(association)
-                        new_cart.foods.append(association)
-                    elif association in new_cart.foods:
-                        association_index = new_cart.foods.index(association)
-                        association_obj = new_cart.foods[association_index]
-                        association_obj.food_qty += 1
+            await sync_cart_items(db, new_cart.id, current_user.id, cart.foods)
 
-        db.add(new_cart)
-        db.commit()
-        db.refresh(new_cart)
-        return new_cart.to_dict()
+        await bump_version(db, "carts", current_user.id)
+        await db.commit()
+        statement = select_carts(current_user.id).where(Cart.id == new_cart.id)
+        new_cart = (await db.scalars(statement)).first()
+        return serialize_cart(new_cart)
 
     return JSONResponse(
         content={"error": f"Cart '{cart.name}', already exists."},
@@ -200,16 +209,20 @@ async def create(
 @router.delete("/{id}")
 async def delete(
     id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: any = Depends(JWTBearer()),
 ):
-    db_cart = (
-        db.query(Cart).filter(Cart.id == id, Cart.user_id == current_user.id).first()
-    )
+    statement = select_carts(current_user.id).where(Cart.id == id)
+    db_cart = (await db.scalars(statement)).first()
     if db_cart:
-        db.query(Cart).filter(Cart.id == id, Cart.user_id == current_user.id).delete()
-        db.commit()
-        return db_cart
+        cart_data = serialize_cart(db_cart)
+        await forget_carts(db, current_user.id, [id])
+        await db.execute(
+            sql_delete(Cart).where(Cart.id == id, Cart.user_id == current_user.id)
+        )
+        await bump_version(db, "carts", current_user.id)
+        await db.commit()
+        return cart_data
     return JSONResponse(
         content={"error": "Cart does not exist."},
         status_code=400,
@@ -0,0 +1,13 @@
+from database.loading import loader_options
+from database.models import Category
+from sqlalchemy import select
+
+
+def select_categories(user_id: str, expand: frozenset = None):
+    # `expand` names the relations to load, see database/loading.py
+    return (
+        select(Category)
+        .options(*loader_options(Category, expand))
+        .where(Category.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )
@@ -1,13 +1,27 @@
 import uuid
 
 from database.connect import get_db
+from database.loading import parse_expand
 from database.models import Category, User
-from fastapi import APIRouter, Body, Depends
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Body, Depends, Request, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import delete as sql_delete
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.middlewares import JWTBearer
-
+from src.utils import (
+    MAX_PAGE_LIMIT,
+    bump_version,
+    cache_response,
+    check_etag,
+    clamp_limit,
+    expand_plan,
+    get_cached_response,
+    paginate,
+    serialize_category,
+)
+
+from .queries import select_categories
 from .schemas import CategorySchema
 
 router = APIRouter()
@@ -16,14 +30,16 @@ router = APIRouter()
 @router.post("/")
 async def create(
     category: CategorySchema = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
     category_exists = (
-        db.query(Category)
-        .filter(Category.name == category.name, Category.user_id == current_user.id)
-        .first()
-    )
+        await db.scalars(
+            select(Category).where(
+                Category.name == category.name, Category.user_id == current_user.id
+            )
+        )
+    ).first()
 
     if not category_exists:
         new_category = Category(name=category.name, user=current_user)
@@ -32,9 +48,13 @@ async def create(
             new_category.description = category.description
 
         db.add(new_category)
-        db.commit()
-        db.refresh(new_category)
-        return new_category.to_dict()
+        await bump_version(db, "categories", current_user.id)
+        await db.commit()
+        statement = select_categories(current_user.id).where(
+            Category.id == new_category.id
+        )
+        new_category = (await db.scalars(statement)).first()
+        return serialize_category(new_category)
 
     return JSONResponse(
         content={"error": f"Category '{category.name}', already exists."},
@@ -44,35 +64,99 @@ async def create(
 
 @router.get("/")
 async def get_all(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     page: int = None,
     limit: int = 10,
+    cursor: str = None,
+    expand: str = None,
     current_user: User = Depends(JWTBearer()),
 ):
+    try:
+        expand = parse_expand(Category, expand)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+    serialize = expand_plan(serialize_category, expand)
+
+    not_modified = await check_etag(
+        db, request, response, current_user.id, "categories"
+    )
+    if not_modified:
+        return not_modified
+
+    cached = await get_cached_response(response, current_user.id, "categories")
+    if cached:
+        return cached
+
+    limit = clamp_limit(limit)
+
+    if cursor is not None:
+        # Keyset pagination, pass an empty cursor to get the first page
+        try:
+            categories, next_cursor = await paginate(
+                db, select_categories(current_user.id, expand), Category, cursor, limit
+            )
+        except ValueError as e:
+            return JSONResponse(
+                content={"error": str(e)},
+                status_code=400,
+            )
+        return await cache_response(
+            response,
+            current_user.id,
+            "categories",
+            {
+                "data": [serialize(category) for category in categories],
+                "next_cursor": next_cursor,
+            },
+        )
+
     if type(page) is int:
         # Page starts at 1
         skip = (page - 1) * limit
-        categories = (
-            db.query(Category)
-            .filter(Category.user_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        statement = select_categories(current_user.id, expand).offset(skip).limit(limit)
     else:
-        categories = (
-            db.query(Category).filter(Category.user_id == current_user.id).all()
+        # Without page or cursor, the first MAX_PAGE_LIMIT rows
+        statement = (
+            select_categories(current_user.id, expand)
+            .order_by(Category.created_at, Category.id)
+            .limit(MAX_PAGE_LIMIT)
         )
+    categories = (await db.scalars(statement)).all()
     data = []
     for category in categories:
-        data.append(category.to_dict())
-    return data
+        data.append(serialize(category))
+    return await cache_response(response, current_user.id, "categories", data)
 
 
 @router.get("/{id}")
 async def get_one(
-    id: str, db: Session = Depends(get_db), current_user: User = Depends(JWTBearer())
+    id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    expand: str = None,
+    current_user: User = Depends(JWTBearer()),
 ):
+    try:
+        expand = parse_expand(Category, expand)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+    serialize = expand_plan(serialize_category, expand)
+
+    not_modified = await check_etag(
+        db, request, response, current_user.id, "categories"
+    )
+    if not_modified:
+        return not_modified
+
     categories = None
 
     try:
@@ -82,20 +166,15 @@ async def get_one(
         id_is_uuid = False
 
     if id_is_uuid:
-        category = (
-            db.query(Category)
-            .filter(Category.id == id, Category.user_id == current_user.id)
-            .first()
-        )
+        statement = select_categories(current_user.id, expand).where(Category.id == id)
     else:
-        category = (
-            db.query(Category)
-            .filter(Category.name == id, Category.user_id == current_user.id)
-            .first()
+        statement = select_categories(current_user.id, expand).where(
+            Category.name == id
         )
+    category = (await db.scalars(statement)).first()
 
     if category:
-        return category.to_dict()
+        return serialize(category)
 
     return JSONResponse(
         content={"error": "Category does not exist."},
@@ -107,17 +186,14 @@ async def get_one(
 async def update(
     id: str,
     category: CategorySchema = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
-    db_category = (
-        db.query(Category)
-        .filter(Category.id == id, Category.user_id == current_user.id)
-        .first()
-    )
-    db_category_data = jsonable_encoder(db_category)
+    statement = select_categories(current_user.id).where(Category.id == id)
+    db_category = (await db.scalars(statement)).first()
 
     if db_category:
+        db_category_data = serialize_category(db_category)
         for var, value in vars(category).items():
             setattr(db_category, var, value) if value or str(value) == "False" else None
 
@@ -125,9 +201,10 @@ async def update(
             db_category.name != db_category_data["name"]
             or db_category.description != db_category_data["description"]
         ):
-            db.commit()
-            db.refresh(db_category)
-        return db_category.to_dict()
+            await bump_version(db, "categories", current_user.id)
+            await db.commit()
+            db_category = (await db.scalars(statement)).first()
+        return serialize_category(db_category)
 
     return JSONResponse(
         content={"error": "Category does not exist."},
@@ -138,20 +215,21 @@ async def update(
 @router.delete("/{id}")
 async def delete(
     id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
-    db_category = (
-        db.query(Category)
-        .filter(Category.id == id, Category.user_id == current_user.id)
-        .first()
-    )
+    statement = select_categories(current_user.id).where(Category.id == id)
+    db_category = (await db.scalars(statement)).first()
     if db_category:
-        db.query(Category).filter(
-            Category.id == id, Category.user_id == current_user.id
-        ).delete()
-        db.commit()
-        return db_category
+        category_data = serialize_category(db_category)
+        await db.execute(
+            sql_delete(Category).where(
+                Category.id == id, Category.user_id == current_user.id
+            )
+        )
+        await bump_version(db, "categories", current_user.id)
+        await db.commit()
+        return category_data
     return JSONResponse(
         content={"error": "Category does not exist."},
         status_code=400,
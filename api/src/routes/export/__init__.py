@@ -0,0 +1 @@
+from .routes import router as export_router
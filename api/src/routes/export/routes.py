@@ -0,0 +1,103 @@
+import csv
+import io
+from datetime import datetime
+
+import orjson
+from database.connect import new_session
+from database.models import User
+from decouple import config
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
+from src.middlewares import JWTBearer
+
+from .tables import TABLES, parse_tables
+
+# Rows fetched from the cursor per chunk of the response
+EXPORT_BATCH_SIZE = config("EXPORT_BATCH_SIZE", default=1000, cast=int)
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+router = APIRouter()
+
+
+def ndjson_lines(table: str, columns, rows):
+    return b"".join(
+        orjson.dumps({"table": table, **dict(zip(columns, row))}) + b"\n"
+        for row in rows
+    )
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            [
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            ]
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+async def stream_export(user_id: str, tables, format: str):
+    # Runs while the response is sent, so it has its own session. Each table
+    # is read through a server side cursor a partition at a time, memory
+    # stays the same however many rows the user has.
+    db = new_session()
+    try:
+        for table in tables:
+            statement = TABLES[table](user_id).execution_options(
+                yield_per=EXPORT_BATCH_SIZE
+            )
+            columns = list(statement.selected_columns.keys())
+            if format == "csv":
+                yield csv_lines([columns])
+
+            result = await db.stream(statement)
+            try:
+                async for rows in result.partitions():
+                    if format == "csv":
+                        yield csv_lines(rows)
+                    else:
+                        yield ndjson_lines(table, columns, rows)
+            finally:
+                await result.close()
+    finally:
+        await db.close()
+
+
+@router.get("/")
+async def export(
+    format: str = "ndjson",
+    tables: str = None,
+    current_user: User = Depends(JWTBearer()),
+):
+    try:
+        tables = parse_tables(tables)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+
+    if format not in MEDIA_TYPES:
+        return JSONResponse(
+            content={
+                "error": f"Cannot export as '{format}', "
+                f"expected any of '{', '.join(MEDIA_TYPES)}'."
+            },
+            status_code=400,
+        )
+    if format == "csv" and len(tables) != 1:
+        return JSONResponse(
+            content={"error": "A CSV export holds one table, name it in 'tables'."},
+            status_code=400,
+        )
+
+    filename = f"{tables[0] if len(tables) == 1 else 'export'}.{format}"
+    return StreamingResponse(
+        stream_export(current_user.id, tables, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
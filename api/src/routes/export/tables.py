@@ -0,0 +1,108 @@
+from database.models import Cart, Category, Food
+from database.relationships import CartFood, CategoryFood
+from sqlalchemy import select
+
+# What GET /api/export can send, one flat table each so every format can
+# stream it row by row. Rows come in creation order, through the keyset
+# pagination indexes.
+
+
+def select_foods(user_id: str):
+    return (
+        select(
+            Food.id,
+            Food.name,
+            Food.description,
+            Food.image,
+            Food.created_at,
+            Food.updated_at,
+        )
+        .where(Food.user_id == user_id)
+        .order_by(Food.created_at, Food.id)
+    )
+
+
+def select_categories(user_id: str):
+    return (
+        select(
+            Category.id,
+            Category.name,
+            Category.description,
+            Category.created_at,
+            Category.updated_at,
+        )
+        .where(Category.user_id == user_id)
+        .order_by(Category.created_at, Category.id)
+    )
+
+
+def select_food_categories(user_id: str):
+    return (
+        select(
+            Food.id.label("food_id"),
+            Food.name.label("food_name"),
+            Category.id.label("category_id"),
+            Category.name.label("category_name"),
+        )
+        .join(CategoryFood, CategoryFood.c.food_id == Food.id)
+        .join(Category, Category.id == CategoryFood.c.category_id)
+        .where(Food.user_id == user_id)
+        .order_by(Food.created_at, Food.id, Category.name)
+    )
+
+
+def select_carts(user_id: str):
+    return (
+        select(
+            Cart.id,
+            Cart.name,
+            Cart.status,
+            Cart.created_at,
+            Cart.updated_at,
+        )
+        .where(Cart.user_id == user_id)
+        .order_by(Cart.created_at, Cart.id)
+    )
+
+
+def select_cart_items(user_id: str):
+    return (
+        select(
+            Cart.id.label("cart_id"),
+            Cart.name.label("cart_name"),
+            Food.id.label("food_id"),
+            Food.name.label("food_name"),
+            CartFood.food_qty.label("quantity"),
+        )
+        .join(CartFood, CartFood.cart_id == Cart.id)
+        .join(Food, Food.id == CartFood.food_id)
+        .where(Cart.user_id == user_id)
+        .order_by(Cart.created_at, Cart.id, Food.name)
+    )
+
+
+TABLES = {
+    "foods": select_foods,
+    "categories": select_categories,
+    "food_categories": select_food_categories,
+    "carts": select_carts,
+    "cart_items": select_cart_items,
+}
+
+
+def parse_tables(tables: str = None):
+    # `?tables=` query parameter, a comma separated list, all when missing
+    if not tables:
+        return list(TABLES)
+    names = []
+    for name in tables.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    unknown = [name for name in names if name not in TABLES]
+    if unknown:
+        raise ValueError(
+            f"Cannot export '{', '.join(unknown)}', "
+            f"expected any of '{', '.join(TABLES)}'."
+        )
+    return names
@@ -0,0 +1,171 @@
+import uuid
+
+from database.models import Food
+from decouple import config
+from sqlalchemy import bindparam, delete, insert, select, update
+from src.routes.statistics.rollups import forget_foods
+from src.utils import serialize_food
+
+from .categories import parse_category_names, resolve_categories, sync_foods_categories
+from .queries import select_foods_by_id
+
+MAX_BATCH_SIZE = config("MAX_BATCH_SIZE", default=500, cast=int)
+
+foods_table = Food.__table__
+
+# Every batch route answers one result per item, in order: {"food": ...} or
+# {"error": ...}. The valid items are written in one transaction with bulk
+# statements, whatever their number.
+
+
+def check_batch_size(items):
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"A batch holds at most {MAX_BATCH_SIZE} foods.")
+
+
+async def owned_foods(db, user_id: str, ids, expand: frozenset = None):
+    # The user's foods among `ids`, by id
+    if not ids:
+        return {}
+    statement = select_foods_by_id(user_id, list(ids), expand)
+    return {food.id: food for food in (await db.scalars(statement)).all()}
+
+
+async def taken_names(db, user_id: str, names):
+    # {name: food id} for the names the user's foods already have
+    if not names:
+        return {}
+    rows = await db.execute(
+        select(Food.name, Food.id).where(
+            Food.user_id == user_id, Food.name.in_(list(names))
+        )
+    )
+    return {name: id for name, id in rows}
+
+
+async def link_categories(db, user_id: str, names_by_food):
+    # {food id: category names} -> links, every category of the batch is
+    # resolved (and created) in one go. Returns the ids of the foods whose
+    # links changed
+    names = parse_category_names(
+        [name for food_names in names_by_food.values() for name in food_names]
+    )
+    ids = dict(zip(names, await resolve_categories(db, user_id, names)))
+    return await sync_foods_categories(
+        db,
+        {
+            food_id: [ids[name] for name in parse_category_names(food_names)]
+            for food_id, food_names in names_by_food.items()
+        },
+    )
+
+
+async def create_foods(db, user_id: str, items):
+    # Returns one result per item, the new food's id or an error
+    taken = await taken_names(db, user_id, {item.name for item in items})
+
+    results = []
+    rows = []
+    categories = {}
+    for item in items:
+        if not item.name.strip():
+            results.append(dict(error="Food name is required."))
+        elif item.name in taken:
+            results.append(dict(error=f"Food '{item.name}', already exists."))
+        else:
+            id = str(uuid.uuid4())
+            # Later items with the same name fail
+            taken[item.name] = id
+            rows.append(
+                dict(
+                    id=id,
+                    user_id=user_id,
+                    name=item.name,
+                    description=item.description or None,
+                )
+            )
+            if item.categories:
+                categories[id] = item.categories
+            results.append(dict(id=id))
+
+    if rows:
+        await db.execute(insert(foods_table), rows)
+        await link_categories(db, user_id, categories)
+    return results
+
+
+async def update_foods(db, user_id: str, items):
+    # Returns one result per item, the food's id or an error, and the ids of
+    # the foods that changed
+    foods = await owned_foods(db, user_id, {item.id for item in items}, frozenset())
+    taken = await taken_names(db, user_id, {item.name for item in items if item.name})
+
+    results = []
+    rows = {}
+    categories = {}
+    seen = set()
+    for item in items:
+        food = foods.get(item.id)
+        if food is None:
+            results.append(dict(error="Food does not exist."))
+            continue
+        if food.id in seen:
+            results.append(dict(error=f"Food '{food.id}', appears more than once."))
+            continue
+        seen.add(food.id)
+
+        name = item.name or food.name
+        if taken.get(name, food.id) != food.id:
+            results.append(dict(error=f"Name {name}, already exist"))
+            continue
+        taken[name] = food.id
+
+        description = item.description or food.description
+        if name != food.name or description != food.description:
+            rows[food.id] = dict(b_id=food.id, b_name=name, b_description=description)
+        if item.categories is not None:
+            categories[food.id] = item.categories
+        results.append(dict(id=food.id))
+
+    if rows:
+        await db.execute(
+            update(foods_table)
+            .where(foods_table.c.id == bindparam("b_id"))
+            .values(name=bindparam("b_name"), description=bindparam("b_description")),
+            list(rows.values()),
+        )
+    changed = set(rows) | await link_categories(db, user_id, categories)
+    return results, changed
+
+
+async def delete_foods(db, user_id: str, ids):
+    # Returns one result per id, the deleted food or an error, and the images
+    # the deleted foods pointed at
+    foods = await owned_foods(db, user_id, set(ids))
+
+    results = []
+    deleted = {}
+    for id in ids:
+        food = foods.get(id)
+        if food is None or id in deleted:
+            results.append(dict(error="Food does not exist."))
+        else:
+            deleted[id] = food
+            results.append(dict(food=serialize_food(food)))
+
+    if deleted:
+        # Cart lines and category links go with them, ON DELETE CASCADE
+        await forget_foods(db, user_id, deleted)
+        await db.execute(delete(Food).where(Food.id.in_(list(deleted))))
+    return results, {food.image for food in deleted.values() if food.image}
+
+
+async def serialize_results(db, user_id: str, results):
+    # Replaces the ids in `results` by the foods, loaded in one query
+    foods = await owned_foods(
+        db, user_id, {result["id"] for result in results if "id" in result}
+    )
+    return [
+        dict(food=serialize_food(foods[result["id"]])) if "id" in result else result
+        for result in results
+    ]
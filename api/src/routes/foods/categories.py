@@ -0,0 +1,117 @@
+from database import engine
+from database.models import Category
+from database.relationships import CategoryFood
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from src.routes.statistics.rollups import record_links
+
+categories_table = Category.__table__
+
+
+def parse_category_names(value):
+    # "a, b,a" or ["a", " b", "a"] -> ["a", "b"], keeping the order the
+    # client sent
+    if isinstance(value, str):
+        value = value.split(",")
+    names = []
+    for name in value:
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def insert_missing_categories():
+    # Concurrent requests may create the same category, let the
+    # (user_id, name) unique constraint decide instead of failing
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(categories_table).on_conflict_do_nothing(
+            index_elements=["user_id", "name"]
+        )
+    if dialect == "postgresql":
+        return postgresql.insert(categories_table).on_conflict_do_nothing(
+            index_elements=["user_id", "name"]
+        )
+    if dialect == "mysql":
+        return insert(categories_table).prefix_with("IGNORE")
+    return insert(categories_table)
+
+
+async def resolve_categories(db, user_id: str, names):
+    # Category ids for `names`, creating the missing ones in bulk
+    if not names:
+        return []
+
+    lookup = select(Category.name, Category.id).where(
+        Category.user_id == user_id, Category.name.in_(names)
+    )
+    ids = {name: id for name, id in await db.execute(lookup)}
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        await db.execute(
+            insert_missing_categories(),
+            [dict(user_id=user_id, name=name) for name in missing],
+        )
+        ids.update(
+            {
+                name: id
+                for name, id in await db.execute(
+                    lookup.where(Category.name.in_(missing))
+                )
+            }
+        )
+
+    return [ids[name] for name in names]
+
+
+async def sync_food_categories(db, food_id: str, category_ids):
+    # Replace the food's category links with a set difference, returns
+    # whether anything changed
+    return bool(await sync_foods_categories(db, {food_id: category_ids}))
+
+
+async def sync_foods_categories(db, wanted):
+    # Same for several foods, `wanted` maps food ids to category ids. One
+    # select, one bulk insert and one delete at most, returns the ids of the
+    # foods whose links changed. Moves the foods' quantities between the
+    # categories' statistics.
+    if not wanted:
+        return set()
+
+    rows = await db.execute(
+        select(CategoryFood.c.food_id, CategoryFood.c.category_id).where(
+            CategoryFood.c.food_id.in_(list(wanted))
+        )
+    )
+    current = {}
+    for food_id, category_id in rows:
+        current.setdefault(food_id, set()).add(category_id)
+
+    added = []
+    removed = []
+    for food_id, category_ids in wanted.items():
+        linked = current.get(food_id, set())
+        added += [
+            dict(food_id=food_id, category_id=category_id)
+            for category_id in dict.fromkeys(category_ids)
+            if category_id not in linked
+        ]
+        removed += [
+            (food_id, category_id) for category_id in linked - set(category_ids)
+        ]
+
+    if added:
+        await db.execute(insert(CategoryFood), added)
+    if removed:
+        await db.execute(
+            delete(CategoryFood).where(
+                tuple_(CategoryFood.c.food_id, CategoryFood.c.category_id).in_(removed)
+            )
+        )
+    await record_links(
+        db, [(row["food_id"], row["category_id"]) for row in added], removed
+    )
+
+    return {row["food_id"] for row in added} | {food_id for food_id, _ in removed}
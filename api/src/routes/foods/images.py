@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+
+import aiofiles.os
+from database.connect import new_session
+from database.models import Food
+from decouple import config
+from sqlalchemy import select, update
+from src.utils import bump_version, image_processor, remove_upload
+
+UPLOAD_GRACE_PERIOD = config("UPLOAD_GRACE_PERIOD", default=60, cast=int)
+
+# {file location: task} of the removals put off by the grace period
+pending_removals = {}
+
+logger = logging.getLogger(__name__)
+
+
+async def process_image(file_location):
+    # Background task: resize the upload and record the variants on every food
+    # using it. Runs after the response has been sent.
+    try:
+        variants = await image_processor.make_variants(file_location)
+    except Exception:
+        logger.exception("Could not create variants of %s", file_location)
+        return {}
+    if not variants:
+        return variants
+
+    db = new_session()
+    try:
+        user_ids = (
+            await db.scalars(
+                select(Food.user_id).where(Food.image == file_location).distinct()
+            )
+        ).all()
+        await db.execute(
+            update(Food)
+            .where(Food.image == file_location)
+            .values(image_variants=variants)
+        )
+        await bump_version(db, "foods", *user_ids)
+        await db.commit()
+    finally:
+        await db.close()
+    return variants
+
+
+async def remove_if_unused(db, file_location):
+    # Deletes the image and its variants when no food points at it. Returns
+    # the seconds to wait before trying again when the file is too recent to
+    # tell, 0 otherwise.
+    if not file_location:
+        return 0
+    in_use = (
+        await db.scalars(select(Food.id).where(Food.image == file_location).limit(1))
+    ).first()
+    if in_use is not None:
+        return 0
+    # save_upload writes the file before the food using it is committed, and
+    # every save replaces it. A file written within UPLOAD_GRACE_PERIOD may
+    # belong to a food the check above could not see yet.
+    try:
+        modified = (await aiofiles.os.stat(file_location)).st_mtime
+    except FileNotFoundError:
+        modified = 0
+    age = time.time() - modified
+    if age < UPLOAD_GRACE_PERIOD:
+        return UPLOAD_GRACE_PERIOD - age
+    await remove_upload(file_location)
+    for location in image_processor.locations(file_location):
+        await remove_upload(location)
+    return 0
+
+
+async def remove_later(file_location, delay):
+    # Checks the image again once its grace period is over, for as long as it
+    # keeps being written
+    while delay:
+        await asyncio.sleep(delay)
+        db = new_session()
+        try:
+            delay = await remove_if_unused(db, file_location)
+        except Exception:
+            logger.exception("Could not remove %s", file_location)
+            return
+        finally:
+            await db.close()
+
+
+async def remove_unused_image(db, file_location):
+    # Images are named by content hash and shared between foods, only delete
+    # the file once no food points at it. Call after the commit so a rollback
+    # never leaves a food without its image. A file too recent to tell is
+    # checked again later, in this process; `python manage.py
+    # remove-unused-images` deletes those left over by a restart.
+    delay = await remove_if_unused(db, file_location)
+    if delay and file_location not in pending_removals:
+        task = asyncio.create_task(remove_later(file_location, delay))
+        pending_removals[file_location] = task
+        task.add_done_callback(lambda _: pending_removals.pop(file_location, None))
@@ -0,0 +1,26 @@
+from database.loading import loader_options
+from database.models import Food
+from sqlalchemy import select
+
+
+def select_foods(user_id: str, expand: frozenset = None):
+    # `expand` names the relations to load, see database/loading.py
+    return (
+        select(Food)
+        .options(*loader_options(Food, expand))
+        .where(Food.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def select_foods_by_id(user_id: str, ids, expand: frozenset = None):
+    # The ids come from the search index or the request body, so the owner
+    # filter is repeated as defence in depth. It is compared with `|| ''` to
+    # keep it off the indexes: without statistics SQLite would otherwise walk
+    # every food of the user through (user_id, name) instead of the ids.
+    return (
+        select(Food)
+        .options(*loader_options(Food, expand))
+        .where(Food.id.in_(ids), Food.user_id.concat("") == user_id)
+        .execution_options(populate_existing=True)
+    )
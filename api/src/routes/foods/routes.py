@@ -1,48 +1,261 @@
-import os
-import shutil
 import uuid
-from typing import Optional
+from typing import List, Optional
 
 from database.connect import get_db
-from database.models import Category, Food, User
-from database.relationships import CartFood
-from fastapi import APIRouter, Depends, File, Form, Response, UploadFile
+from database.loading import parse_expand
+from database.models import Food, User
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Body,
+    Depends,
+    File,
+    Form,
+    Request,
+    Response,
+    UploadFile,
+)
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import delete as sql_delete
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.middlewares import JWTBearer
+from src.routes.statistics.rollups import forget_foods
+from src.utils import (
+    MAX_PAGE_LIMIT,
+    UploadTooLarge,
+    bump_version,
+    cache_response,
+    check_etag,
+    clamp_limit,
+    expand_plan,
+    get_cached_response,
+    paginate,
+    save_upload,
+    serialize_food,
+)
+
+from .batch import (
+    check_batch_size,
+    create_foods,
+    delete_foods,
+    serialize_results,
+    update_foods,
+)
+from .categories import (
+    parse_category_names,
+    resolve_categories,
+    sync_food_categories,
+)
+from .images import process_image, remove_unused_image
+from .queries import select_foods, select_foods_by_id
+from .schemas import FoodBatchCreateSchema, FoodBatchUpdateSchema
+from .search import search_food_ids
 
 router = APIRouter()
 
 
 @router.get("/")
 async def get_all(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     page: int = None,
     limit: int = 10,
+    cursor: str = None,
+    expand: str = None,
     current_user: User = Depends(JWTBearer()),
 ):
+    try:
+        expand = parse_expand(Food, expand)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+    serialize = expand_plan(serialize_food, expand)
+
+    not_modified = await check_etag(db, request, response, current_user.id, "foods")
+    if not_modified:
+        return not_modified
+
+    cached = await get_cached_response(response, current_user.id, "foods")
+    if cached:
+        return cached
+
+    limit = clamp_limit(limit)
+
+    if cursor is not None:
+        # Keyset pagination, pass an empty cursor to get the first page
+        try:
+            foods, next_cursor = await paginate(
+                db, select_foods(current_user.id, expand), Food, cursor, limit
+            )
+        except ValueError as e:
+            return JSONResponse(
+                content={"error": str(e)},
+                status_code=400,
+            )
+        return await cache_response(
+            response,
+            current_user.id,
+            "foods",
+            {
+                "data": [serialize(food) for food in foods],
+                "next_cursor": next_cursor,
+            },
+        )
+
     if type(page) is int:
         # Page starts at 1
         skip = (page - 1) * limit
-        foods = (
-            db.query(Food)
-            .filter(Food.user_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        statement = select_foods(current_user.id, expand).offset(skip).limit(limit)
     else:
-        foods = db.query(Food).filter(Food.user_id == current_user.id).all()
+        # Without page or cursor, the first MAX_PAGE_LIMIT rows
+        statement = (
+            select_foods(current_user.id, expand)
+            .order_by(Food.created_at, Food.id)
+            .limit(MAX_PAGE_LIMIT)
+        )
+    foods = (await db.scalars(statement)).all()
     data = []
     for food in foods:
-        data.append(food.to_dict())
-    return data
+        data.append(serialize(food))
+    return await cache_response(response, current_user.id, "foods", data)
+
+
+# Declared before "/{id}", which would take "search" for a food name
+@router.get("/search")
+async def search(
+    request: Request,
+    response: Response,
+    q: str = "",
+    db: AsyncSession = Depends(get_db),
+    limit: int = 10,
+    expand: str = None,
+    current_user: User = Depends(JWTBearer()),
+):
+    try:
+        expand = parse_expand(Food, expand)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+    serialize = expand_plan(serialize_food, expand)
+
+    not_modified = await check_etag(db, request, response, current_user.id, "foods")
+    if not_modified:
+        return not_modified
+
+    cached = await get_cached_response(response, current_user.id, "foods")
+    if cached:
+        return cached
+
+    ids = await search_food_ids(db, current_user.id, q, clamp_limit(limit))
+    foods = {}
+    if ids:
+        statement = select_foods_by_id(current_user.id, ids, expand)
+        foods = {food.id: food for food in (await db.scalars(statement)).all()}
+    # Best match first
+    data = [serialize(foods[id]) for id in ids if id in foods]
+    return await cache_response(response, current_user.id, "foods", data)
+
+
+# Batch routes, one result per item, see src/routes/foods/batch.py. Declared
+# before "/{id}" too
+@router.post("/batch")
+async def create_batch(
+    foods: List[FoodBatchCreateSchema] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(JWTBearer()),
+):
+    try:
+        check_batch_size(foods)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+
+    results = await create_foods(db, current_user.id, foods)
+    if any("id" in result for result in results):
+        await bump_version(db, "foods", current_user.id)
+        await db.commit()
+
+    return await serialize_results(db, current_user.id, results)
+
+
+@router.put("/batch")
+async def update_batch(
+    foods: List[FoodBatchUpdateSchema] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(JWTBearer()),
+):
+    try:
+        check_batch_size(foods)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+
+    results, changed = await update_foods(db, current_user.id, foods)
+    if changed:
+        await bump_version(db, "foods", current_user.id)
+        await db.commit()
+
+    return await serialize_results(db, current_user.id, results)
+
+
+@router.delete("/batch")
+async def delete_batch(
+    ids: List[str] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(JWTBearer()),
+):
+    try:
+        check_batch_size(ids)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+
+    results, images = await delete_foods(db, current_user.id, ids)
+    if any("food" in result for result in results):
+        await bump_version(db, "foods", current_user.id)
+        await db.commit()
+
+        # Delete old images
+        for image in images:
+            await remove_unused_image(db, image)
+
+    return results
 
 
 @router.get("/{id}")
 async def get_one(
-    id: str, db: Session = Depends(get_db), current_user: User = Depends(JWTBearer())
+    id: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    expand: str = None,
+    current_user: User = Depends(JWTBearer()),
 ):
+    try:
+        expand = parse_expand(Food, expand)
+    except ValueError as e:
+        return JSONResponse(
+            content={"error": str(e)},
+            status_code=400,
+        )
+    serialize = expand_plan(serialize_food, expand)
+
+    not_modified = await check_etag(db, request, response, current_user.id, "foods")
+    if not_modified:
+        return not_modified
+
     food = None
 
     try:
@@ -52,20 +265,13 @@ async def get_one(
         id_is_uuid = False
 
     if id_is_uuid:
-        food = (
-            db.query(Food)
-            .filter(Food.id == id, Food.user_id == current_user.id)
-            .first()
-        )
+        statement = select_foods(current_user.id, expand).where(Food.id == id)
     else:
-        food = (
-            db.query(Food)
-            .filter(Food.name == id, Food.user_id == current_user.id)
-            .first()
-        )
+        statement = select_foods(current_user.id, expand).where(Food.name == id)
+    food = (await db.scalars(statement)).first()
 
     if food:
-        return food.to_dict()
+        return serialize(food)
 
     return JSONResponse(
         content={"error": "Food does not exist."},
@@ -75,55 +281,52 @@ async def get_one(
 
 @router.post("/")
 async def create(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     description: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     categories: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
     # Check if Food exists
     food_exists = (
-        db.query(Food)
-        .filter(Food.name == name, Food.user_id == current_user.id)
-        .first()
-    )
+        await db.scalars(
+            select(Food).where(Food.name == name, Food.user_id == current_user.id)
+        )
+    ).first()
 
     if not food_exists:
         food = Food(name=name, user=current_user)
         if image:
             if image.filename:
-                ext = os.path.splitext(image.filename)[1]
-                while True:
-                    # this is the closest thing to a do-while loop, in python
-                    filename = uuid.uuid4().hex + ext
-                    file_location = f"static/{filename}"
-                    if not os.path.exists(file_location):
-                        break
                 # Save Image file
-                with open(file_location, "wb+") as file_object:
-                    shutil.copyfileobj(image.file, file_object)
-                # Add Image Path to Model
-                food.image = file_location
+                try:
+                    food.image = await save_upload(image)
+                except UploadTooLarge as e:
+                    return JSONResponse(content={"error": str(e)}, status_code=413)
         if description:
             food.description = description
-        if categories:
-            categories_list = categories.split(",")
-            for name in categories_list:
-                category = (
-                    db.query(Category)
-                    .filter(Category.name == name, Category.user_id == current_user.id)
-                    .first()
-                )
-                if category is None:
-                    category = Category(name=name, user=current_user)
-                # Append Category
-                food.categories.append(category)
 
         db.add(food)
-        db.commit()
-        db.refresh(food)
-        return food.to_dict()
+        await db.flush()
+
+        if categories:
+            category_ids = await resolve_categories(
+                db, current_user.id, parse_category_names(categories)
+            )
+            await sync_food_categories(db, food.id, category_ids)
+
+        await bump_version(db, "foods", current_user.id)
+        await db.commit()
+        statement = select_foods(current_user.id).where(Food.id == food.id)
+        food = (await db.scalars(statement)).first()
+
+        # Resize the image after the response is sent
+        if food.image:
+            background_tasks.add_task(process_image, food.image)
+
+        return serialize_food(food)
 
     return JSONResponse(
         content={"error": f"Food '{name}', already exists."},
@@ -134,27 +337,34 @@ async def create(
 @router.put("/{id}")
 async def update(
     id: str,
+    background_tasks: BackgroundTasks,
     name: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
     categories: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
 
-    food = db.query(Food).filter(Food.id == id, Food.user_id == current_user.id).first()
+    statement = select_foods(current_user.id).where(Food.id == id)
+    food = (await db.scalars(statement)).first()
 
     errors = {}
 
     if food:
-        db_food_data = food.to_dict()
+        db_food_data = serialize_food(food)
+        old_image = food.image
 
         if name:
             food_exists = (
-                db.query(Food)
-                .filter(Food.name == id, Food.user_id == current_user.id)
-                .first()
-            )
+                await db.scalars(
+                    select(Food).where(
+                        Food.name == name,
+                        Food.user_id == current_user.id,
+                        Food.id != food.id,
+                    )
+                )
+            ).first()
             if food_exists:
                 errors["name"] = f"Name {name}, already exist"
                 # This will be the only error
@@ -166,57 +376,38 @@ async def update(
                 food.name = name
         if description:
             food.description = description
+        categories_changed = False
         if categories:
-            categories_list = categories.split(",")
-            new_categories = []
-            for name in categories_list:
-                category = (
-                    db.query(Category)
-                    .filter(Category.name == name, Category.user_id == current_user.id)
-                    .first()
-                )
-                if category is None:
-                    category = Category(name=name, user=current_user)
-                # Append Category
-                # food.categories.append(category)
-                new_categories.append(category)
-            food.categories = new_categories
+            category_ids = await resolve_categories(
+                db, current_user.id, parse_category_names(categories)
+            )
+            categories_changed = await sync_food_categories(db, food.id, category_ids)
         if image:
             if image.filename:
-                ext = os.path.splitext(image.filename)[1]
-                while True:
-                    # this is the closest thing to a do-while loop, in python
-                    filename = uuid.uuid4().hex + ext
-                    file_location = f"static/{filename}"
-                    if not os.path.exists(file_location):
-                        break
                 # Save Image file
-                with open(file_location, "wb+") as file_object:
-                    shutil.copyfileobj(image.file, file_object)
-
-                # Get old image path
-                old_image = food.image
-
-                # Add Image Path to Model
-                food.image = file_location
-
-                # Delete old image
                 try:
-                    if os.path.exists(old_image):
-                        os.remove(old_image)
-                except OSError as e:
-                    ...
+                    food.image = await save_upload(image)
+                except UploadTooLarge as e:
+                    return JSONResponse(content={"error": str(e)}, status_code=413)
+                if food.image != old_image:
+                    food.image_variants = None
 
         if (
             food.name != db_food_data["name"]
-            or food.categories != db_food_data["categories"]
+            or categories_changed
             or food.description != db_food_data["description"]
-            or food.image != db_food_data["image"]
+            or food.image != old_image
         ):
-            db.commit()
-            db.refresh(food)
+            await bump_version(db, "foods", current_user.id)
+            await db.commit()
+            food = (await db.scalars(statement)).first()
+
+            # Delete old image, once the new one is committed
+            if food.image != old_image:
+                await remove_unused_image(db, old_image)
+                background_tasks.add_task(process_image, food.image)
 
-        return food.to_dict()
+        return serialize_food(food)
 
     # if errors:
     #     return {"error": errors}
@@ -230,33 +421,29 @@ async def update(
 @router.delete("/{id}")
 async def delete(
     id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
-    db_food = (
-        db.query(Food).filter(Food.id == id, Food.user_id == current_user.id).first()
-    )
+    statement = select_foods(current_user.id).where(Food.id == id)
+    db_food = (await db.scalars(statement)).first()
 
     if db_food:
-        # Remove Food From Association Table
-        db.query(CartFood).filter(CartFood.food_id == id).delete()
+        food_data = serialize_food(db_food)
 
-        db.query(Food).filter(Food.id == id, Food.user_id == current_user.id).delete()
+        # Cart lines and category links go with it, ON DELETE CASCADE
+        await forget_foods(db, current_user.id, [id])
+        await db.execute(
+            sql_delete(Food).where(Food.id == id, Food.user_id == current_user.id)
+        )
 
-        # Get old image path
-        old_image = db_food.image
+        await bump_version(db, "foods", current_user.id)
+        await db.commit()
 
         # Delete old image
-        try:
-            if os.path.exists(old_image):
-                os.remove(old_image)
-        except OSError as e:
-            ...
-
-        db.commit()
+        await remove_unused_image(db, db_food.image)
 
         # Return Food Object for reference
-        return db_food
+        return food_data
 
     return JSONResponse(
         content={"error": "Food does not exist."},
@@ -0,0 +1,17 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class FoodBatchCreateSchema(BaseModel):
+    name: str
+    description: Optional[str] = None
+    categories: Optional[List[str]] = None
+
+
+class FoodBatchUpdateSchema(BaseModel):
+    id: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    # Replaces the food's categories, leave out to keep them
+    categories: Optional[List[str]] = None
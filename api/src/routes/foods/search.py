@@ -0,0 +1,152 @@
+import re
+
+from database import engine
+from database.models import Category, Food
+from decouple import config
+from sqlalchemy import case, func, or_, select, text
+
+WORDS = re.compile(r"\w+")
+
+# Matches of a tier ranked by name before keeping the best `limit`. Ranking
+# every match (bm25) costs time in proportion to the matches, so each tier
+# reads at most the newest SEARCH_WINDOW of its matches.
+SEARCH_WINDOW = config("SEARCH_WINDOW", default=1000, cast=int)
+
+# Within a tier: the name itself, names starting with the query, then
+# shorter names, see by_name. Applied to the window in SQLite so only the
+# best rows are joined to foods and sent back. lower() only folds ASCII
+# there, by_name orders what is returned again.
+BY_NAME = (
+    "ORDER BY lower(name) != :name, substr(lower(name), 1, length(:name)) != :name, "
+    "length(name), name LIMIT :limit"
+)
+
+# Index maintained by database/migrations/versions/0004_food_search.py
+FTS_SEARCH = text(
+    "SELECT foods.id, foods.name FROM ("
+    "SELECT rowid FROM ("
+    "SELECT rowid, name FROM foods_search WHERE foods_search MATCH :query "
+    "ORDER BY rowid DESC LIMIT :window"
+    f") {BY_NAME}"
+    ") AS hits "
+    "JOIN foods_search_docs ON foods_search_docs.id = hits.rowid "
+    "JOIN foods ON foods.id = foods_search_docs.food_id"
+)
+
+TRIGRAM_SEARCH = text(
+    "SELECT foods.id, foods.name FROM ("
+    "SELECT rowid FROM ("
+    "SELECT rowid, name FROM foods_search_trigram "
+    "WHERE foods_search_trigram MATCH :query AND owner = :user_id "
+    "ORDER BY rowid DESC LIMIT :window"
+    f") {BY_NAME}"
+    ") AS hits "
+    "JOIN foods_search_docs ON foods_search_docs.id = hits.rowid "
+    "JOIN foods ON foods.id = foods_search_docs.food_id"
+)
+
+
+def parse_search(q: str):
+    # "Green tea!" -> ["green", "tea"]
+    return WORDS.findall(q.lower())
+
+
+def fts_words(words):
+    # Every word has to match, as a prefix since the last one is usually
+    # still being typed
+    return "(" + " AND ".join(f'"{word}"*' for word in words) + ")"
+
+
+def by_name(q: str):
+    # Within a tier: the name itself, names starting with the query, then
+    # shorter names
+    q = q.strip().lower()
+    return lambda row: (
+        row.name.lower() != q,
+        not row.name.lower().startswith(q),
+        len(row.name),
+        row.name,
+    )
+
+
+def exact_names(user_id: str, q: str):
+    # The foods named `q`, as typed or in the usual casings, through the
+    # (user_id, name) index: found however many newer foods match too
+    q = q.strip()
+    names = {q, q.lower(), q.upper(), q.capitalize(), q.title()}
+    return select(Food.id, Food.name).where(
+        Food.user_id == user_id, Food.name.in_(names)
+    )
+
+
+def escape_like(value: str):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def like_search(user_id: str, words, limit: int):
+    # Without FTS5: every word has to appear in the name, the description or
+    # a category name, foods whose name starts with the first word first
+    statement = select(Food.id).where(Food.user_id == user_id)
+    for word in words:
+        pattern = f"%{escape_like(word)}%"
+        statement = statement.where(
+            or_(
+                Food.name.ilike(pattern, escape="\\"),
+                Food.description.ilike(pattern, escape="\\"),
+                Food.categories.any(Category.name.ilike(pattern, escape="\\")),
+            )
+        )
+    starts_with = Food.name.ilike(f"{escape_like(words[0])}%", escape="\\")
+    return statement.order_by(
+        case((starts_with, 0), else_=1), func.length(Food.name), Food.name
+    ).limit(limit)
+
+
+def rank(rows, q: str, found, limit: int):
+    # The ids of the best `limit` rows not already `found`
+    found = set(found)
+    rows = [row for row in rows if row.id not in found]
+    return [row.id for row in sorted(rows, key=by_name(q))[:limit]]
+
+
+async def search_food_ids(db, user_id: str, q: str, limit: int):
+    # Ids of the user's best matching foods, best first:
+    #   0. the name is the query
+    #   1. every word starts a word of the name
+    #   2. every word starts a word of the name, description or categories
+    #   3. nothing yet, the query appears inside a name, e.g. "mato"
+    words = parse_search(q)
+    if not words:
+        return []
+
+    if engine.dialect.name != "sqlite":
+        return (await db.scalars(like_search(user_id, words, limit))).all()
+
+    rows = (await db.execute(exact_names(user_id, q))).all()
+    ids = rank(rows, q, [], limit)
+    if len(ids) >= limit:
+        return ids
+
+    owner = f'owner : "{user_id.replace("-", "")}"'
+    tiers = [
+        f"{owner} AND name : {fts_words(words)}",
+        f"{owner} AND {fts_words(words)} NOT name : {fts_words(words)}",
+    ]
+    window = max(limit, SEARCH_WINDOW)
+    # The best `limit` of a tier may include foods found by an earlier one
+    params = dict(name=q.strip().lower(), window=window, limit=limit + len(ids))
+    for query in tiers:
+        rows = (await db.execute(FTS_SEARCH, dict(params, query=query))).all()
+        ids += rank(rows, q, ids, limit - len(ids))
+        params["limit"] = limit + len(ids)
+        if len(ids) >= limit:
+            return ids
+
+    # Trigrams need three characters
+    q = q.strip()
+    if not ids and len(q) >= 3:
+        query = '"' + q.replace('"', '""') + '"'
+        params = dict(params, query=query, user_id=user_id)
+        rows = (await db.execute(TRIGRAM_SEARCH, params)).all()
+        ids += rank(rows, q, ids, limit)
+    return ids
@@ -0,0 +1,91 @@
+import logging
+
+from database.connect import new_session
+from database.models import ImportJob
+from decouple import config
+from sqlalchemy import update
+from sqlalchemy.exc import DBAPIError
+from starlette.concurrency import run_in_threadpool
+from src.utils import bump_version, remove_upload
+
+from .reader import read_chunks
+from .writer import write_rows
+
+# Rows written per transaction, the job's progress is saved with each
+IMPORT_CHUNK_SIZE = config("IMPORT_CHUNK_SIZE", default=1000, cast=int)
+# Errors kept on the job, later ones are only counted
+IMPORT_MAX_ERRORS = config("IMPORT_MAX_ERRORS", default=1000, cast=int)
+
+logger = logging.getLogger(__name__)
+
+import_jobs = ImportJob.__table__
+
+
+async def write_chunk(db, user_id: str, rows):
+    # Writes the chunk in the current transaction. When the database rejects
+    # it, every row is retried in its own transaction to find the culprits.
+    try:
+        return await write_rows(db, user_id, rows)
+    except DBAPIError:
+        await db.rollback()
+
+    errors = []
+    for row in rows:
+        try:
+            errors += await write_rows(db, user_id, [row])
+            await db.commit()
+        except DBAPIError as e:
+            await db.rollback()
+            logger.info("Import row %s rejected: %s", row.line, e.orig)
+            errors.append((row.line, "Conflicts with existing data."))
+    return errors
+
+
+async def run_import(job_id: str, user_id: str, path: str, format: str, table=None):
+    # Background task: reads the uploaded file a chunk at a time off the event
+    # loop, writes each chunk in one transaction and records the progress
+    progress = dict(status="running", rows=0, imported=0, failed=0, errors=[])
+    db = new_session()
+    try:
+        chunks = read_chunks(path, format, table, IMPORT_CHUNK_SIZE)
+        while True:
+            chunk = await run_in_threadpool(next, chunks, None)
+            if chunk is None:
+                break
+
+            errors = [(row.line, row.error) for row in chunk if row.error]
+            valid = [row for row in chunk if not row.error]
+            if valid:
+                errors += await write_chunk(db, user_id, valid)
+                await bump_version(db, "foods", user_id)
+                await bump_version(db, "carts", user_id)
+
+            progress["rows"] += len(chunk)
+            progress["failed"] += len(errors)
+            progress["imported"] += len(chunk) - len(errors)
+            progress["errors"] += [
+                dict(row=line, error=error)
+                for line, error in sorted(errors)[
+                    : IMPORT_MAX_ERRORS - len(progress["errors"])
+                ]
+            ]
+            await save_progress(db, job_id, progress)
+
+        progress["status"] = "completed"
+    except Exception:
+        logger.exception("Import %s failed", job_id)
+        await db.rollback()
+        progress["status"] = "failed"
+    finally:
+        try:
+            await save_progress(db, job_id, progress)
+        finally:
+            await db.close()
+            await remove_upload(path)
+
+
+async def save_progress(db, job_id: str, progress):
+    await db.execute(
+        update(import_jobs).where(import_jobs.c.id == job_id).values(**progress)
+    )
+    await db.commit()
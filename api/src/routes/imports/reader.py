@@ -0,0 +1,88 @@
+import csv
+from dataclasses import dataclass
+from typing import Optional
+
+import orjson
+from pydantic import ValidationError
+
+from .schemas import ROW_SCHEMAS
+
+FORMATS = ("ndjson", "csv")
+
+
+@dataclass
+class Row:
+    # `line` of the file the row starts on, `data` the validated schema or
+    # `error` why the row was rejected
+    line: int
+    table: Optional[str] = None
+    data: Optional[object] = None
+    error: Optional[str] = None
+
+
+def describe(error: ValidationError):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def validate(line: int, values, table: str = None):
+    if not isinstance(values, dict):
+        return Row(line, error="Expected an object.")
+    table = values.pop("table", None) or table
+    if not table:
+        return Row(line, error="Missing table, add a 'table' column or field.")
+    if table not in ROW_SCHEMAS:
+        return Row(
+            line,
+            error=f"Cannot import '{table}', "
+            f"expected any of '{', '.join(ROW_SCHEMAS)}'.",
+        )
+    try:
+        return Row(line, table, data=ROW_SCHEMAS[table](**values))
+    except ValidationError as e:
+        return Row(line, table, error=describe(e))
+
+
+def read_ndjson(file, table: str = None):
+    for line, text in enumerate(file, 1):
+        if not text.strip():
+            continue
+        try:
+            values = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            yield Row(line, error="Invalid JSON.")
+            continue
+        yield validate(line, values, table)
+
+
+def read_csv(file, table: str = None):
+    reader = csv.DictReader(file)
+    # Read the header, so line_num counts from it
+    reader.fieldnames
+    line = reader.line_num + 1
+    for values in reader:
+        # Empty cells are missing values, cells past the header are dropped
+        values = {
+            key: value
+            for key, value in values.items()
+            if key is not None and value not in ("", None)
+        }
+        yield validate(line, values, table)
+        line = reader.line_num + 1
+
+
+def read_chunks(path: str, format: str, table: str = None, size: int = 1000):
+    # Lists of `size` validated rows, reading the file as they are asked for.
+    # Blocking, call next() on the threadpool.
+    read = read_csv if format == "csv" else read_ndjson
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        chunk = []
+        for row in read(file, table):
+            chunk.append(row)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
@@ -0,0 +1,90 @@
+import os
+from typing import Optional
+
+from database.connect import get_db
+from database.models import ImportJob, User
+from decouple import config
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, UploadFile
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.middlewares import JWTBearer
+from src.utils import UploadTooLarge, save_temp_upload, serialize_import_job
+
+from .jobs import run_import
+from .reader import FORMATS
+from .schemas import ROW_SCHEMAS
+
+IMPORT_MAX_SIZE = config("IMPORT_MAX_SIZE", default=100 * 1024 * 1024, cast=int)
+
+router = APIRouter()
+
+
+@router.post("/")
+async def create(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    table: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(JWTBearer()),
+):
+    # The format defaults to the file's extension, `table` to the "table"
+    # column of each row
+    if not format:
+        extension = os.path.splitext(file.filename or "")[1].lower().lstrip(".")
+        format = "csv" if extension == "csv" else "ndjson"
+    if format not in FORMATS:
+        return JSONResponse(
+            content={
+                "error": f"Cannot import '{format}', "
+                f"expected any of '{', '.join(FORMATS)}'."
+            },
+            status_code=400,
+        )
+    if table and table not in ROW_SCHEMAS:
+        return JSONResponse(
+            content={
+                "error": f"Cannot import '{table}', "
+                f"expected any of '{', '.join(ROW_SCHEMAS)}'."
+            },
+            status_code=400,
+        )
+
+    try:
+        path = await save_temp_upload(file, IMPORT_MAX_SIZE, suffix=f".{format}")
+    except UploadTooLarge as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
+
+    job = ImportJob(user_id=current_user.id, filename=file.filename, format=format)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    # Import after the response is sent, poll GET /api/import/{id}
+    background_tasks.add_task(run_import, job.id, current_user.id, path, format, table)
+
+    return JSONResponse(content=serialize_import_job(job), status_code=202)
+
+
+@router.get("/{id}")
+async def get_one(
+    id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(JWTBearer()),
+):
+    job = (
+        await db.scalars(
+            select(ImportJob).where(
+                ImportJob.id == id, ImportJob.user_id == current_user.id
+            )
+        )
+    ).first()
+
+    if job:
+        return serialize_import_job(job)
+
+    return JSONResponse(
+        content={"error": "Import does not exist."},
+        status_code=400,
+    )
@@ -0,0 +1,51 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, conint, constr, validator
+from src.routes.foods.categories import parse_category_names
+
+# One schema per table of GET /api/export, whose files import back as they
+# are. Unknown columns (ids, timestamps) are ignored, rows refer to each
+# other by name.
+Name = constr(strip_whitespace=True, min_length=1)
+
+
+class FoodRow(BaseModel):
+    name: Name
+    description: Optional[str] = None
+    categories: List[str] = []
+
+    @validator("categories", pre=True)
+    def split_categories(cls, value):
+        # A list, or "a, b" in CSV files
+        return parse_category_names(value or [])
+
+
+class CategoryRow(BaseModel):
+    name: Name
+    description: Optional[str] = None
+
+
+class FoodCategoryRow(BaseModel):
+    food_name: Name
+    category_name: Name
+
+
+class CartRow(BaseModel):
+    name: Name
+    status: Optional[str] = "Started"
+
+
+class CartItemRow(BaseModel):
+    cart_name: Name
+    food_name: Name
+    quantity: conint(ge=1) = 1
+
+
+# In the order a chunk is written, rows may refer to earlier tables
+ROW_SCHEMAS = {
+    "categories": CategoryRow,
+    "foods": FoodRow,
+    "food_categories": FoodCategoryRow,
+    "carts": CartRow,
+    "cart_items": CartItemRow,
+}
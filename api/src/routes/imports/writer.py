@@ -0,0 +1,217 @@
+from database import engine
+from database.models import Cart, Category, Food
+from database.relationships import CartFood, CategoryFood
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from src.routes.foods.categories import resolve_categories
+from src.routes.statistics.rollups import (
+    lines_of,
+    lock_carts,
+    record_lines,
+    record_links,
+)
+
+from .schemas import ROW_SCHEMAS
+
+foods_table = Food.__table__
+categories_table = Category.__table__
+carts_table = Cart.__table__
+carts_foods = CartFood.__table__
+
+
+def upsert(table, keys, columns=()):
+    # INSERT which, when a row with the same `keys` exists, updates its
+    # `columns` (keeping their value where the new row has none) or leaves it
+    # alone without `columns`
+    dialect = engine.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        module = sqlite if dialect == "sqlite" else postgresql
+        statement = module.insert(table)
+        if not columns:
+            return statement.on_conflict_do_nothing(index_elements=keys)
+        new = statement.excluded
+    elif dialect == "mysql":
+        if not columns:
+            return insert(table).prefix_with("IGNORE")
+        statement = mysql.insert(table)
+        new = statement.inserted
+    else:
+        return insert(table)
+
+    values = {column: func.coalesce(new[column], table.c[column]) for column in columns}
+    if "updated_at" in table.c:
+        values["updated_at"] = func.now()
+    if dialect == "mysql":
+        return statement.on_duplicate_key_update(values)
+    return statement.on_conflict_do_update(index_elements=keys, set_=values)
+
+
+async def ids_by_name(db, model, user_id: str, names):
+    if not names:
+        return {}
+    rows = await db.execute(
+        select(model.name, model.id).where(
+            model.user_id == user_id, model.name.in_(list(names))
+        )
+    )
+    return {name: id for name, id in rows}
+
+
+async def link_categories(db, user_id: str, links):
+    # Adds (food id, category name) links, creating the missing categories
+    names = list(dict.fromkeys(name for _, name in links))
+    ids = dict(zip(names, await resolve_categories(db, user_id, names)))
+    rows = {
+        (food_id, ids[name]): dict(food_id=food_id, category_id=ids[name])
+        for food_id, name in links
+    }
+    if rows:
+        existing = await db.execute(
+            select(CategoryFood.c.food_id, CategoryFood.c.category_id).where(
+                CategoryFood.c.food_id.in_({food_id for food_id, _ in rows})
+            )
+        )
+        added = rows.keys() - set(existing)
+        await db.execute(
+            upsert(CategoryFood, ["category_id", "food_id"]), list(rows.values())
+        )
+        await record_links(db, added)
+
+
+# Writers, one per table. Each takes the valid rows of a chunk and returns
+# [(line, error)] for the rows it could not write. A row named twice in a
+# chunk is written once, the last one wins.
+
+
+async def write_categories(db, user_id: str, rows):
+    values = {
+        row.data.name: dict(
+            user_id=user_id, name=row.data.name, description=row.data.description
+        )
+        for row in rows
+    }
+    await db.execute(
+        upsert(categories_table, ["user_id", "name"], ["description"]),
+        list(values.values()),
+    )
+    return []
+
+
+async def write_foods(db, user_id: str, rows):
+    values = {
+        row.data.name: dict(
+            user_id=user_id, name=row.data.name, description=row.data.description
+        )
+        for row in rows
+    }
+    await db.execute(
+        upsert(foods_table, ["user_id", "name"], ["description"]),
+        list(values.values()),
+    )
+
+    categorized = [row for row in rows if row.data.categories]
+    if categorized:
+        ids = await ids_by_name(
+            db, Food, user_id, {row.data.name for row in categorized}
+        )
+        await link_categories(
+            db,
+            user_id,
+            [
+                (ids[row.data.name], name)
+                for row in categorized
+                for name in row.data.categories
+            ],
+        )
+    return []
+
+
+async def write_food_categories(db, user_id: str, rows):
+    ids = await ids_by_name(db, Food, user_id, {row.data.food_name for row in rows})
+    errors = [
+        (row.line, f"Food '{row.data.food_name}' does not exist.")
+        for row in rows
+        if row.data.food_name not in ids
+    ]
+    await link_categories(
+        db,
+        user_id,
+        [
+            (ids[row.data.food_name], row.data.category_name)
+            for row in rows
+            if row.data.food_name in ids
+        ],
+    )
+    return errors
+
+
+async def write_carts(db, user_id: str, rows):
+    values = {
+        row.data.name: dict(user_id=user_id, name=row.data.name, status=row.data.status)
+        for row in rows
+    }
+    await db.execute(
+        upsert(carts_table, ["user_id", "name"], ["status"]), list(values.values())
+    )
+    return []
+
+
+async def write_cart_items(db, user_id: str, rows):
+    cart_ids = await ids_by_name(
+        db, Cart, user_id, {row.data.cart_name for row in rows}
+    )
+    food_ids = await ids_by_name(
+        db, Food, user_id, {row.data.food_name for row in rows}
+    )
+
+    errors = []
+    values = {}
+    for row in rows:
+        if row.data.cart_name not in cart_ids:
+            errors.append((row.line, f"Cart '{row.data.cart_name}' does not exist."))
+        elif row.data.food_name not in food_ids:
+            errors.append((row.line, f"Food '{row.data.food_name}' does not exist."))
+        else:
+            key = (cart_ids[row.data.cart_name], food_ids[row.data.food_name])
+            values[key] = dict(
+                cart_id=key[0],
+                food_id=key[1],
+                user_id=user_id,
+                food_qty=row.data.quantity,
+            )
+    if values:
+        changed = {cart_id for cart_id, _ in values}
+        await lock_carts(db, cart_ids=changed)
+        current = await lines_of(db, carts_foods.c.cart_id, changed)
+        await db.execute(
+            upsert(carts_foods, ["cart_id", "food_id"], ["food_qty"]),
+            list(values.values()),
+        )
+        held = {cart_id for cart_id, _ in current}
+        await record_lines(
+            db,
+            user_id,
+            {key: row["food_qty"] - current.get(key, 0) for key, row in values.items()},
+            {cart_id: 1 for cart_id, _ in values if cart_id not in held},
+        )
+    return errors
+
+
+WRITERS = {
+    "categories": write_categories,
+    "foods": write_foods,
+    "food_categories": write_food_categories,
+    "carts": write_carts,
+    "cart_items": write_cart_items,
+}
+
+
+async def write_rows(db, user_id: str, rows):
+    # Writes valid rows table by table, in the order of ROW_SCHEMAS, so a row
+    # can refer to rows of other tables earlier in the file
+    errors = []
+    for table in ROW_SCHEMAS:
+        table_rows = [row for row in rows if row.table == table]
+        if table_rows:
+            errors += await WRITERS[table](db, user_id, table_rows)
+    return errors
@@ -0,0 +1,40 @@
+import hmac
+
+from database.connect import pool_metrics
+from decouple import config
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from src.middlewares.auth import user_cache
+from src.utils import password_hasher
+from src.utils.metrics import (
+    CONTENT_TYPE,
+    cache_families,
+    hasher_families,
+    pool_families,
+    request_families,
+    request_metrics,
+)
+from src.utils.response_cache import response_cache
+
+# When set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_metrics(request: Request):
+    # Prometheus text format. Counters are per process, with several workers
+    # each answers with its own.
+    if METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=403, detail="Not Authorized.")
+
+    lines = (
+        request_families(request_metrics)
+        + pool_families(pool_metrics)
+        + hasher_families(password_hasher)
+        + cache_families([user_cache, response_cache])
+    )
+    return Response(content="\n".join(lines) + "\n", media_type=CONTENT_TYPE)
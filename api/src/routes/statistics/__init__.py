@@ -0,0 +1 @@
+from .routes import router as statistics_router
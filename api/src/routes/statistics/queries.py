@@ -0,0 +1,136 @@
+from database import engine
+from database.models import (
+    Cart,
+    Category,
+    CategoryStatistic,
+    Food,
+    FoodStatistic,
+    MonthStatistic,
+)
+from database.relationships import CartFood, CategoryFood
+from sqlalchemy import Integer, String, cast, func, select
+
+
+def month(column):
+    # "2026-10"
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m", column)
+    if dialect == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    if dialect == "mysql":
+        return func.date_format(column, "%Y-%m")
+    return func.substr(cast(column, String), 1, 7)
+
+
+def summed(column):
+    # SUM is a DECIMAL on MySQL and, over BIGINT, on PostgreSQL, which the
+    # JSON encoder refuses. Quantities are whole numbers.
+    return cast(func.sum(column), Integer)
+
+
+# The statistics summed from the cart lines, in the columns of the rollup
+# tables. They rebuild and check the rollups. Quantities are first summed per
+# food or per cart from the covering indexes on carts_foods (user_id, food_id,
+# food_qty) and (user_id, cart_id, food_qty), so only those sums are joined to
+# categories or carts, never the cart lines themselves.
+
+
+def quantities_by_food(user_id: str):
+    return (
+        select(
+            CartFood.user_id,
+            CartFood.food_id,
+            summed(CartFood.food_qty).label("quantity"),
+        )
+        .where(CartFood.user_id == user_id)
+        .group_by(CartFood.user_id, CartFood.food_id)
+    )
+
+
+def quantities_by_category(user_id: str):
+    # A food in two categories counts in both
+    foods = quantities_by_food(user_id).subquery()
+    return (
+        select(
+            foods.c.user_id,
+            CategoryFood.c.category_id,
+            summed(foods.c.quantity).label("quantity"),
+        )
+        .join(CategoryFood, CategoryFood.c.food_id == foods.c.food_id)
+        .group_by(foods.c.user_id, CategoryFood.c.category_id)
+    )
+
+
+def quantities_by_month(user_id: str):
+    # Carts count once they hold a line
+    carts = (
+        select(
+            CartFood.cart_id,
+            summed(CartFood.food_qty).label("quantity"),
+        )
+        .where(CartFood.user_id == user_id)
+        .group_by(CartFood.cart_id)
+        .subquery()
+    )
+    by_month = month(Cart.created_at).label("month")
+    return (
+        select(
+            Cart.user_id,
+            by_month,
+            summed(carts.c.quantity).label("quantity"),
+            func.count().label("carts"),
+        )
+        .join(carts, carts.c.cart_id == Cart.id)
+        .group_by(Cart.user_id, by_month)
+    )
+
+
+# What GET /api/statistics reads: the rollup rows themselves, the top ones
+# walking the (user_id, quantity) indexes, so the cost follows the size of
+# the answer rather than of the history.
+
+
+def select_top_foods(user_id: str, limit: int):
+    # Every item is in one month, there are fewer months than foods
+    total = select(summed(MonthStatistic.quantity)).where(
+        MonthStatistic.user_id == user_id
+    )
+    return (
+        select(
+            Food.id,
+            Food.name,
+            FoodStatistic.quantity,
+            total.scalar_subquery().label("total"),
+        )
+        .join(FoodStatistic, FoodStatistic.food_id == Food.id)
+        .where(FoodStatistic.user_id == user_id, FoodStatistic.quantity > 0)
+        .order_by(FoodStatistic.quantity.desc(), Food.name)
+        .limit(limit)
+    )
+
+
+def select_top_categories(user_id: str, limit: int):
+    total = select(summed(CategoryStatistic.quantity)).where(
+        CategoryStatistic.user_id == user_id
+    )
+    return (
+        select(
+            Category.id,
+            Category.name,
+            CategoryStatistic.quantity,
+            total.scalar_subquery().label("total"),
+        )
+        .join(CategoryStatistic, CategoryStatistic.category_id == Category.id)
+        .where(CategoryStatistic.user_id == user_id, CategoryStatistic.quantity > 0)
+        .order_by(CategoryStatistic.quantity.desc(), Category.name)
+        .limit(limit)
+    )
+
+
+def select_monthly(user_id: str):
+    return (
+        select(MonthStatistic.month, MonthStatistic.quantity, MonthStatistic.carts)
+        .where(MonthStatistic.user_id == user_id, MonthStatistic.quantity > 0)
+        .order_by(MonthStatistic.month)
+    )
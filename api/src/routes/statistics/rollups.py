@@ -0,0 +1,319 @@
+from collections import Counter
+
+from database import engine
+from database.models import Cart, CategoryStatistic, FoodStatistic, MonthStatistic
+from database.relationships import CartFood, CategoryFood
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from .queries import (
+    month,
+    quantities_by_category,
+    quantities_by_food,
+    quantities_by_month,
+)
+
+# The statistics rollups: sums of the cart lines per food, per category and
+# per month. Every write to the cart lines or the category links changes them
+# by the difference, in the same transaction, so they never need to be
+# summed again. `rebuild` recomputes a user's from scratch and `check` tells
+# whether they drifted, see `python manage.py rebuild-statistics` and
+# `check-statistics`.
+
+food_statistics = FoodStatistic.__table__
+category_statistics = CategoryStatistic.__table__
+month_statistics = MonthStatistic.__table__
+carts_foods = CartFood.__table__
+carts = Cart.__table__
+
+# Each table with the statement summing its rows from the cart lines
+ROLLUPS = (
+    (food_statistics, quantities_by_food),
+    (category_statistics, quantities_by_category),
+    (month_statistics, quantities_by_month),
+)
+
+# Ids per IN (), well below the bound parameter limits
+LOOKUP_SIZE = 500
+
+
+def chunks(values, size: int = LOOKUP_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def increment(table, keys, columns):
+    # INSERT which, when a row with the same `keys` exists, adds its `columns`
+    # to that row's instead
+    dialect = engine.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        module = sqlite if dialect == "sqlite" else postgresql
+        statement = module.insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={
+                column: table.c[column] + statement.excluded[column]
+                for column in columns
+            },
+        )
+    if dialect == "mysql":
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in columns}
+        )
+    return None
+
+
+async def add_to(db, table, keys, columns, rows):
+    rows = [row for row in rows if any(row[column] for column in columns)]
+    if not rows:
+        return
+    # The same order in every transaction, concurrent ones cannot deadlock
+    rows.sort(key=lambda row: [row[key] for key in keys])
+
+    statement = increment(table, keys, columns)
+    if statement is not None:
+        await db.execute(statement, rows)
+    else:
+        for row in rows:
+            result = await db.execute(
+                update(table)
+                .where(*[table.c[key] == row[key] for key in keys])
+                .values({column: table.c[column] + row[column] for column in columns})
+            )
+            if not result.rowcount:
+                await db.execute(insert(table).values(**row))
+
+    # Rows summing nothing anymore are removed
+    await db.execute(
+        delete(table).where(
+            table.c.user_id.in_({row["user_id"] for row in rows}),
+            table.c.quantity == 0,
+        )
+    )
+
+
+async def lock_carts(db, cart_ids=None, food_ids=None):
+    # Call before reading the lines of carts about to change, by cart id or by
+    # the foods they hold. A no-op UPDATE of the carts: on SQLite it starts
+    # the write transaction (as BEGIN IMMEDIATE would), elsewhere it locks the
+    # cart rows, so concurrent writers of a cart run one after the other and
+    # each reads the lines the previous one committed.
+    if food_ids is not None:
+        for chunk in chunks(food_ids):
+            held = select(carts_foods.c.cart_id).where(carts_foods.c.food_id.in_(chunk))
+            await db.execute(
+                update(carts)
+                .where(carts.c.id.in_(held))
+                .values(updated_at=carts.c.updated_at)
+            )
+    for chunk in chunks(cart_ids or ()):
+        await db.execute(
+            update(carts)
+            .where(carts.c.id.in_(chunk))
+            .values(updated_at=carts.c.updated_at)
+        )
+
+
+async def record_lines(db, user_id: str, changes, carts=None):
+    # Call with the cart lines' changes, before committing them. `changes`
+    # maps (cart id, food id) to how much the line's quantity grew, negative
+    # when it shrank or the line was removed. `carts` maps cart ids to 1 when
+    # the cart got its first line, -1 when it lost its last one.
+    changes = {key: quantity for key, quantity in changes.items() if quantity}
+    carts = {id: count for id, count in (carts or {}).items() if count}
+    if not changes and not carts:
+        return
+
+    by_food = Counter()
+    by_cart = Counter()
+    for (cart_id, food_id), quantity in changes.items():
+        by_food[food_id] += quantity
+        by_cart[cart_id] += quantity
+
+    by_category = Counter()
+    for ids in chunks(by_food):
+        rows = await db.execute(
+            select(CategoryFood.c.food_id, CategoryFood.c.category_id).where(
+                CategoryFood.c.food_id.in_(ids)
+            )
+        )
+        for food_id, category_id in rows:
+            by_category[category_id] += by_food[food_id]
+
+    by_month = {}
+    for ids in chunks(set(by_cart) | set(carts)):
+        rows = await db.execute(
+            select(Cart.id, month(Cart.created_at)).where(Cart.id.in_(ids))
+        )
+        for cart_id, key in rows:
+            totals = by_month.setdefault(key, Counter())
+            totals["quantity"] += by_cart[cart_id]
+            totals["carts"] += carts.get(cart_id, 0)
+
+    await add_to(
+        db,
+        food_statistics,
+        ["food_id"],
+        ["quantity"],
+        [
+            dict(food_id=food_id, user_id=user_id, quantity=quantity)
+            for food_id, quantity in by_food.items()
+        ],
+    )
+    await add_to(
+        db,
+        category_statistics,
+        ["category_id"],
+        ["quantity"],
+        [
+            dict(category_id=category_id, user_id=user_id, quantity=quantity)
+            for category_id, quantity in by_category.items()
+        ],
+    )
+    await add_to(
+        db,
+        month_statistics,
+        ["user_id", "month"],
+        ["quantity", "carts"],
+        [
+            dict(
+                user_id=user_id,
+                month=key,
+                quantity=totals["quantity"],
+                carts=totals["carts"],
+            )
+            for key, totals in by_month.items()
+        ],
+    )
+
+
+async def lines_of(db, column, ids):
+    # {(cart id, food id): quantity} of the lines whose `column` is in `ids`
+    lines = {}
+    for chunk in chunks(ids):
+        rows = await db.execute(
+            select(carts_foods.c.cart_id, carts_foods.c.food_id, carts_foods.c.food_qty)
+            .where(column.in_(chunk))
+            .with_for_update()
+        )
+        lines.update({(cart_id, food_id): qty or 0 for cart_id, food_id, qty in rows})
+    return lines
+
+
+async def forget_carts(db, user_id: str, cart_ids):
+    # Call before deleting carts, their lines go with them
+    await lock_carts(db, cart_ids=cart_ids)
+    lines = await lines_of(db, carts_foods.c.cart_id, cart_ids)
+    await record_lines(
+        db,
+        user_id,
+        {key: -qty for key, qty in lines.items()},
+        {cart_id: -1 for cart_id, _ in lines},
+    )
+
+
+async def forget_foods(db, user_id: str, food_ids):
+    # Call before deleting foods, their lines go with them and leave empty
+    # the carts which held nothing else
+    food_ids = list(food_ids)
+    await lock_carts(db, food_ids=food_ids)
+    lines = await lines_of(db, carts_foods.c.food_id, food_ids)
+
+    kept = set()
+    for chunk in chunks({cart_id for cart_id, _ in lines}):
+        kept.update(
+            await db.scalars(
+                select(carts_foods.c.cart_id)
+                .where(
+                    carts_foods.c.cart_id.in_(chunk),
+                    carts_foods.c.food_id.notin_(food_ids),
+                )
+                .distinct()
+            )
+        )
+
+    await record_lines(
+        db,
+        user_id,
+        {key: -qty for key, qty in lines.items()},
+        {cart_id: -1 for cart_id, _ in lines if cart_id not in kept},
+    )
+
+
+async def record_links(db, added=(), removed=()):
+    # Call with the (food id, category id) links added or removed: each moves
+    # the food's quantity in or out of the category
+    signs = Counter()
+    for link in added:
+        signs[link] += 1
+    for link in removed:
+        signs[link] -= 1
+    signs = {link: sign for link, sign in signs.items() if sign}
+    if not signs:
+        return
+
+    foods = {}
+    for chunk in chunks({food_id for food_id, _ in signs}):
+        rows = await db.execute(
+            select(
+                food_statistics.c.food_id,
+                food_statistics.c.user_id,
+                food_statistics.c.quantity,
+            ).where(food_statistics.c.food_id.in_(chunk))
+        )
+        foods.update(
+            {food_id: (user_id, quantity) for food_id, user_id, quantity in rows}
+        )
+
+    by_category = {}
+    for (food_id, category_id), sign in signs.items():
+        if food_id in foods:
+            user_id, quantity = foods[food_id]
+            row = by_category.setdefault(
+                category_id, dict(category_id=category_id, user_id=user_id, quantity=0)
+            )
+            row["quantity"] += sign * quantity
+
+    await add_to(
+        db,
+        category_statistics,
+        ["category_id"],
+        ["quantity"],
+        list(by_category.values()),
+    )
+
+
+async def rebuild(db, user_id: str):
+    # Replaces the user's rollups by the sums of their cart lines
+    for table, summed in ROLLUPS:
+        statement = summed(user_id)
+        await db.execute(delete(table).where(table.c.user_id == user_id))
+        await db.execute(
+            insert(table).from_select(
+                list(statement.selected_columns.keys()), statement
+            )
+        )
+
+
+async def check(db, user_id: str):
+    # {table name: rows differing from the sums of the cart lines}, empty when
+    # the user's rollups are right
+    differences = {}
+    for table, summed in ROLLUPS:
+        statement = summed(user_id)
+        columns = [table.c[name] for name in statement.selected_columns.keys()]
+        expected = set((await db.execute(statement)).all())
+        actual = set(
+            (
+                await db.execute(
+                    select(*columns).where(
+                        table.c.user_id == user_id, table.c.quantity != 0
+                    )
+                )
+            ).all()
+        )
+        if expected != actual:
+            differences[table.name] = len(expected ^ actual)
+    return differences
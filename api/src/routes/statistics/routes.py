@@ -0,0 +1,61 @@
+from database.connect import get_db
+from database.models import User
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.middlewares import JWTBearer
+from src.utils import cache_response, check_etag, clamp_limit, get_cached_response
+
+from .queries import select_monthly, select_top_categories, select_top_foods
+
+router = APIRouter()
+
+
+def ranked(rows):
+    # Share of the total, in percent
+    return [
+        dict(
+            id=row.id,
+            name=row.name,
+            quantity=row.quantity,
+            percent=round(row.quantity * 100 / row.total, 1),
+        )
+        for row in rows
+    ]
+
+
+@router.get("/")
+async def get_statistics(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    limit: int = 10,
+    current_user: User = Depends(JWTBearer()),
+):
+    not_modified = await check_etag(
+        db, request, response, current_user.id, "statistics"
+    )
+    if not_modified:
+        return not_modified
+
+    cached = await get_cached_response(response, current_user.id, "statistics")
+    if cached:
+        return cached
+
+    limit = clamp_limit(limit)
+    top_foods = (await db.execute(select_top_foods(current_user.id, limit))).all()
+    top_categories = (
+        await db.execute(select_top_categories(current_user.id, limit))
+    ).all()
+    monthly = (await db.execute(select_monthly(current_user.id))).all()
+
+    data = {
+        # Items put in carts, each counted `food_qty` times
+        "total": top_foods[0].total if top_foods else 0,
+        "top_foods": ranked(top_foods),
+        "top_categories": ranked(top_categories),
+        "monthly": [
+            dict(month=row.month, quantity=row.quantity, carts=row.carts)
+            for row in monthly
+        ],
+    }
+    return await cache_response(response, current_user.id, "statistics", data)
@@ -1,11 +1,13 @@
-import bcrypt
 from database.connect import get_db
 from database.models import User
 from fastapi import APIRouter, Body, Depends, Response
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from src.middlewares import JWTBearer
+from sqlalchemy import delete as sql_delete
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.middlewares import JWTBearer, invalidate_user
+from src.utils import password_hasher, serialize_user
 
 from .schemas import UserSchema
 
@@ -16,10 +18,10 @@ router = APIRouter()
 async def update(
     id: str,
     user: UserSchema = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
-    db_user = db.query(User).filter(User.id == id).first()
+    db_user = (await db.scalars(select(User).where(User.id == id))).first()
     db_user_data = jsonable_encoder(db_user)
     errors = {}
 
@@ -29,7 +31,7 @@ async def update(
                 # if
                 if user.email and str(var) == "email":
                     # Check if email exists
-                    email_exists = db.query(User).filter(User.email == user.email).first()
+                    email_exists = (await db.scalars(select(User).where(User.email == user.email))).first()
                     if email_exists:
                         errors['email'] = 'Email is taken.' if email_exists.id != current_user.id else 'You are currently using this email address.'
                     else:
@@ -39,7 +41,7 @@ async def update(
                         ) == "False" else None 
                 elif user.username and str(var) == "username":
                     # Check if username exists
-                    username_exists = db.query(User).filter(User.username == user.username).first()
+                    username_exists = (await db.scalars(select(User).where(User.username == user.username))).first()
                     if username_exists:
                         errors['username'] = 'Username is taken.' if username_exists.id != current_user.id else 'You are currently using this username.'
                     else:
@@ -48,8 +50,7 @@ async def update(
                             value
                         ) == "False" else None 
                 elif user.password and str(var) == "password":
-                    password = value.encode("utf-8")
-                    hashed_password = bcrypt.hashpw(password, bcrypt.gensalt())
+                    hashed_password = await password_hasher.hash(value)
                     setattr(db_user, var, hashed_password)
                 else:
                     setattr(db_user, var, value) if value or str(
@@ -70,18 +71,16 @@ async def update(
         ):
             commit = True
 
-        if not commit and db.user_data["password"]:
-            if (
-                not bcrypt.hashpw(db.user_data["password"], db_user.password)
-                == db_user.password
-            ):
-                commit = True
+        # A new password was hashed and set above
+        if user.password:
+            commit = True
 
         if commit:
-            db.commit()
-            db.refresh(db_user)
+            await db.commit()
+            await invalidate_user(db_user.id)
+            await db.refresh(db_user)
 
-        return db_user.to_dict()
+        return serialize_user(db_user)
 
     return JSONResponse(
         content={"error": "User does not exist."},
@@ -91,12 +90,14 @@ async def update(
 
 @router.get("/{id}")
 async def get_one(
-    id: str, db: Session = Depends(get_db), current_user: User = Depends(JWTBearer())
+    id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(JWTBearer()),
 ):
-    db_user = db.query(User).filter(User.id == id).first()
+    db_user = (await db.scalars(select(User).where(User.id == id))).first()
     if db_user:
         if db_user.id == current_user.id:
-            return db_user.to_dict()
+            return serialize_user(db_user)
 
     return JSONResponse(
         content={"error": "User does not exist."},
@@ -108,15 +109,16 @@ async def get_one(
 async def delete(
     id: str,
     response: Response,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(JWTBearer()),
 ):
-    db_user = db.query(User).filter(User.id == id).first()
+    db_user = (await db.scalars(select(User).where(User.id == id))).first()
     if db_user:
-        db_user_data = db_user.to_dict()
+        db_user_data = serialize_user(db_user)
         if db_user.id == current_user.id:
-            db.query(User).filter(User.id == id).delete()
-            db.commit()
+            await db.execute(sql_delete(User).where(User.id == id))
+            await db.commit()
+            await invalidate_user(id)
             response.delete_cookie(key="token")
             return db_user_data
 
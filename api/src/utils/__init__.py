@@ -1 +1,17 @@
-from .jwt import signJWT, decodeJWT
\ No newline at end of file
+from .jwt import signJWT, decodeJWT
+from .pagination import MAX_PAGE_LIMIT, clamp_limit, paginate
+from .passwords import password_hasher
+from .uploads import UploadTooLarge, remove_upload, save_temp_upload, save_upload
+from .images import image_processor
+from .static import CachedStaticFiles
+from .versions import bump_version, check_etag
+from .response_cache import cache_response, get_cached_response
+
+from .serializers import (
+    expand_plan,
+    serialize_cart,
+    serialize_category,
+    serialize_food,
+    serialize_import_job,
+    serialize_user,
+)
\ No newline at end of file
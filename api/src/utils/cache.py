@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    # Bounded in-process LRU store with per-entry expiry. It follows the
+    # interface of RedisBackend, so it can stand in for it when running a
+    # single worker. Keys can belong to a group, deleted together.
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._lock = Lock()
+
+    def _pop(self, key):
+        expires_at, value, group = self._entries.pop(key)
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, group = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value, ttl: float = None, group: str = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (expires_at, value, group)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    async def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+    async def delete_group(self, group: str):
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._pop(key)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+
+class RedisError(Exception):
+    pass
+
+
+# What an unreachable or misbehaving backend raises
+BACKEND_ERRORS = (OSError, EOFError, RedisError, asyncio.TimeoutError)
+
+
+def raise_errors(replies):
+    # Raises the first error reply of a pipeline, once all were read
+    for reply in replies:
+        if isinstance(reply, RedisError):
+            raise reply
+    return replies
+
+
+class RedisBackend:
+    # Speaks RESP to a Redis compatible server (Redis, Valkey, KeyDB,
+    # benchmarks/fake_redis.py) over one pipelined connection per event loop.
+    # Values must be bytes or str, get returns bytes.
+
+    def __init__(self, url: str = "redis://localhost:6379/0", timeout=1.0):
+        url = urlparse(url)
+        self.host = url.hostname or "localhost"
+        self.port = url.port or 6379
+        self.db = int(url.path.lstrip("/") or 0)
+        self.password = unquote(url.password) if url.password else None
+        self.timeout = timeout
+        self._loop = None
+        self._reader = self._writer = None
+        self._lock = None
+        # After a failure, fail fast for a second instead of reconnecting
+        # on every call
+        self._retry_at = 0
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                raise_errors(await self._send(setup))
+            except RedisError:
+                self._writer.close()
+                self._writer = None
+                raise
+
+    async def _read_reply(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+        kind, data = line[:1], line[1:-2]
+        if kind == b"+":
+            return data
+        if kind == b"-":
+            # Returned, not raised, so the replies after it are still read
+            return RedisError(data.decode())
+        if kind == b":":
+            return int(data)
+        if kind == b"$":
+            length = int(data)
+            if length == -1:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(data)
+            if length == -1:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        # Out of step with the server, the connection cannot be reused
+        raise ConnectionError(f"Unexpected reply {line!r}")
+
+    async def _send(self, commands):
+        # Returns every reply, error replies as RedisError instances
+        payload = []
+        for command in commands:
+            payload.append(b"*%d\r\n" % len(command))
+            for arg in command:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode()
+                payload.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._writer.write(b"".join(payload))
+        await self._writer.drain()
+        replies = []
+        for _ in commands:
+            replies.append(await asyncio.wait_for(self._read_reply(), self.timeout))
+        return replies
+
+    async def execute(self, *commands):
+        # Sends the commands in one round trip and returns their replies
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock, self._writer = loop, asyncio.Lock(), None
+        async with self._lock:
+            if self._writer is None and time.monotonic() < self._retry_at:
+                raise ConnectionError("Cache server unavailable")
+            try:
+                if self._writer is None:
+                    await self._connect()
+                replies = await self._send(commands)
+            except BaseException as e:
+                # Start over on the next call, a reply may be half read or
+                # still unread, cancelled or not
+                if self._writer is not None:
+                    self._writer.close()
+                self._writer = None
+                if isinstance(e, BACKEND_ERRORS):
+                    self._retry_at = time.monotonic() + 1
+                raise
+        # Every reply was read, the connection stays in step
+        return raise_errors(replies)
+
+    async def get(self, key: str):
+        (value,) = await self.execute(("GET", key))
+        return value
+
+    async def set(self, key: str, value, ttl: float = None, group: str = None):
+        command = ("SET", key, value)
+        if ttl:
+            command += ("PX", int(ttl * 1000))
+        commands = [command]
+        if group is not None:
+            # The group outlives its members, it only lists key names
+            commands.append(("SADD", group, key))
+            if ttl:
+                commands.append(("PEXPIRE", group, int(ttl * 1000)))
+        await self.execute(*commands)
+
+    async def delete(self, key: str):
+        await self.execute(("DEL", key))
+
+    async def delete_group(self, group: str):
+        (keys,) = await self.execute(("SMEMBERS", group))
+        await self.execute(("DEL", group, *keys))
+
+    async def clear(self):
+        await self.execute(("FLUSHDB",))
+
+
+def make_backend(url: str, max_size: int = 1024):
+    # "memory://" or "redis://[:password@]host[:port][/db]"
+    if url.startswith("redis://"):
+        return RedisBackend(url)
+    return MemoryBackend(max_size=max_size)
+
+
+class Cache:
+    # Namespaced view over a backend that keeps hit/miss counters. An
+    # unreachable backend behaves like an empty cache.
+
+    def __init__(self, backend, namespace: str, ttl: float = None):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key):
+        try:
+            value = await self.backend.get(self._key(key))
+        except BACKEND_ERRORS as e:
+            logger.warning("Cache %s unavailable: %r", self.namespace, e)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, value, group=None):
+        if group is not None:
+            group = self._key(f"group:{group}")
+        try:
+            await self.backend.set(self._key(key), value, self.ttl, group)
+        except BACKEND_ERRORS as e:
+            logger.warning("Cache %s unavailable: %r", self.namespace, e)
+
+    async def invalidate(self, key):
+        try:
+            await self.backend.delete(self._key(key))
+        except BACKEND_ERRORS as e:
+            logger.warning("Cache %s unavailable: %r", self.namespace, e)
+
+    async def invalidate_group(self, group):
+        try:
+            await self.backend.delete_group(self._key(f"group:{group}"))
+        except BACKEND_ERRORS as e:
+            logger.warning("Cache %s unavailable: %r", self.namespace, e)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+        )
@@ -0,0 +1,85 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from decouple import config
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest side in pixels of every variant generated next to an upload
+IMAGE_VARIANTS = {"thumb": 160, "medium": 640}
+IMAGE_FORMAT = config("IMAGE_FORMAT", default="webp")
+IMAGE_QUALITY = config("IMAGE_QUALITY", default=80, cast=int)
+IMAGE_POOL = config("IMAGE_POOL", default="thread")
+IMAGE_WORKERS = config("IMAGE_WORKERS", default=2, cast=int)
+
+
+def variant_location(file_location: str, variant: str, fmt: str = IMAGE_FORMAT):
+    # static/<sha256>.png -> static/<sha256>.thumb.webp, variants of identical
+    # uploads are shared like the uploads themselves
+    root = os.path.splitext(file_location)[0]
+    return f"{root}.{variant}.{fmt}"
+
+
+# Runs on the pool, module level so a process pool can pickle it
+def _make_variants(file_location: str, variants: dict, fmt: str, quality: int):
+    try:
+        with Image.open(file_location) as original:
+            original = ImageOps.exif_transpose(original)
+            if fmt == "jpeg" or original.mode not in ("RGB", "RGBA"):
+                original = original.convert("RGB" if fmt == "jpeg" else "RGBA")
+
+            locations = {}
+            for variant, size in variants.items():
+                location = variant_location(file_location, variant, fmt)
+                if not os.path.exists(location):
+                    image = original.copy()
+                    image.thumbnail((size, size))
+                    temp_location = f"{location}.part"
+                    image.save(temp_location, format=fmt, quality=quality)
+                    os.replace(temp_location, location)
+                locations[variant] = location
+            return locations
+    except (FileNotFoundError, UnidentifiedImageError):
+        return {}
+
+
+class ImageProcessor:
+    # Resizes uploads on a worker pool so Pillow never runs on the event loop
+
+    def __init__(self, variants: dict, fmt: str, quality: int, workers: int, pool):
+        self.variants = variants
+        self.fmt = fmt
+        self.quality = quality
+        if pool == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="images"
+            )
+
+    async def make_variants(self, file_location: str):
+        # {variant: location}, empty when the file is missing or not an image
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            _make_variants,
+            file_location,
+            self.variants,
+            self.fmt,
+            self.quality,
+        )
+
+    def locations(self, file_location: str):
+        return [
+            variant_location(file_location, variant, self.fmt)
+            for variant in self.variants
+        ]
+
+
+image_processor = ImageProcessor(
+    variants=IMAGE_VARIANTS,
+    fmt=IMAGE_FORMAT,
+    quality=IMAGE_QUALITY,
+    workers=IMAGE_WORKERS,
+    pool=IMAGE_POOL,
+)
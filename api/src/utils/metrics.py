@@ -0,0 +1,205 @@
+import bisect
+import math
+
+from decouple import Csv, config
+
+# Upper bounds of the request latency histogram buckets, in seconds
+METRICS_BUCKETS = tuple(
+    config(
+        "METRICS_BUCKETS",
+        default="0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10",
+        cast=Csv(float),
+    )
+)
+
+# The response adds "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class RouteMetrics:
+    # Latency histogram and status counts of one route. `buckets[i]` counts
+    # the requests that took at most METRICS_BUCKETS[i] but more than the
+    # bound before it, the last one those slower than every bound.
+
+    __slots__ = ("buckets", "sum", "count", "statuses", "errors")
+
+    def __init__(self):
+        self.buckets = [0] * (len(METRICS_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.statuses = {}
+        self.errors = 0
+
+
+class RequestMetrics:
+    # Counters of the requests served by this process. Only the event loop
+    # touches them, never across an await, so plain integers are safe and no
+    # lock is taken on the request path.
+
+    def __init__(self):
+        self.routes = {}
+        self.in_flight = 0
+
+    def observe(
+        self, method: str, route: str, status: int, elapsed: float, error=False
+    ):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.buckets[bisect.bisect_left(METRICS_BUCKETS, elapsed)] += 1
+        metrics.sum += elapsed
+        metrics.count += 1
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        if error or status >= 500:
+            metrics.errors += 1
+
+
+request_metrics = RequestMetrics()
+
+
+# Prometheus text format
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+def format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(int(value))
+
+
+def family(name: str, kind: str, help: str, samples):
+    # `samples` are (suffix, labels, value), labels as (name, value) pairs
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{format_labels(labels)} {format_value(value)}")
+    return lines
+
+
+def request_families(metrics: RequestMetrics):
+    routes = sorted(metrics.routes.items())
+    histogram = []
+    for (method, route), route_metrics in routes:
+        labels = (("method", method), ("route", route))
+        cumulative = 0
+        for bound, count in zip(METRICS_BUCKETS + (math.inf,), route_metrics.buckets):
+            cumulative += count
+            histogram.append(
+                ("_bucket", labels + (("le", format_value(bound)),), cumulative)
+            )
+        histogram.append(("_sum", labels, route_metrics.sum))
+        histogram.append(("_count", labels, route_metrics.count))
+
+    return (
+        family(
+            "http_requests_total",
+            "counter",
+            "Requests answered, by route and status.",
+            [
+                ("", (("method", method), ("route", route), ("status", status)), count)
+                for (method, route), route_metrics in routes
+                for status, count in sorted(route_metrics.statuses.items())
+            ],
+        )
+        + family(
+            "http_request_errors_total",
+            "counter",
+            "Requests answered with a 5xx or failing mid-response, by route.",
+            [
+                ("", (("method", method), ("route", route)), route_metrics.errors)
+                for (method, route), route_metrics in routes
+            ],
+        )
+        + family(
+            "http_request_duration_seconds",
+            "histogram",
+            "Time from receiving a request to sending the end of its response.",
+            histogram,
+        )
+        + family(
+            "http_requests_in_flight",
+            "gauge",
+            "Requests being handled.",
+            [("", (), metrics.in_flight)],
+        )
+    )
+
+
+def pool_families(pool_metrics):
+    # `pool_metrics` maps engine names to database.engine.PoolMetrics
+    stats = [(name, metrics.stats()) for name, metrics in sorted(pool_metrics.items())]
+    lines = []
+    for key, name, kind, help in (
+        ("connects", "db_pool_connects_total", "counter", "Connections opened."),
+        ("checkouts", "db_pool_checkouts_total", "counter", "Connections checked out."),
+        ("checkins", "db_pool_checkins_total", "counter", "Connections returned."),
+        (
+            "invalidations",
+            "db_pool_invalidations_total",
+            "counter",
+            "Connections discarded after an error.",
+        ),
+        ("size", "db_pool_size", "gauge", "Connections the pool keeps."),
+        ("checked_out", "db_pool_checked_out", "gauge", "Connections in use."),
+        ("overflow", "db_pool_overflow", "gauge", "Connections open beyond the size."),
+    ):
+        samples = [
+            ("", (("engine", engine),), data[key])
+            for engine, data in stats
+            if key in data
+        ]
+        if samples:
+            lines += family(name, kind, help, samples)
+    return lines
+
+
+def hasher_families(hasher):
+    return family(
+        "password_hash_jobs",
+        "gauge",
+        "bcrypt jobs running or waiting for a worker.",
+        [("", (), hasher.pending)],
+    ) + family(
+        "password_hash_queue_depth",
+        "gauge",
+        "bcrypt jobs waiting for a worker, 429 past HASH_QUEUE_LIMIT.",
+        [("", (), hasher.queue_depth)],
+    )
+
+
+def cache_families(caches):
+    # `caches` are src.utils.cache.Cache instances
+    stats = [(cache.namespace, cache.stats()) for cache in caches]
+    return (
+        family(
+            "cache_hits_total",
+            "counter",
+            "Lookups answered by the cache.",
+            [("", (("cache", name),), data["hits"]) for name, data in stats],
+        )
+        + family(
+            "cache_misses_total",
+            "counter",
+            "Lookups the cache could not answer.",
+            [("", (("cache", name),), data["misses"]) for name, data in stats],
+        )
+        + family(
+            "cache_hit_ratio",
+            "gauge",
+            "Hits over lookups since the process started.",
+            [
+                ("", (("cache", name),), float(data["hit_ratio"]))
+                for name, data in stats
+            ],
+        )
+    )
@@ -0,0 +1,75 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from database import engine
+from decouple import config
+from sqlalchemy import func, select, tuple_
+
+MAX_PAGE_LIMIT = config("MAX_PAGE_LIMIT", default=100, cast=int)
+
+
+def clamp_limit(limit: int):
+    return max(1, min(limit, MAX_PAGE_LIMIT))
+
+
+def encode_cursor(row):
+    payload = {"created_at": row.created_at.isoformat(), "id": row.id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    # An empty cursor asks for the first page
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(payload["created_at"]), str(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+
+def stored_datetime(value: datetime):
+    # SQLite keeps the server default timestamps as text, to the second, and
+    # compares them as strings, so bind the value in that format
+    if engine.dialect.name != "sqlite":
+        return value
+    if value.microsecond:
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Keyset pagination ordered by (created_at, id). Returns the page of rows
+# and the cursor of the next page (None on the last page).
+async def paginate(db, statement, model, cursor: str, limit: int):
+    limit = clamp_limit(limit)
+    position = decode_cursor(cursor)
+
+    if position:
+        created_at, id = position
+        # Compare against the stored value of the cursor row, so the
+        # comparison is not affected by how the driver formats datetimes
+        # (SQLite stores server defaults without microseconds). Fall back
+        # to the encoded timestamp, in the stored format, if the row was
+        # deleted in the meantime.
+        anchor = func.coalesce(
+            select(model.created_at).where(model.id == id).scalar_subquery(),
+            stored_datetime(created_at),
+        )
+        # A row value comparison, which the databases turn into a range of
+        # the (user_id, created_at, id) index: deep pages cost what the
+        # first one does. Spelled out with OR, only user_id is seeked.
+        statement = statement.where(
+            tuple_(model.created_at, model.id) > tuple_(anchor, id)
+        )
+
+    statement = statement.order_by(model.created_at, model.id).limit(limit + 1)
+    rows = (await db.scalars(statement)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+
+    return rows, next_cursor
@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from decouple import config
+from fastapi import HTTPException
+
+BCRYPT_ROUNDS = config("BCRYPT_ROUNDS", default=12, cast=int)
+HASH_POOL = config("HASH_POOL", default="thread")
+HASH_WORKERS = config("HASH_WORKERS", default=4, cast=int)
+HASH_QUEUE_LIMIT = config("HASH_QUEUE_LIMIT", default=32, cast=int)
+
+
+# These run on the pool, they are module level so a process pool can pickle them
+def _hash(password: bytes, rounds: int):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, hashed: bytes):
+    return bcrypt.checkpw(password, hashed)
+
+
+def _to_bytes(value):
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+class PasswordHasher:
+    # Runs bcrypt on a worker pool so hashing does not block the event loop.
+    # Once every worker is busy and `queue_limit` jobs are waiting, new jobs
+    # are rejected with a 429 instead of queueing without bound.
+
+    def __init__(self, rounds: int, workers: int, queue_limit: int, pool="thread"):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_limit = queue_limit
+        if pool == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="bcrypt"
+            )
+        self.pending = 0
+
+    @property
+    def queue_depth(self):
+        return max(self.pending - self.workers, 0)
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, try again later.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str):
+        return await self._run(_hash, _to_bytes(password), self.rounds)
+
+    async def verify(self, password: str, hashed):
+        return await self._run(_check, _to_bytes(password), _to_bytes(hashed))
+
+    def needs_rehash(self, hashed):
+        # bcrypt hashes look like $2b$<cost>$<salt+hash>
+        try:
+            return int(_to_bytes(hashed).split(b"$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    workers=HASH_WORKERS,
+    queue_limit=HASH_QUEUE_LIMIT,
+    pool=HASH_POOL,
+)
@@ -0,0 +1,54 @@
+import orjson
+from decouple import config
+from fastapi import Response
+
+from .cache import Cache, make_backend
+
+# "memory://" (per worker) or "redis://host:port/db" (shared), empty to disable
+RESPONSE_CACHE_URL = config("RESPONSE_CACHE_URL", default="memory://")
+RESPONSE_CACHE_SIZE = config("RESPONSE_CACHE_SIZE", default=2048, cast=int)
+RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", default=300, cast=float)
+
+# Rendered list responses. Keys embed the ETag set by check_etag, which names
+# the collection version, so a write makes older entries unreachable even in
+# other workers. Invalidation only frees them early.
+response_cache = Cache(
+    make_backend(RESPONSE_CACHE_URL, max_size=RESPONSE_CACHE_SIZE),
+    namespace="response",
+    ttl=RESPONSE_CACHE_TTL,
+)
+
+
+def _group(user_id: str, collection: str):
+    return f"{user_id}:{collection}"
+
+
+def _key(response: Response, user_id: str, collection: str):
+    return f"{_group(user_id, collection)}:{response.headers['etag']}"
+
+
+async def get_cached_response(response: Response, user_id: str, collection: str):
+    # Call after check_etag, returns the cached response or None
+    if not RESPONSE_CACHE_URL:
+        return None
+    body = await response_cache.get(_key(response, user_id, collection))
+    if body is None:
+        return None
+    return Response(body, media_type="application/json", headers=response.headers)
+
+
+async def cache_response(response: Response, user_id: str, collection: str, content):
+    # `content` comes from src/utils/serializers.py, already JSON types
+    body = orjson.dumps(content)
+    if RESPONSE_CACHE_URL:
+        await response_cache.set(
+            _key(response, user_id, collection),
+            body,
+            group=_group(user_id, collection),
+        )
+    return Response(body, media_type="application/json", headers=response.headers)
+
+
+async def invalidate_responses(user_id: str, collection: str):
+    if RESPONSE_CACHE_URL:
+        await response_cache.invalidate_group(_group(user_id, collection))
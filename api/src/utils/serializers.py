@@ -0,0 +1,141 @@
+import functools
+
+from decouple import config
+
+DOMAIN = config("DOMAIN")
+
+
+# Converters, applied to one attribute each
+def format_datetime(value):
+    # Same output as strftime("%Y-%m-%d %H:%M:%S"), without the tz offset
+    return value.isoformat(" ", "seconds")[:19] if value is not None else None
+
+
+def media_url(location):
+    return f"{DOMAIN}{location}" if location else None
+
+
+def media_urls(locations):
+    return {name: f"{DOMAIN}{location}" for name, location in (locations or {}).items()}
+
+
+def names(objects):
+    return [obj.name for obj in objects]
+
+
+def compile_plan(name: str, fields: dict, relations: tuple = ()):
+    # Turns {key: "attribute" or ("attribute", converter)} into a plain
+    # function returning a dict literal, so serializing a row costs one
+    # attribute read per field and no per-field dispatch. `relations` are
+    # the keys reading a relationship, which expand_plan can leave out.
+    namespace = {}
+    lines = [f"def {name}(obj):", "    return {"]
+    for index, (key, spec) in enumerate(fields.items()):
+        if isinstance(spec, str):
+            lines.append(f"        {key!r}: obj.{spec},")
+        else:
+            attribute, converter = spec
+            namespace[f"convert_{index}"] = converter
+            lines.append(f"        {key!r}: convert_{index}(obj.{attribute}),")
+    lines.append("    }")
+    exec("\n".join(lines), namespace)
+    plan = namespace[name]
+    plan.fields = fields
+    plan.relations = frozenset(relations)
+    return plan
+
+
+@functools.lru_cache(maxsize=None)
+def _plan_without(plan, keys: frozenset):
+    fields = {key: spec for key, spec in plan.fields.items() if key not in keys}
+    return compile_plan(plan.__name__, fields, plan.relations - keys)
+
+
+def expand_plan(plan, expand: frozenset):
+    # The plan without the relations missing from `expand`, which
+    # database/loading.py did not load
+    skipped = plan.relations - expand
+    return _plan_without(plan, skipped) if skipped else plan
+
+
+# Field plans, in the key order of the models' to_dict
+serialize_category = compile_plan(
+    "serialize_category",
+    dict(
+        id="id",
+        user_id="user_id",
+        name="name",
+        description="description",
+        created_at=("created_at", format_datetime),
+        updated_at=("updated_at", format_datetime),
+        foods=("foods", names),
+    ),
+    relations=("foods",),
+)
+
+serialize_food = compile_plan(
+    "serialize_food",
+    dict(
+        id="id",
+        user_id="user_id",
+        image=("image", media_url),
+        image_variants=("image_variants", media_urls),
+        name="name",
+        description="description",
+        created_at=("created_at", format_datetime),
+        updated_at=("updated_at", format_datetime),
+        categories=("categories", names),
+    ),
+    relations=("categories",),
+)
+
+serialize_cart_item = compile_plan(
+    "serialize_cart_item",
+    dict(
+        food_id="food_id",
+        food_name=("foods", lambda food: food.name if food is not None else None),
+        food_qty="food_qty",
+    ),
+)
+
+serialize_cart = compile_plan(
+    "serialize_cart",
+    dict(
+        id="id",
+        user_id="user_id",
+        name="name",
+        status="status",
+        created_at=("created_at", format_datetime),
+        updated_at=("updated_at", format_datetime),
+        foods=("foods", lambda items: [serialize_cart_item(item) for item in items]),
+    ),
+    relations=("foods",),
+)
+
+# The password hash never leaves the server
+serialize_user = compile_plan(
+    "serialize_user",
+    dict(
+        id="id",
+        username="username",
+        email="email",
+        created_at=("created_at", format_datetime),
+        updated_at=("updated_at", format_datetime),
+    ),
+)
+
+serialize_import_job = compile_plan(
+    "serialize_import_job",
+    dict(
+        id="id",
+        filename="filename",
+        format="format",
+        status="status",
+        rows="rows",
+        imported="imported",
+        failed="failed",
+        errors="errors",
+        created_at=("created_at", format_datetime),
+        updated_at=("updated_at", format_datetime),
+    ),
+)
@@ -0,0 +1,154 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate
+
+import aiofiles
+from decouple import config
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response, StreamingResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+# Files that are not named by content hash may change, cache them for a while
+STATIC_MAX_AGE = config("STATIC_MAX_AGE", default=3600, cast=int)
+# "X-Accel-Redirect" (nginx) or "X-Sendfile" (Apache, lighttpd) to let the
+# proxy send the file, empty to send it from Python
+STATIC_ACCEL_HEADER = config("STATIC_ACCEL_HEADER", default="")
+# nginx internal location the static directory is aliased under
+STATIC_ACCEL_PREFIX = config("STATIC_ACCEL_PREFIX", default="/internal/static/")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+# <sha256><ext> uploads and their <sha256>.<variant>.<format> variants, see
+# src/utils/uploads.py and src/utils/images.py
+CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{64}(\.\w+)*$")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+def parse_range(request_headers, etag, size):
+    # (start, end) inclusive, None to send the whole file, or "unsatisfiable".
+    # A single range is supported, anything else gets the whole file.
+    value = request_headers.get("range")
+    if not value:
+        return None
+    if_range = request_headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        return None
+
+    match = RANGE.match(value.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # Suffix range, the last `end` bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+async def read_range(full_path, start, end):
+    async with aiofiles.open(full_path, "rb") as file_object:
+        await file_object.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            chunk = await file_object.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class CachedStaticFiles(StaticFiles):
+    # StaticFiles with strong ETags, immutable caching of content-addressed
+    # files, single byte ranges and optional proxy offloading. Conditional
+    # requests are answered from the stat result, without opening the file.
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        size = stat_result.st_size
+
+        if CONTENT_ADDRESSED.match(name):
+            # The name is the content, it is a strong validator
+            etag = f'"{name}"'
+            cache_control = IMMUTABLE
+        else:
+            etag = f'"{stat_result.st_mtime_ns:x}-{size:x}"'
+            cache_control = f"public, max-age={STATIC_MAX_AGE}"
+        headers = {
+            "etag": etag,
+            "cache-control": cache_control,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+        }
+
+        if status_code == 200 and self.not_modified(request_headers, headers):
+            return NotModifiedResponse(Headers(headers))
+
+        media_type = mimetypes.guess_type(name)[0] or "text/plain"
+
+        if STATIC_ACCEL_HEADER:
+            # The proxy handles ranges and sends the body
+            if STATIC_ACCEL_HEADER.lower() == "x-accel-redirect":
+                relative_path = os.path.relpath(full_path, self.directory)
+                location = STATIC_ACCEL_PREFIX + relative_path.replace(os.sep, "/")
+            else:
+                location = os.path.abspath(full_path)
+            headers[STATIC_ACCEL_HEADER] = location
+            return Response(
+                status_code=status_code, headers=headers, media_type=media_type
+            )
+
+        byte_range = None
+        if status_code == 200:
+            byte_range = parse_range(request_headers, etag, size)
+        if byte_range == "unsatisfiable":
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            headers["content-length"] = str(end - start + 1)
+            if scope["method"] == "HEAD":
+                return Response(status_code=206, headers=headers, media_type=media_type)
+            return StreamingResponse(
+                read_range(full_path, start, end),
+                status_code=206,
+                headers=headers,
+                media_type=media_type,
+            )
+
+        return FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+            method=scope["method"],
+        )
+
+    def not_modified(self, request_headers, headers):
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-Modified-Since is ignored when If-None-Match is present
+            return etag_matches(if_none_match, headers["etag"])
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since is not None:
+            if_modified_since = parsedate(if_modified_since)
+            last_modified = parsedate(headers["last-modified"])
+            return if_modified_since is not None and if_modified_since >= last_modified
+        return False
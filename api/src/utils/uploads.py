@@ -0,0 +1,82 @@
+import hashlib
+import os
+import tempfile
+
+import aiofiles
+import aiofiles.os
+from decouple import config
+from fastapi import UploadFile
+
+UPLOAD_DIR = config("UPLOAD_DIR", default="static")
+MAX_UPLOAD_SIZE = config("MAX_UPLOAD_SIZE", default=5 * 1024 * 1024, cast=int)
+UPLOAD_CHUNK_SIZE = config("UPLOAD_CHUNK_SIZE", default=64 * 1024, cast=int)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+async def save_upload(upload: UploadFile, max_size: int = MAX_UPLOAD_SIZE):
+    # Streams the upload to a temp file in UPLOAD_DIR while hashing it, then
+    # renames it to <sha256><ext>. Identical files end up under the same name,
+    # and a partial file is never visible under its final name.
+    ext = os.path.splitext(upload.filename)[1].lower()
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    os.close(fd)
+    try:
+        async with aiofiles.open(temp_path, "wb") as file_object:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(
+                        f"Image is larger than {max_size // 1024} KiB."
+                    )
+                digest.update(chunk)
+                await file_object.write(chunk)
+
+        file_location = f"{UPLOAD_DIR}/{digest.hexdigest()}{ext}"
+        await aiofiles.os.replace(temp_path, file_location)
+    except BaseException:
+        await remove_upload(temp_path)
+        raise
+
+    return file_location
+
+
+async def save_temp_upload(upload: UploadFile, max_size: int, suffix: str = ""):
+    # Streams the upload to a new temp file outside UPLOAD_DIR, for uploads
+    # read after the request (UploadFile is closed with it). Returns the path,
+    # remove the file with remove_upload.
+    size = 0
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        async with aiofiles.open(temp_path, "wb") as file_object:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"File is larger than {max_size // 1024} KiB.")
+                await file_object.write(chunk)
+    except BaseException:
+        await remove_upload(temp_path)
+        raise
+
+    return temp_path
+
+
+async def remove_upload(file_location):
+    if not file_location:
+        return
+    try:
+        await aiofiles.os.remove(file_location)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,102 @@
+import hashlib
+
+from database import engine
+from database.models import CollectionVersion
+from fastapi import Request, Response
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from .response_cache import invalidate_responses
+from .static import etag_matches
+
+# Responses embed data of other collections: foods list their categories,
+# categories their foods and carts their food names. Statistics aggregate
+# all three.
+DEPENDENTS = {
+    "foods": ("foods", "categories", "carts", "statistics"),
+    "categories": ("categories", "foods", "statistics"),
+    "carts": ("carts", "statistics"),
+    "statistics": ("statistics",),
+}
+
+versions = CollectionVersion.__table__
+
+
+def upsert_version():
+    dialect = engine.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        module = sqlite if dialect == "sqlite" else postgresql
+        return module.insert(versions).on_conflict_do_update(
+            index_elements=["user_id", "collection"],
+            set_=dict(version=versions.c.version + 1),
+        )
+    if dialect == "mysql":
+        return mysql.insert(versions).on_duplicate_key_update(
+            version=versions.c.version + 1
+        )
+    return None
+
+
+async def bump_version(db, collection: str, *user_ids):
+    # Call in the same transaction as the write to `collection`
+    rows = [
+        dict(user_id=user_id, collection=name, version=1)
+        for user_id in user_ids
+        for name in DEPENDENTS[collection]
+    ]
+    if not rows:
+        return
+
+    statement = upsert_version()
+    if statement is not None:
+        await db.execute(statement, rows)
+    else:
+        for row in rows:
+            result = await db.execute(
+                update(versions)
+                .where(
+                    versions.c.user_id == row["user_id"],
+                    versions.c.collection == row["collection"],
+                )
+                .values(version=versions.c.version + 1)
+            )
+            if not result.rowcount:
+                await db.execute(insert(versions), row)
+
+    # Invalidation hook of the response cache
+    for row in rows:
+        await invalidate_responses(row["user_id"], row["collection"])
+
+
+async def get_version(db, user_id: str, collection: str):
+    version = (
+        await db.scalars(
+            select(CollectionVersion.version).where(
+                CollectionVersion.user_id == user_id,
+                CollectionVersion.collection == collection,
+            )
+        )
+    ).first()
+    return version or 0
+
+
+async def check_etag(
+    db, request: Request, response: Response, user_id: str, collection: str
+):
+    # Sets the ETag of `response` and returns a 304 response when the client
+    # already has it. The tag only depends on the collection version, the user
+    # and the URL, so it is known before loading any row.
+    version = await get_version(db, user_id, collection)
+    key = hashlib.blake2b(
+        f"{user_id} {request.url.path}?{request.url.query}".encode(), digest_size=8
+    ).hexdigest()
+    headers = {
+        "ETag": f'"{collection}-{version}-{key}"',
+        "Cache-Control": "private, no-cache",
+    }
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return None